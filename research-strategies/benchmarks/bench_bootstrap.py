@@ -0,0 +1,57 @@
+"""
+Benchmark of the block-bootstrap confidence intervals of bootstrap_helpers.py.
+
+Resamples synthetic daily strategy returns with the stationary bootstrap and with day reshuffles, and measures the
+time and the peak traced memory as the number of resamples grows: memory stays at one chunk of paths.
+
+Usage:
+    python research-strategies/benchmarks/bench_bootstrap.py [n_years] [n_workers]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'papers_strategy',
+                                'intraday_momentum_spy_strategy'))
+from bootstrap_helpers import bootstrap_stats
+
+RESAMPLES = [1000, 10000, 50000]
+
+
+def make_returns(n_days, seed=0):
+    """Daily strategy returns with some autocorrelation, a benchmark, and a few no-trade (zero) days."""
+    rng = np.random.default_rng(seed)
+    benchmark = rng.normal(0.0003, 0.011, n_days)
+    noise = rng.normal(0.0004, 0.008, n_days)
+    ret = 0.2 * benchmark + noise + 0.1 * np.r_[0.0, noise[:-1]]
+    ret[rng.random(n_days) < 0.05] = 0.0
+    return ret, benchmark
+
+
+def run(n_years=20, n_workers=1):
+    n_days = 252 * n_years
+    ret, benchmark = make_returns(n_days)
+    print(f"{n_days} days of returns")
+    for method in ('stationary', 'reshuffle'):
+        for n_resamples in RESAMPLES:
+            tracemalloc.start()
+            started = time.perf_counter()
+            intervals, _ = bootstrap_stats(ret, n_resamples, method=method, benchmark_ret=benchmark,
+                                           n_workers=n_workers, seed=0)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            sharpe = intervals.loc['sharpe_ratio']
+            drawdown = intervals.loc['max_drawdown']
+            print(f"{method:10s} {n_resamples:6d} resamples in {elapsed:6.2f} s "
+                  f"({n_resamples * n_days / elapsed / 1e6:5.1f}M days/s) | peak {peak / 2 ** 20:6.1f} MiB | "
+                  f"sharpe {sharpe['estimate']:.2f} [{sharpe['lower']:.2f}, {sharpe['upper']:.2f}] | "
+                  f"max drawdown {drawdown['estimate']:.1%} [{drawdown['lower']:.1%}, {drawdown['upper']:.1%}]")
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,116 @@
+"""
+Benchmark of the vectorized gap-fade backtests of corsoAZ/gap_helpers.py.
+
+Runs study3_consolidator.py unmodified on the local QuantConnect stand-in over synthetic minute bars with overnight
+gaps, checks that the gap table with study3's 1% threshold and 15-minute exit ends every day with exactly the same
+equity, also when the second day gaps (study3 only trades from the third day), then times sweep_gap_fade over a
+universe and a grid of thresholds and exit times.
+
+Usage:
+    python research-strategies/benchmarks/bench_gap_fade.py [n_years] [n_tickers]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'local_lean'))
+sys.path.insert(0, os.path.join(ROOT, 'corsoAZ'))
+from gap_helpers import build_gap_table, gap_grid, simulate_round_trips, sweep_gap_fade
+from lean_algorithm import run_algorithm
+from lean_data import FrameData
+from run_local import load_algorithm_class
+
+THRESHOLDS = np.round(np.arange(0.0025, 0.0301, 0.0025), 4).tolist()
+EXIT_MINUTES = [1, 5, 15, 30, 60, 120, 240]
+
+
+def make_minute_bars(n_days, seed=0, start='2018-01-02'):
+    """Random-walk regular-session minute bars (09:30 to 15:59) on business days, with overnight gaps of
+       about 1% and a few early closes at 13:00.
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start, periods=n_days).values
+    caldt = (days[:, None] + np.timedelta64(570, 'm') + np.arange(390) * np.timedelta64(1, 'm')).ravel()
+    returns = rng.normal(0, 0.0005, (n_days, 390))
+    returns[:, 0] += rng.normal(0, 0.01, n_days)
+    close = rng.uniform(50, 400) * np.exp(np.cumsum(returns))
+    open_ = close * np.exp(-rng.normal(0, 0.0003, len(close)))
+    open_[::390] = close[::390] * np.exp(-returns[:, 0] / 2)
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 2e-4, len(close))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 2e-4, len(close))))
+    bars = pd.DataFrame({'volume': rng.integers(1000, 100000, len(close)).astype(float), 'open': open_,
+                         'high': high, 'low': low, 'close': close, 'caldt': caldt})
+    early_close = np.repeat(rng.random(n_days) < 0.01, 390) & (np.tile(np.arange(390), n_days) >= 210)
+    return bars[~early_close].reset_index(drop=True)
+
+
+def with_day_two_gap(bars, gap=0.03):
+    """Copy of bars shifted up by gap from the second day on, so that the second day opens gapping up."""
+    bars = bars.copy()
+    days = bars['caldt'].dt.normalize()
+    later = days >= days.unique()[1]
+    for column in ('open', 'high', 'low', 'close'):
+        bars.loc[later, column] *= 1 + gap
+    return bars
+
+
+def gap_fade_equity(bars):
+    """End-of-day equity of study3_consolidator.py, event-driven and from the gap table, and the number of trades
+       of the gap table.
+    """
+    algorithm_class = load_algorithm_class(os.path.join(ROOT, 'corsoAZ', 'study3_consolidator.py'))
+    start, end = bars['caldt'].iloc[0], bars['caldt'].iloc[-1]
+    algorithm = run_algorithm(algorithm_class, FrameData({('SPY', 'minute'): bars}), start, end)
+    table = build_gap_table(bars, exit_minutes=[15])
+    direction, entry_price, exit_price = gap_grid([table], [0.01], [15], table['all_days'])
+    equity = simulate_round_trips(direction, entry_price, exit_price)[0][0, 0, 0]
+    return algorithm.equity.to_numpy(), equity, int((direction != 0).sum())
+
+
+def run(n_years=2, n_tickers=50):
+    n_days = 252 * n_years
+    bars = make_minute_bars(n_days)
+    start, end = bars['caldt'].iloc[0], bars['caldt'].iloc[-1]
+    print(f"{len(bars):,} minute bars ({n_days} days)")
+
+    algorithm_class = load_algorithm_class(os.path.join(ROOT, 'corsoAZ', 'study3_consolidator.py'))
+    started = time.perf_counter()
+    algorithm = run_algorithm(algorithm_class, FrameData({('SPY', 'minute'): bars}), start, end)
+    t_events = time.perf_counter() - started
+
+    started = time.perf_counter()
+    table = build_gap_table(bars, exit_minutes=[15])
+    direction, entry_price, exit_price = gap_grid([table], [0.01], [15], table['all_days'])
+    equity = simulate_round_trips(direction, entry_price, exit_price)[0][0, 0, 0]
+    t_vectorized = time.perf_counter() - started
+
+    # Same equity at the end of every day, to the last bit.
+    expected = algorithm.equity.to_numpy()
+    assert np.array_equal(equity, expected), np.abs(equity - expected).max()
+    print(f"event-driven {t_events * 1000:8.1f} ms | vectorized {t_vectorized * 1000:6.1f} ms "
+          f"| speedup {t_events / t_vectorized:5.1f}x | {int((direction != 0).sum())} trades, "
+          f"final equity {expected[-1]:,.2f}")
+
+    # A gap on the second day: study3's RollingWindow(2) holds a single daily bar then, so neither path trades.
+    expected, equity, _ = gap_fade_equity(with_day_two_gap(bars.iloc[:390 * 5]))
+    assert np.array_equal(equity, expected), np.abs(equity - expected).max()
+    assert (expected[:2] == 100000).all()
+    print("second-day gap: no trade before the third day, same equity")
+
+    universe = {f'ETF{i:03d}': make_minute_bars(n_days, seed=i) for i in range(n_tickers)}
+    started = time.perf_counter()
+    stats, _ = sweep_gap_fade(list(universe), universe.get, THRESHOLDS, EXIT_MINUTES)
+    t_sweep = time.perf_counter() - started
+    best = stats.groupby(level=['threshold', 'exit_minutes'])['sharpe_ratio'].mean().idxmax()
+    print(f"{n_tickers} tickers x {len(THRESHOLDS)} thresholds x {len(EXIT_MINUTES)} exits = {len(stats):,} "
+          f"backtests of {n_days} days in {t_sweep:.2f} s | best mean sharpe at threshold {best[0]}, "
+          f"exit {best[1]} min before close")
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:3]))
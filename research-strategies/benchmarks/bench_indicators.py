@@ -0,0 +1,86 @@
+"""
+Benchmark of the streaming indicators of indicator_helpers.py.
+
+Updates a 200-period SMA bar by bar with the original study2 CustomSimpleMovingAverage update
+(sum of the whole window on every bar) and with indicator_helpers.SMA (running sums), checks that
+compute() on the whole series returns exactly what the updates did for every indicator, times
+EMA.compute() (a Python loop of the update step, not vectorized) against an EMA update loop, and
+measures the memory of a grid of instances (symbols x periods).
+
+Usage:
+    python research-strategies/benchmarks/bench_indicators.py [n_bars]
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'papers_strategy',
+                                'intraday_momentum_spy_strategy'))
+from indicator_helpers import EMA, SMA, VWAP, RollingStd
+
+
+def make_prices(n_bars, seed=0):
+    """Random-walk minute closes and volumes."""
+    rng = np.random.default_rng(seed)
+    close = 400 * np.exp(np.cumsum(rng.normal(0, 0.0005, n_bars)))
+    return close, rng.integers(1000, 100000, n_bars).astype(float)
+
+
+def sum_sma(prices, period):
+    """The update of study2's CustomSimpleMovingAverage before it kept a running sum."""
+    queue = deque(maxlen=period)
+    for price in prices:
+        queue.appendleft(price)
+        value = sum(queue) / len(queue)
+    return value
+
+
+def running_sma(prices, period):
+    indicator = SMA(period)
+    for price in prices:
+        indicator.update(price)
+    return indicator.value
+
+
+def updated_ema(prices, period):
+    indicator = EMA(period)
+    return [indicator.update(price) for price in prices]
+
+
+def run(n_bars=200000, period=200, repeat=3):
+    close, volume = make_prices(n_bars)
+    prices = close.tolist()
+    print(f"{n_bars:,} bars, period {period}")
+
+    # compute() must return exactly the values of bar-by-bar updates.
+    for indicator, args in ((SMA(period), (close,)), (EMA(period), (close,)), (RollingStd(period), (close,)),
+                            (VWAP(period), (close, volume))):
+        streamed = [indicator.update(*bar) for bar in zip(*args)]
+        assert np.array_equal(type(indicator)(period).compute(*args), streamed, equal_nan=True)
+
+    t_sum = min(timeit.repeat(lambda: sum_sma(prices, period), number=1, repeat=repeat))
+    t_running = min(timeit.repeat(lambda: running_sma(prices, period), number=1, repeat=repeat))
+    t_compute = min(timeit.repeat(lambda: SMA(period).compute(close), number=1, repeat=repeat))
+    print(f"sum(window) {t_sum * 1000:8.1f} ms | running sums {t_running * 1000:7.1f} ms "
+          f"| speedup {t_sum / t_running:5.1f}x | compute() {t_compute * 1000:6.1f} ms")
+
+    t_ema_update = min(timeit.repeat(lambda: updated_ema(prices, period), number=1, repeat=repeat))
+    t_ema_compute = min(timeit.repeat(lambda: EMA(period).compute(close), number=1, repeat=repeat))
+    print(f"EMA update() loop {t_ema_update * 1000:6.1f} ms | EMA compute() {t_ema_compute * 1000:6.1f} ms "
+          f"(both one Python step per bar)")
+
+    tracemalloc.start()
+    grid = [SMA(p) for _ in range(5000) for p in (10, 20, 50, 100)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{len(grid):,} SMA instances (periods 10-100): {size / 2 ** 20:.1f} MiB, "
+          f"{size / len(grid):.0f} bytes each")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
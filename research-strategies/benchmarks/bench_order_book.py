@@ -0,0 +1,87 @@
+"""
+Benchmark of the resting-order fill check of the local QuantConnect stand-in.
+
+Rests limit and stop orders far from the price across a universe of symbols, then replays random-walk
+minute bars through PendingOrderBook.pop_triggered, against scanning every resting order of the symbol on
+every bar. Both must trigger the same orders.
+
+Usage:
+    python research-strategies/benchmarks/bench_order_book.py [n_orders]
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'local_lean'))
+from lean_fills import PendingOrderBook
+from lean_orders import OrderTicket, OrderType
+
+
+def make_orders(n_orders, n_symbols, seed=0):
+    """Buy/sell limit and stop orders with trigger prices 2% to 30% away from 100, spread over the symbols."""
+    rng = np.random.default_rng(seed)
+    orders = []
+    for order_id in range(n_orders):
+        order_type = OrderType.LIMIT if rng.random() < 0.5 else OrderType.STOP_MARKET
+        quantity = 1 if rng.random() < 0.5 else -1
+        # Buy limits and sell stops rest below the price, the others above.
+        below = (order_type == OrderType.LIMIT) == (quantity > 0)
+        price = 100 * (1 + (-1 if below else 1) * rng.uniform(0.02, 0.3))
+        ticket = OrderTicket(None, order_id, f'S{order_id % n_symbols}', quantity, order_type, None,
+                             limit_price=price, stop_price=price)
+        orders.append(ticket)
+    return orders
+
+
+def make_bars(n_bars, n_symbols, seed=1):
+    """(symbol, high, low) of random-walk minute bars, interleaved across symbols."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, (n_bars, n_symbols)), axis=0))
+    high = close * (1 + np.abs(rng.normal(0, 0.0005, close.shape)))
+    low = close * (1 - np.abs(rng.normal(0, 0.0005, close.shape)))
+    return [(f'S{s}', high[i, s], low[i, s]) for i in range(n_bars) for s in range(n_symbols)]
+
+
+def with_books(orders, bars):
+    books = {}
+    for ticket in orders:
+        books.setdefault(ticket.symbol, PendingOrderBook()).add(ticket)
+    triggered = []
+    for symbol, high, low in bars:
+        book = books[symbol]
+        if book.size:
+            triggered += [ticket.order_id for ticket in book.pop_triggered(high, low)]
+    return triggered
+
+
+def with_scan(orders, bars):
+    resting = {}
+    for ticket in orders:
+        resting.setdefault(ticket.symbol, []).append(ticket)
+    triggered = []
+    for symbol, high, low in bars:
+        hits = [ticket for ticket in resting[symbol]
+                if (high >= ticket.trigger_price if ticket.triggers_when_rising else low <= ticket.trigger_price)]
+        if hits:
+            resting[symbol] = [ticket for ticket in resting[symbol] if ticket not in hits]
+            triggered += [ticket.order_id for ticket in hits]
+    return triggered
+
+
+def run(n_orders=50000, n_symbols=100, n_bars=390, repeat=3):
+    orders = make_orders(n_orders, n_symbols)
+    bars = make_bars(n_bars, n_symbols)
+    print(f"{n_orders:,} resting orders on {n_symbols} symbols, {len(bars):,} bars")
+    assert with_books(orders, bars) == with_scan(orders, bars)
+
+    t_scan = min(timeit.repeat(lambda: with_scan(orders, bars), number=1, repeat=repeat))
+    t_books = min(timeit.repeat(lambda: with_books(orders, bars), number=1, repeat=repeat))
+    print(f"scan {t_scan * 1000:8.1f} ms | sorted books {t_books * 1000:7.1f} ms (including building them) "
+          f"| speedup {t_scan / t_books:5.1f}x | {len(bars) / t_books / 1e6:.2f}M bars/s")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
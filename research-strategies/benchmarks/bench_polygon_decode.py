@@ -0,0 +1,76 @@
+"""
+Microbenchmark of the per-page decoding done by polygon_helpers.fetch_polygon_data.
+
+Compares the original per-bar decoder (datetime.fromtimestamp + astimezone + strptime for every entry)
+with the vectorized per-page decoder on synthetic 50,000-entry pages of minute aggregates.
+
+Usage:
+    python research-strategies/benchmarks/bench_polygon_decode.py
+"""
+
+import os
+import sys
+import timeit
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'papers_strategy',
+                                'intraday_momentum_spy_strategy'))
+from polygon_helpers import _decode_bars, BAR_COLUMNS
+
+
+def make_page(n_entries=50000, seed=0):
+    """Synthetic page of Polygon minute aggregates, including pre- and post-market bars."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2023-03-01 04:00', tz='America/New_York').value // 10**6
+    t = start + np.arange(n_entries) * 60000
+    close = 400 * np.exp(np.cumsum(rng.normal(0, 0.0005, n_entries)))
+    return [{'v': float(v), 'o': c, 'h': c + 0.05, 'l': c - 0.05, 'c': c, 't': int(ts)}
+            for v, c, ts in zip(rng.integers(100, 100000, n_entries), close.tolist(), t.tolist())]
+
+
+def decode_bars_per_entry(results, period):
+    """Reference copy of the original per-bar decoder."""
+    eastern = pytz.timezone('America/New_York')
+    data_list = []
+    for entry in results:
+        utc_time = datetime.fromtimestamp(entry['t'] / 1000, pytz.utc)
+        eastern_time = utc_time.astimezone(eastern)
+        data_entry = {
+            'volume': entry['v'],
+            'open': entry['o'],
+            'high': entry['h'],
+            'low': entry['l'],
+            'close': entry['c'],
+            'caldt': eastern_time.replace(tzinfo=None)
+        }
+        if period == 'minute':
+            if eastern_time.time() >= datetime.strptime('09:30', '%H:%M').time() and eastern_time.time() <= datetime.strptime('15:59', '%H:%M').time():
+                data_list.append(data_entry)
+        else:
+            data_list.append(data_entry)
+    df = pd.DataFrame(data_list, columns=BAR_COLUMNS)
+    df['caldt'] = pd.to_datetime(df['caldt']).astype('datetime64[ns]')
+    return df
+
+
+def run(n_entries=50000, repeat=5):
+    page = make_page(n_entries)
+
+    before = decode_bars_per_entry(page, 'minute')
+    after = _decode_bars(page, 'minute')
+    pd.testing.assert_frame_equal(before, after)
+
+    t_before = min(timeit.repeat(lambda: decode_bars_per_entry(page, 'minute'), number=1, repeat=repeat))
+    t_after = min(timeit.repeat(lambda: _decode_bars(page, 'minute'), number=1, repeat=repeat))
+    print(f"Page of {n_entries} entries ({len(after)} in session)")
+    print(f"per-entry decode: {t_before * 1000:8.1f} ms  ({n_entries / t_before:,.0f} bars/s)")
+    print(f"vectorized decode: {t_after * 1000:7.1f} ms  ({n_entries / t_after:,.0f} bars/s)")
+    print(f"speedup: {t_before / t_after:.1f}x")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,60 @@
+"""
+Benchmark of the per-minute-of-day rolling statistics used by the intraday momentum feature stage.
+
+Compares the pandas groupby('minute_of_day').transform(lambda x: x.rolling(...)) pattern with the
+key_matrix + rolling_matrix primitive of momentum_helpers, for mean and std, on synthetic data with NaNs.
+
+Usage:
+    python research-strategies/benchmarks/bench_rolling_by_key.py [n_days]
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'papers_strategy',
+                                'intraday_momentum_spy_strategy'))
+from momentum_helpers import MINUTES_PER_DAY, key_matrix, rolling_matrix, shift_matrix
+
+
+def make_minutes(n_days, seed=0):
+    """Synthetic move_open values keyed by minute of day, with NaNs and a few missing bars."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'minute_of_day': np.tile(np.arange(1, MINUTES_PER_DAY + 1), n_days),
+        'move_open': np.abs(rng.normal(0, 0.004, n_days * MINUTES_PER_DAY)),
+    })
+    df.loc[rng.random(len(df)) < 0.01, 'move_open'] = np.nan
+    return df[rng.random(len(df)) > 0.005].reset_index(drop=True)
+
+
+def with_transform(df, stat):
+    minute_groups = df.groupby('minute_of_day')
+    rolling = minute_groups['move_open'].transform(lambda x: getattr(x.rolling(window=14, min_periods=13), stat)())
+    return rolling.groupby(df['minute_of_day']).shift(1).to_numpy()
+
+
+def with_rolling_matrix(df, stat):
+    matrix, occurrence = key_matrix(df['move_open'].to_numpy(), df['minute_of_day'].to_numpy())
+    return shift_matrix(rolling_matrix(matrix, window=14, min_periods=13, stat=stat), 1)[occurrence]
+
+
+def run(n_days=2520, repeat=3):
+    df = make_minutes(n_days)
+    print(f"{len(df):,} minute bars ({n_days} days)")
+    for stat in ('mean', 'std'):
+        expected = with_transform(df, stat)
+        result = with_rolling_matrix(df, stat)
+        np.testing.assert_allclose(result, expected, rtol=1e-9, atol=1e-15)
+
+        t_before = min(timeit.repeat(lambda: with_transform(df, stat), number=1, repeat=repeat))
+        t_after = min(timeit.repeat(lambda: with_rolling_matrix(df, stat), number=1, repeat=repeat))
+        print(f"{stat:>4}: groupby.transform {t_before * 1000:8.1f} ms | rolling_matrix {t_after * 1000:7.1f} ms "
+              f"| speedup {t_before / t_after:5.1f}x")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2520)
@@ -0,0 +1,98 @@
+"""
+Benchmark of the 52-week high/low of study2_indicators.py on the local QuantConnect stand-in.
+
+Runs the same daily SPY algorithm over 20 years of synthetic daily bars: once calling
+history(symbol, timedelta(365)) and min/max on every bar (the original study2 code), once with the
+RollingRange indicator study2 defines, and once with the local RollingHighLow indicator, both warm started
+from a single history request. All must see the same high and low.
+
+Usage:
+    python research-strategies/benchmarks/bench_rolling_high_low.py [n_years]
+"""
+
+import os
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'local_lean'))
+from lean_algorithm import QCAlgorithm, run_algorithm
+from lean_data import FrameData, Resolution
+from lean_indicators import RollingHighLow
+from run_local import load_algorithm_class
+
+STUDY2_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'corsoAZ', 'study2_indicators.py')
+
+
+def make_daily_bars(n_years, seed=0):
+    """Random-walk daily bars, one more year before the start to serve the first history request."""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range('2000-01-03', periods=252 * (n_years + 1))
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.012, len(days))))
+    open_ = np.r_[100, close[:-1]] * np.exp(rng.normal(0, 0.003, len(days)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, len(days))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, len(days))))
+    return pd.DataFrame({'volume': rng.integers(10 ** 6, 10 ** 7, len(days)).astype(float), 'open': open_,
+                         'high': high, 'low': low, 'close': close, 'caldt': days})
+
+
+class HistoryRange(QCAlgorithm):
+    def initialize(self):
+        self.spy = self.add_equity("SPY", Resolution.DAILY).symbol
+        self.ranges = []
+
+    def on_data(self, data):
+        hist = self.history(self.spy, timedelta(365), Resolution.DAILY)
+        self.ranges.append((min(hist['low']), max(hist['high'])))
+
+
+class IndicatorRange(QCAlgorithm):
+    def initialize(self):
+        self.spy = self.add_equity("SPY", Resolution.DAILY).symbol
+        self.ranges = []
+        self._range = RollingHighLow("52w", span=timedelta(365))
+        hist = self.history(self.spy, timedelta(365), Resolution.DAILY)
+        self._range.warm_up(hist.index.get_level_values('time'), hist['high'], hist['low'])
+        self.register_indicator(self.spy, self._range, resolution=Resolution.DAILY)
+
+    def on_data(self, data):
+        self.ranges.append((self._range.minimum.value, self._range.maximum.value))
+
+
+class StudyRange(QCAlgorithm):
+    def initialize(self):
+        self.spy = self.add_equity("SPY", Resolution.DAILY).symbol
+        self.ranges = []
+        self._range = load_algorithm_class(STUDY2_PATH).RollingRange("52w", span=timedelta(365))
+        hist = self.history(self.spy, timedelta(365), Resolution.DAILY)
+        self._range.warm_up(hist.index.get_level_values('time'), hist['high'], hist['low'])
+        self.register_indicator(self.spy, self._range, resolution=Resolution.DAILY)
+
+    def on_data(self, data):
+        self.ranges.append((self._range.low, self._range.high))
+
+
+def run(n_years=20):
+    bars = make_daily_bars(n_years)
+    data = FrameData({('SPY', 'day'): bars})
+    start, end = bars['caldt'].iloc[252], bars['caldt'].iloc[-1]
+    print(f"{len(bars) - 252:,} daily bars ({n_years} years)")
+
+    results = {}
+    for algorithm_class in (HistoryRange, StudyRange, IndicatorRange):
+        started = time.perf_counter()
+        algorithm = run_algorithm(algorithm_class, data, start, end)
+        results[algorithm_class.__name__] = (time.perf_counter() - started, algorithm.ranges)
+    assert results['HistoryRange'][1] == results['StudyRange'][1] == results['IndicatorRange'][1]
+
+    t_history, t_study, t_indicator = (results[name][0] for name in ('HistoryRange', 'StudyRange', 'IndicatorRange'))
+    print(f"history() per bar {t_history * 1000:8.1f} ms | study2 RollingRange {t_study * 1000:7.1f} ms "
+          f"| local RollingHighLow {t_indicator * 1000:7.1f} ms | speedup {t_history / t_study:5.1f}x "
+          f"(whole backtest, data loading included)")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
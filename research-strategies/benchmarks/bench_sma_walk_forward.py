@@ -0,0 +1,86 @@
+"""
+Benchmark of the walk-forward sma_length optimizer of corsoAZ/walk_forward_helpers.py.
+
+Runs study6_performance_analysis.py unmodified on the local QuantConnect stand-in over synthetic daily SPY and BND
+bars for a few sma_length values, checks that simulate_sma_allocation ends every day with exactly the same equity,
+then times the SMA matrix, the full grid of lengths and the walk-forward over many years of daily bars.
+
+Usage:
+    python research-strategies/benchmarks/bench_sma_walk_forward.py [n_years] [n_workers]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'local_lean'))
+sys.path.insert(0, os.path.join(ROOT, 'corsoAZ'))
+from lean_algorithm import run_algorithm
+from lean_data import FrameData
+from run_local import load_algorithm_class
+from walk_forward_helpers import DEFAULT_LENGTHS, allocation_inputs, simulate_sma_allocation, walk_forward_sma
+
+CHECKED_LENGTHS = [5, 30, 120]
+
+
+def make_daily_bars(n_days, seed=0, start='2004-01-02', drift=0.0003, volatility=0.012, missing=0.0):
+    """Random-walk daily bars on business days; a fraction missing of the days is dropped."""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start, periods=n_days)
+    close = rng.uniform(50, 300) * np.exp(np.cumsum(rng.normal(drift, volatility, n_days)))
+    open_ = np.r_[close[0], close[:-1]] * np.exp(rng.normal(0, volatility / 4, n_days))
+    bars = pd.DataFrame({'volume': rng.integers(10 ** 5, 10 ** 7, n_days).astype(float), 'open': open_,
+                         'high': np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.003, n_days))),
+                         'low': np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.003, n_days))),
+                         'close': close, 'caldt': days})
+    return bars[rng.random(n_days) >= missing].reset_index(drop=True)
+
+
+def run(n_years=20, n_workers=None):
+    n_days = 252 * n_years
+    spy = make_daily_bars(n_days, seed=1)
+    bnd = make_daily_bars(n_days, seed=2, drift=0.0001, volatility=0.003, missing=0.01)
+    print(f"{n_days} days of SPY and BND")
+
+    check_days = 252 * 3
+    start, end = spy['caldt'].iloc[0], spy['caldt'].iloc[check_days]
+    frames = {('SPY', 'day'): spy, ('BND', 'day'): bnd}
+    inputs = allocation_inputs(spy[spy['caldt'] <= end], bnd[bnd['caldt'] <= end], CHECKED_LENGTHS)
+    equity, _ = simulate_sma_allocation(inputs, inputs['sma'])
+    algorithm_class = load_algorithm_class(os.path.join(ROOT, 'corsoAZ', 'study6_performance_analysis.py'))
+    t_events = 0.0
+    for row, length in enumerate(CHECKED_LENGTHS):
+        started = time.perf_counter()
+        algorithm = run_algorithm(algorithm_class, FrameData(frames), start, end, parameters={'sma_length': length})
+        t_events += time.perf_counter() - started
+        # Same equity at the end of every day, to the last bit.
+        expected = algorithm.equity.to_numpy()
+        assert np.array_equal(equity[row], expected), (length, np.abs(equity[row] - expected).max())
+    print(f"event-driven {t_events / len(CHECKED_LENGTHS) * 1000:.1f} ms per length over {check_days} days, "
+          f"same equity for sma_length {CHECKED_LENGTHS}")
+
+    started = time.perf_counter()
+    inputs = allocation_inputs(spy, bnd)
+    t_inputs = time.perf_counter() - started
+    started = time.perf_counter()
+    equity, _ = simulate_sma_allocation(inputs, inputs['sma'])
+    t_grid = time.perf_counter() - started
+    best = DEFAULT_LENGTHS[np.argmax(equity[:, -1])]
+    t_events_grid = t_events / len(CHECKED_LENGTHS) * n_days / check_days * len(DEFAULT_LENGTHS)
+    print(f"SMA matrix {len(DEFAULT_LENGTHS)} lengths x {len(inputs['days'])} days in {t_inputs * 1000:.1f} ms | "
+          f"full-period grid in {t_grid:.2f} s (about {t_events_grid:.0f} s event-driven) | "
+          f"best final equity at sma_length {best}")
+
+    started = time.perf_counter()
+    windows, oos_equity = walk_forward_sma(spy, bnd, n_workers=n_workers)
+    t_walk = time.perf_counter() - started
+    print(f"walk-forward over {len(windows)} windows in {t_walk:.2f} s | chosen lengths "
+          f"{windows['sma_length'].tolist()} | out-of-sample final equity {oos_equity.iloc[-1]:,.2f}")
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:3]))
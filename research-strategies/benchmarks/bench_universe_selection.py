@@ -0,0 +1,114 @@
+"""
+Benchmark of the universe selection of study4_universe.py on the local QuantConnect stand-in.
+
+Builds a synthetic daily fundamentals table (10k symbols over 20 years by default) and, every 30 days,
+selects the top 200 stocks by dollar volume above $10 with fundamental data, then the 10 smallest market
+caps among them: like the original coarse/fine filters (Fundamental objects of the day, sorted), with the
+heapq coarse/fine filters of study4 (the same objects, which is what QuantConnect passes them), and with the
+local-only UniverseSelection on the columnar FundamentalsTable. All must select the same symbols.
+
+Usage:
+    python research-strategies/benchmarks/bench_universe_selection.py [n_symbols] [n_years]
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'local_lean'))
+from lean_universe import FundamentalsTable, Universe, UniverseSelection
+from run_local import load_algorithm_class
+
+STUDY4_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'corsoAZ', 'study4_universe.py')
+
+
+def make_fundamentals(n_symbols, n_years, seed=0):
+    """Columns of a daily fundamentals table, one row per symbol and business day, sorted by date.
+       Prices are random walks from $1 to $1000, a tenth of the symbols has no fundamental data and
+       a few have no market cap; the symbol column is a Categorical so it stays small.
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range('2005-01-03', periods=252 * n_years).values.astype('datetime64[D]')
+    shape = (len(days), n_symbols)
+
+    price = rng.normal(0, 0.02, shape)
+    np.cumsum(price, axis=0, out=price)
+    price += rng.uniform(np.log(1), np.log(1000), n_symbols)
+    np.exp(price, out=price)
+    dollar_volume = rng.normal(0, 0.5, shape)
+    dollar_volume += rng.normal(12, 2, n_symbols)
+    np.exp(dollar_volume, out=dollar_volume)
+    dollar_volume *= price
+    shares = np.exp(rng.normal(17, 1.5, n_symbols)) * (rng.random(n_symbols) > 0.02)
+
+    return {'date': np.repeat(days, n_symbols),
+            'symbol': pd.Categorical.from_codes(np.tile(np.arange(n_symbols, dtype=np.int32), len(days)),
+                                                [f'S{i:05d}' for i in range(n_symbols)]),
+            'price': price.ravel(),
+            'dollar_volume': dollar_volume.ravel(),
+            'has_fundamental_data': np.tile(rng.random(n_symbols) > 0.1, len(days)),
+            'market_cap': (price * shares).ravel()}
+
+
+def sorted_filters(coarse):
+    """The coarse and fine filters of study4_universe.py before the columnar selection."""
+    sorted_by_dollar_volume = sorted(coarse, key=lambda x: x.dollar_volume, reverse=True)
+    selected = set([x.symbol for x in sorted_by_dollar_volume if x.price > 10 and x.has_fundamental_data][:200])
+    fine = [x for x in coarse if x.symbol in selected]
+    sorted_by_market_cap = sorted(fine, key=lambda x: x.market_cap)
+    return [x.symbol for x in sorted_by_market_cap if x.market_cap > 0][:10]
+
+
+def run(n_symbols=10000, n_years=20):
+    columns = make_fundamentals(n_symbols, n_years)
+    started = time.perf_counter()
+    table = FundamentalsTable(columns)
+    t_table = time.perf_counter() - started
+    del columns
+    print(f"{len(table.symbol_codes):,} rows ({n_symbols:,} symbols x {len(table.days):,} days), "
+          f"table built in {t_table:.1f} s")
+
+    selection = (UniverseSelection(rebalance=timedelta(30))
+                 .where(lambda f: (f.price > 10) & f.has_fundamental_data)
+                 .top(200, 'dollar_volume')
+                 .where(lambda f: f.market_cap > 0)
+                 .bottom(10, 'market_cap'))
+    study = load_algorithm_class(STUDY4_PATH)()
+    study.initialize()
+    t_objects = t_sorted = t_heap = t_columnar = 0.0
+    n_rebalances = 0
+    for day in table.days:
+        started = time.perf_counter()
+        selected = selection.select(table.on(day), datetime.combine(day, datetime.min.time()))
+        t_columnar += time.perf_counter() - started
+        if selected is Universe.UNCHANGED:
+            continue
+
+        n_rebalances += 1
+        started = time.perf_counter()
+        coarse = list(table.on(day))
+        t_objects += time.perf_counter() - started
+        started = time.perf_counter()
+        expected = sorted_filters(coarse)
+        t_sorted += time.perf_counter() - started
+        started = time.perf_counter()
+        study.time = datetime.combine(day, datetime.min.time())
+        coarse_selected = set(study._coarse_filter(coarse))
+        heap_selected = study._fine_filter([x for x in coarse if x.symbol in coarse_selected])
+        t_heap += time.perf_counter() - started
+        assert selected == expected == heap_selected, day
+
+    per_day = 1000 / n_rebalances
+    print(f"{n_rebalances} rebalances | Fundamental objects {t_objects * per_day:6.2f} ms + sorted filters "
+          f"{t_sorted * per_day:6.2f} ms | study4 heapq filters {t_heap * per_day:6.2f} ms "
+          f"({t_sorted / t_heap:4.1f}x faster than sorting)")
+    print(f"local UniverseSelection {t_columnar * per_day:5.2f} ms (all {len(table.days):,} days included) "
+          f"| speedup {(t_objects + t_sorted) / t_columnar:5.1f}x, {t_sorted / t_columnar:5.1f}x on the ranking alone")
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,74 @@
+"""
+Benchmark of the vectorized VWAP trend backtest of vwap_trend_helpers.py.
+
+Runs vwap_trend_strategy.py unmodified on the local QuantConnect stand-in over synthetic minute bars, checks that
+backtest_vwap_trend ends every day with exactly the same equity, then times backtest_vwap_universe over a
+universe of synthetic ETFs.
+
+Usage:
+    python research-strategies/benchmarks/bench_vwap_trend.py [n_years] [n_tickers]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'local_lean'))
+sys.path.insert(0, os.path.join(ROOT, 'papers_strategy', 'vwap_strategy'))
+from lean_algorithm import run_algorithm
+from lean_data import FrameData
+from run_local import load_algorithm_class
+from vwap_trend_helpers import backtest_vwap_trend, backtest_vwap_universe
+
+
+def make_minute_bars(n_days, seed=0, start='2018-01-02'):
+    """Random-walk regular-session minute bars (09:30 to 15:59) on business days, with overnight gaps."""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start, periods=n_days).values
+    caldt = (days[:, None] + np.timedelta64(570, 'm') + np.arange(390) * np.timedelta64(1, 'm')).ravel()
+    returns = rng.normal(0, 0.0006, (n_days, 390))
+    returns[:, 0] += rng.normal(0, 0.006, n_days)
+    close = rng.uniform(50, 400) * np.exp(np.cumsum(returns))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 2e-4, len(close))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 2e-4, len(close))))
+    return pd.DataFrame({'volume': rng.integers(1000, 100000, len(close)).astype(float), 'open': open_,
+                         'high': high, 'low': low, 'close': close, 'caldt': caldt})
+
+
+def run(n_years=2, n_tickers=50):
+    n_days = 252 * n_years
+    bars = make_minute_bars(n_days)
+    start, end = bars['caldt'].iloc[0], bars['caldt'].iloc[-1]
+    print(f"{len(bars):,} minute bars ({n_days} days)")
+
+    algorithm_class = load_algorithm_class(os.path.join(ROOT, 'papers_strategy', 'vwap_strategy',
+                                                        'vwap_trend_strategy.py'))
+    started = time.perf_counter()
+    algorithm = run_algorithm(algorithm_class, FrameData({('QQQ', 'minute'): bars}), start, end)
+    t_events = time.perf_counter() - started
+    started = time.perf_counter()
+    strat = backtest_vwap_trend(bars)
+    t_vectorized = time.perf_counter() - started
+
+    # Same equity at the end of every day, to the last bit.
+    expected = algorithm.equity.to_numpy()
+    assert np.array_equal(strat['equity'].to_numpy(), expected), np.abs(strat['equity'].to_numpy() - expected).max()
+    print(f"event-driven {t_events * 1000:8.1f} ms | vectorized {t_vectorized * 1000:6.1f} ms "
+          f"| speedup {t_events / t_vectorized:5.1f}x | {int((strat['direction'] != 0).sum())} trades, "
+          f"final equity {expected[-1]:,.2f}")
+
+    universe = {f'ETF{i:03d}': make_minute_bars(n_days, seed=i) for i in range(n_tickers)}
+    started = time.perf_counter()
+    stats, _ = backtest_vwap_universe(list(universe), universe.get)
+    t_universe = time.perf_counter() - started
+    print(f"{n_tickers} tickers x {n_days} days ({n_tickers * len(bars):,} bars) in {t_universe:.2f} s | "
+          f"portfolio sharpe {stats.loc['PORTFOLIO', 'sharpe_ratio']:.2f}")
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:3]))
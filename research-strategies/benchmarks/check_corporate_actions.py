@@ -0,0 +1,110 @@
+"""
+Check of the per-day corporate actions of corporate_actions.py (dividends and splits) and of their Polygon fetchers.
+
+On the split bars of check_streaming_signal (quarterly dividends and a 2-for-1 split), checks that:
+- build_day_matrix, build_panel and replay_noise_band see the same actions, PnL components and signals from
+  CorporateActions as from per-bar 'dividend' and 'split_ratio' columns,
+- a close carried over days without bars is adjusted for the actions of those days.
+Then, through FakePolygonServer, that fetch_polygon_dividends and fetch_polygon_splits decode the reference data,
+serve a second call from the Parquet cache, and go back to the server with use_cache=False.
+
+Usage:
+    python research-strategies/benchmarks/check_corporate_actions.py
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'papers_strategy',
+                                'intraday_momentum_spy_strategy'))
+import polygon_helpers
+from check_streaming_signal import make_split_bars
+from corporate_actions import CorporateActions, carry_last_close
+from fake_polygon_server import FakePolygonServer, dividend_entries, point_at
+from momentum_helpers import build_day_matrix, build_intraday_features, day_pnl_components
+from streaming_helpers import replay_noise_band
+from universe_helpers import build_panel
+
+
+def actions_of(bars):
+    """Dividends and splits (fetch_polygon_dividends / fetch_polygon_splits layout) of per-bar action columns."""
+    days = bars.groupby(bars['caldt'].dt.normalize())[['dividend', 'split_ratio']].first().reset_index()
+    dividends = days.loc[days['dividend'] != 0, ['caldt', 'dividend']].reset_index(drop=True)
+    splits = days.loc[days['split_ratio'] != 1, ['caldt', 'split_ratio']].reset_index(drop=True)
+    return dividends, splits
+
+
+def check_paths(bars, band_mult=1):
+    """Per-bar columns and CorporateActions must give the same per-day actions on every path."""
+    dividends, splits = actions_of(bars)
+    df = build_intraday_features(bars)
+    actions = CorporateActions.from_polygon(df['day'].unique(), dividends, splits)
+    without_columns = df.drop(columns=['dividend', 'split_ratio'])
+
+    matrix = build_day_matrix(without_columns, actions=actions)
+    per_bar = build_day_matrix(df)
+    for name in ('dividend', 'split_ratio'):
+        np.testing.assert_array_equal(per_bar[name], matrix[name], err_msg=name)
+    expected = day_pnl_components(matrix, band_mult)
+
+    for panel in (build_panel(['SPLIT'], lambda ticker: without_columns, matrix['all_days'],
+                              load_actions=lambda ticker: actions),
+                  build_panel(['SPLIT'], lambda ticker: df, matrix['all_days'])):
+        np.testing.assert_array_equal(panel['split_ratio'][0], matrix['split_ratio'])
+        np.testing.assert_array_equal(panel['dividend'][0], matrix['dividend'])
+        components = day_pnl_components({name: value for name, value in panel.items() if name != 'tickers'},
+                                        band_mult)
+        for name, got, wanted in zip(('gross_pnl_per_share', 'trades_count', 'active'), components, expected):
+            np.testing.assert_array_equal(got[0], wanted, err_msg=name)
+
+    stream = replay_noise_band(bars.drop(columns=['dividend', 'split_ratio']), band_mult, actions=actions)
+    pd.testing.assert_frame_equal(stream, replay_noise_band(bars, band_mult))
+    return len(dividends), len(splits)
+
+
+def check_carry():
+    """A close carried over days without bars is adjusted for those days' actions, so the day after compares with
+       the last traded close in the current share count, net of the dividends gone ex since.
+    """
+    last_close = [[10.0, np.nan, np.nan, 5.0], [np.nan, 8.0, np.nan, 9.0]]
+    dividend = [[0.0, 0.0, 0.5, 0.0], [0.0, 0.0, 0.0, 0.0]]
+    split_ratio = [[1.0, 2.0, 1.0, 1.0], [1.0, 1.0, 1.0, 1.0]]
+    np.testing.assert_array_equal(carry_last_close(last_close, dividend, split_ratio),
+                                  [[10.0, 5.0, 4.5, 5.0], [np.nan, 8.0, 8.0, 9.0]])
+
+
+def check_fetchers(bars):
+    """fetch_polygon_dividends / fetch_polygon_splits through the fake server and the reference cache."""
+    dividends, splits = actions_of(bars)
+    reference = {'dividends': dividend_entries(dividends),
+                 'splits': [{'execution_date': f'{day:%Y-%m-%d}', 'split_from': 1, 'split_to': ratio}
+                            for day, ratio in zip(splits['caldt'], splits['split_ratio'])]}
+    with FakePolygonServer({'SPLIT': (bars, reference)}) as server, tempfile.TemporaryDirectory() as cache_dir:
+        point_at(server, cache_dir)
+        for _ in range(2):  # The second round is served from the cache.
+            pd.testing.assert_frame_equal(polygon_helpers.fetch_polygon_dividends('SPLIT'), dividends,
+                                          check_dtype=False)
+            pd.testing.assert_frame_equal(polygon_helpers.fetch_polygon_splits('SPLIT'), splits, check_dtype=False)
+        assert server.requests == 2, server.requests
+        polygon_helpers.fetch_polygon_splits('SPLIT', use_cache=False)
+        assert server.requests == 3, server.requests
+
+
+def run(n_days=252, seed=0):
+    bars = make_split_bars(n_days, seed)
+    n_dividends, n_splits = check_paths(bars)
+    print(f"{len(bars):,} bars, {n_dividends} dividends, {n_splits} split: build_day_matrix, build_panel and "
+          f"replay_noise_band agree from CorporateActions and from per-bar columns")
+    check_carry()
+    print("closes carried over days without bars are adjusted for those days' dividends and splits")
+    check_fetchers(bars)
+    print("dividends and splits decoded from the fake server, then served from the reference cache")
+    print("All checks passed.")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,121 @@
+"""
+Check of orders that trigger on the same bar when a fill callback acts on the others, in the local QuantConnect
+stand-in (local_lean).
+
+A long position is protected by a bracket exit: a take-profit sell limit above the price and a stop-loss sell
+stop below it, with an unrelated buy limit resting far below. One wide bar triggers both exits; the fill callback
+of the first one then
+- cancels the other ticket (one-cancels-other): the stop must not fill,
+- cancels all open orders of the symbol: the stop must not fill and the far buy limit is canceled too,
+- updates the other ticket's stop: the stop rests again with its new price and fills from the next bar on.
+In every case the far buy limit must stay in the book untouched unless canceled. A zero-quantity market order must
+come back invalid, without a fill or an exception.
+
+Usage:
+    python research-strategies/benchmarks/check_order_events.py
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'local_lean'))
+from lean_algorithm import QCAlgorithm, run_algorithm
+from lean_data import FrameData, Resolution
+from lean_orders import OrderStatus, UpdateOrderFields
+
+# (open, high, low, close) of the minute bars of 2024-01-02 from 09:30: entry, exits resting, wide bar, then a
+# fall below the updated stop.
+BARS = [(100, 100, 100, 100), (100, 100, 100, 100), (100, 102, 98, 100), (100, 100, 100, 100), (96, 96, 94, 95),
+        (95, 95, 95, 95)]
+
+
+def minute_frame():
+    caldt = pd.Timestamp('2024-01-02 09:30') + pd.to_timedelta(range(len(BARS)), unit='min')
+    df = pd.DataFrame(BARS, columns=['open', 'high', 'low', 'close'])
+    df['volume'] = 1000.0
+    df['caldt'] = caldt
+    return df
+
+
+class BracketExit(QCAlgorithm):
+    """Enters 100 shares on the first bar and brackets them; mode sets what the first exit fill does."""
+
+    mode = 'cancel'
+
+    def initialize(self):
+        self.set_start_date(2024, 1, 2)
+        self.set_end_date(2024, 1, 2)
+        self.set_cash(100000)
+        self.symbol = self.add_equity('TEST', Resolution.MINUTE).symbol
+        self.take_profit = self.stop_loss = self.far = None
+        self.fills = []
+
+    def on_data(self, data):
+        if self.take_profit is None:
+            self.market_order(self.symbol, 100)
+            self.take_profit = self.limit_order(self.symbol, -100, 101)
+            self.stop_loss = self.stop_market_order(self.symbol, -100, 99)
+            self.far = self.limit_order(self.symbol, 10, 90)
+
+    def on_order_event(self, order_event):
+        if order_event.status != OrderStatus.FILLED:
+            return
+        self.fills.append((order_event.order_id, order_event.fill_price, order_event.fill_quantity))
+        if self.take_profit is None or order_event.order_id != self.take_profit.order_id:
+            return
+        if self.mode == 'cancel':
+            self.stop_loss.cancel()
+        elif self.mode == 'cancel_open_orders':
+            self.transactions.cancel_open_orders(self.symbol)
+        elif self.mode == 'update':
+            fields = UpdateOrderFields()
+            fields.stop_price = 95
+            self.stop_loss.update(fields)
+
+
+class ZeroQuantity(BracketExit):
+    """Sends a zero-quantity market order on the first bar."""
+
+    def on_data(self, data):
+        if self.take_profit is None:
+            self.take_profit = self.market_order(self.symbol, 0)
+
+
+def run_mode(mode):
+    algorithm_class = type(f'BracketExit_{mode}', (BracketExit,), {'mode': mode})
+    algorithm = run_algorithm(algorithm_class, FrameData({('TEST', 'minute'): minute_frame()}))
+    book = algorithm.transactions.book(algorithm.symbol)
+    return algorithm, book
+
+
+def run():
+    algorithm, book = run_mode('cancel')
+    assert algorithm.stop_loss.status == OrderStatus.CANCELED
+    assert algorithm.portfolio[algorithm.symbol].quantity == 0
+    assert algorithm.far.is_open and algorithm.far in book and len(book) == 1
+    assert [fill[0] for fill in algorithm.fills] == [1, 2]
+    print("cancel from the fill callback: the stop does not fill, the far limit keeps resting")
+
+    algorithm, book = run_mode('cancel_open_orders')
+    assert algorithm.stop_loss.status == OrderStatus.CANCELED and algorithm.far.status == OrderStatus.CANCELED
+    assert algorithm.portfolio[algorithm.symbol].quantity == 0 and len(book) == 0
+    print("cancel_open_orders from the fill callback: the stop and the far limit are canceled")
+
+    algorithm, book = run_mode('update')
+    assert algorithm.stop_loss.status == OrderStatus.FILLED and algorithm.stop_loss.average_fill_price == 95
+    assert algorithm.fills[-1] == (algorithm.stop_loss.order_id, 95, -100)
+    assert algorithm.portfolio[algorithm.symbol].quantity == -100
+    assert algorithm.far.is_open and algorithm.far in book and len(book) == 1
+    print("update from the fill callback: the stop rests again and fills at its new price on a later bar")
+
+    algorithm = run_algorithm(ZeroQuantity, FrameData({('TEST', 'minute'): minute_frame()}))
+    assert algorithm.take_profit.status == OrderStatus.INVALID and not algorithm.fills
+    assert algorithm.portfolio[algorithm.symbol].quantity == 0 and algorithm.portfolio.cash == 100000
+    print("market order of zero shares: invalid, no fill")
+    print("All checks passed.")
+
+
+if __name__ == '__main__':
+    run()
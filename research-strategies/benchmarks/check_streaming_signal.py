@@ -0,0 +1,112 @@
+"""
+Bar-for-bar check of the streaming noise-band signal (streaming_helpers.NoiseBandSignal) against the batch path.
+
+Replays seeded synthetic minute bars, with missing minutes, early closes, quarterly dividends and a 2-for-1 split,
+through replay_noise_band and compares every bar with the batch features of build_intraday_features and the
+UB/LB bands and signals of day_pnl_components: vwap, move_open, sigma_open, spy_dvol, UB, LB and signal.
+
+Usage:
+    python research-strategies/benchmarks/check_streaming_signal.py [--years 1] [--band-mult 1]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'papers_strategy',
+                                'intraday_momentum_spy_strategy'))
+from corporate_actions import adjust_prev_close
+from momentum_helpers import build_day_matrix, build_intraday_features
+from streaming_helpers import replay_noise_band
+
+FEATURES = ('vwap', 'move_open', 'sigma_open', 'spy_dvol')
+
+
+def make_split_bars(n_days, seed=0, split_ratio=2.0):
+    """Synthetic regular-session minute bars with per-bar 'dividend' and 'split_ratio' columns: 0.1% of the
+       minutes missing, an early close every 50 days, a 0.5 dividend every quarter and a split halfway through
+       (prices from the split day on are divided by split_ratio, and dividends paid after it too).
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range('2022-01-03', periods=n_days)
+    caldt = (days.values[:, None] + np.timedelta64(570, 'm') + np.arange(390) * np.timedelta64(1, 'm')).ravel()
+    ret = rng.normal(0, 8e-4, len(caldt))
+    ret[::390] += rng.normal(0, 0.01, n_days)  # Overnight gaps.
+    close = 100 * np.exp(np.cumsum(ret))
+    open_ = np.r_[close[0], close[:-1]]
+    bars = pd.DataFrame({'volume': rng.integers(100, 10000, len(caldt)).astype(float), 'open': open_,
+                         'high': np.maximum(open_, close) + 0.01, 'low': np.minimum(open_, close) - 0.01,
+                         'close': close, 'caldt': caldt})
+
+    minute = np.tile(np.arange(390), n_days)
+    early_close = np.repeat(np.arange(n_days) % 50 == 49, 390) & (minute >= 210)
+    missing = (rng.random(len(bars)) < 0.001) & (minute > 0)
+    bars = bars[~early_close & ~missing].reset_index(drop=True)
+
+    day = bars['caldt'].dt.normalize()
+    after = day >= days[n_days // 2]
+    prices = ['open', 'high', 'low', 'close']
+    bars[prices] = bars[prices].div(np.where(after, split_ratio, 1.0), axis=0).round(2)
+    bars.loc[after, 'volume'] *= split_ratio
+    bars['dividend'] = np.where(day.isin(days[30::63]), np.where(after, 0.5 / split_ratio, 0.5), 0.0)
+    bars['split_ratio'] = np.where(day == days[n_days // 2], split_ratio, 1.0)
+    return bars
+
+
+def batch_signal(df, band_mult=1, splits=True):
+    """Per-bar features, bands and signal of the batch path (build_day_matrix and adjust_prev_close)."""
+    matrix = build_day_matrix(df)  # Per-day dividend and split_ratio from the per-bar columns.
+    last_close = np.take_along_axis(matrix['close'], (matrix['count'] - 1)[:, None], axis=1)[:, 0]
+    prev_close_adjusted = adjust_prev_close(last_close, matrix['dividend'], matrix['split_ratio'] if splits else None)
+
+    day_codes = pd.factorize(df['day'], sort=False)[0]
+    open_price = matrix['open'][:, 0][day_codes]
+    prev_close_adjusted = prev_close_adjusted[day_codes]
+    close = df['close'].to_numpy()
+    vwap = df['vwap'].to_numpy()
+    sigma_open = df['sigma_open'].to_numpy()
+
+    batch = df[list(FEATURES)].copy()
+    batch['UB'] = np.maximum(open_price, prev_close_adjusted) * (1 + band_mult * sigma_open)
+    batch['LB'] = np.minimum(open_price, prev_close_adjusted) * (1 - band_mult * sigma_open)
+    batch['signal'] = np.select([(close > batch['UB']) & (close > vwap), (close < batch['LB']) & (close < vwap)],
+                                [1, -1], 0)
+    return batch
+
+
+def run(n_years=1, band_mult=1, seed=0):
+    bars = make_split_bars(252 * n_years, seed)
+    df = build_intraday_features(bars)
+    batch = batch_signal(df, band_mult)
+
+    started = time.perf_counter()
+    stream = replay_noise_band(bars, band_mult=band_mult)
+    elapsed = time.perf_counter() - started
+
+    assert (stream.index == batch.index).all()
+    for name in (*FEATURES, 'UB', 'LB'):
+        np.testing.assert_allclose(stream[name].to_numpy(), batch[name].to_numpy(), rtol=1e-9, equal_nan=True,
+                                   err_msg=name)
+    np.testing.assert_array_equal(stream['signal'].to_numpy(), batch['signal'].to_numpy())
+
+    # The split must matter: without it the bands of the split day would be off.
+    unadjusted = batch_signal(df, band_mult, splits=False)
+    moved = (~np.isclose(unadjusted['UB'], batch['UB'], equal_nan=True)
+             | ~np.isclose(unadjusted['LB'], batch['LB'], equal_nan=True)).sum()
+    n_dividends = bars.groupby(bars['caldt'].dt.date)['dividend'].first().astype(bool).sum()
+    print(f"{len(bars):,} bars, {n_dividends} dividends, 1 split: streaming matches batch bar for bar "
+          f"({(stream['signal'] != 0).mean():.1%} of bars with a signal)")
+    print(f"The split adjustment moves the bands of {moved} bars")
+    print(f"streaming: {elapsed:.2f} s ({len(bars) / elapsed:,.0f} bars/s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=1)
+    parser.add_argument('--band-mult', type=float, default=1)
+    args = parser.parse_args()
+    run(args.years, args.band_mult)
@@ -0,0 +1,274 @@
+"""
+Local fake of the Polygon.io REST endpoints used by polygon_helpers, and an offline check of its fetchers.
+
+FakePolygonServer serves seeded synthetic tickers from a local HTTP server: minute and day aggregates with next_url
+pagination (pre- and post-market bars included, as the API returns them) and reference data such as dividends.
+Every request can be delayed by a fixed latency, and the server counts requests and the most requests in flight
+at once.
+
+Running this file points polygon_helpers at the fake server and checks that:
+- a sub-range (concurrent) download, a one-chain (free tier) download, a daily download and a cached download
+  give the bars of the synthetic data, and the free-tier budget is not spent on sub-ranges,
+- fetch_polygon_data_many never has more than MAX_WORKERS requests in flight, so the session's connection pool
+  is never full,
+- dividends are decoded.
+
+Usage:
+    python research-strategies/benchmarks/fake_polygon_server.py [--latency 0.05]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'papers_strategy',
+                                'intraday_momentum_spy_strategy'))
+import polygon_helpers
+
+API_KEY = 'fake-key'
+
+# Pre- and post-market minutes the API returns around the 09:30-15:59 session, on every day.
+EXTENDED_MINUTES = 30
+
+
+def make_ticker(n_days, seed=0, start='2023-01-03'):
+    """Random-walk minute bars of one synthetic ticker on business days, pre- and post-market included and a few
+       minutes missing, with a dividend every quarter. Returns (bars, dividends): the bars in the fetch_polygon_data
+       layout and the dividends in the fetch_polygon_dividends layout.
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start, periods=n_days)
+    minutes = np.arange(570 - EXTENDED_MINUTES, 960 + EXTENDED_MINUTES)
+    caldt = (days.values[:, None] + minutes[None, :] * np.timedelta64(1, 'm')).ravel()
+    close = np.round(rng.uniform(50, 400) * np.exp(np.cumsum(rng.normal(0, 5e-4, len(caldt)))), 2)
+    open_ = np.r_[close[0], close[:-1]]
+    bars = pd.DataFrame({'volume': rng.integers(100, 10000, len(caldt)).astype(float), 'open': open_,
+                         'high': np.maximum(open_, close) + 0.01, 'low': np.minimum(open_, close) - 0.01,
+                         'close': close, 'caldt': caldt})
+    bars = bars[rng.random(len(bars)) >= 0.001].reset_index(drop=True)
+    dividends = pd.DataFrame({'caldt': days[30::63], 'dividend': 0.5})
+    return bars, dividends
+
+
+def session_bars(bars, start_date=None, end_date=None):
+    """Regular-session (09:30 to 15:59) bars between two dates, as fetch_polygon_data returns minute bars."""
+    time_of_day = bars['caldt'] - bars['caldt'].dt.normalize()
+    keep = (time_of_day >= pd.Timedelta(minutes=570)) & (time_of_day <= pd.Timedelta(minutes=959))
+    days = bars['caldt'].dt.normalize()
+    if start_date is not None:
+        keep &= (days >= pd.Timestamp(start_date)) & (days <= pd.Timestamp(end_date))
+    return bars[keep].reset_index(drop=True)
+
+
+def daily_bars(bars):
+    """Daily bars of the regular session, stamped at midnight, as fetch_polygon_data returns day bars."""
+    bars = session_bars(bars)
+    grouped = bars.groupby(bars['caldt'].dt.normalize(), sort=True)
+    daily = pd.DataFrame({'volume': grouped['volume'].sum(), 'open': grouped['open'].first(),
+                          'high': grouped['high'].max(), 'low': grouped['low'].min(),
+                          'close': grouped['close'].last()})
+    daily['caldt'] = daily.index.values
+    return daily.reset_index(drop=True)
+
+
+def dividend_entries(dividends):
+    """Dividends (fetch_polygon_dividends layout) as /v3/reference/dividends results."""
+    return [{'ex_dividend_date': f'{day:%Y-%m-%d}', 'cash_amount': amount}
+            for day, amount in zip(dividends['caldt'], dividends['dividend'])]
+
+
+def _epoch_ms(caldt):
+    """Epoch milliseconds of naive New York times (a Series or a scalar)."""
+    if isinstance(caldt, pd.Series):
+        return caldt.dt.tz_localize('America/New_York').astype('datetime64[ns, UTC]').astype(np.int64) // 10 ** 6
+    return pd.Timestamp(caldt).tz_localize('America/New_York').value // 10 ** 6
+
+
+def _entries(bars):
+    """Bars as Polygon aggregate entries, and their timestamps as an int64 array."""
+    timestamps = _epoch_ms(bars['caldt']).to_numpy()
+    entries = [{'v': v, 'o': o, 'h': h, 'l': l, 'c': c, 't': t}
+               for v, o, h, l, c, t in zip(bars['volume'].tolist(), bars['open'].tolist(), bars['high'].tolist(),
+                                           bars['low'].tolist(), bars['close'].tolist(), timestamps.tolist())]
+    return entries, timestamps
+
+
+class FakePolygonServer:
+    """Threaded HTTP server answering /v2/aggs and /v3/reference/{kind} for tickers.
+       tickers: dict of ticker -> (bars, reference): every minute bar the API knows (fetch_polygon_data layout,
+                extended hours included) and a dict of kind (e.g. 'dividends') -> list of reference results.
+       latency: seconds every request waits before answering.
+    """
+
+    def __init__(self, tickers, latency=0.0):
+        self.latency = latency
+        self.data = {}
+        for ticker, (bars, reference) in tickers.items():
+            self.data[ticker] = {'minute': _entries(bars), 'day': _entries(daily_bars(bars)),
+                                 'reference': reference}
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return False
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests = 0
+            self.max_in_flight = 0
+
+    def _aggregates(self, path, query):
+        """One page of aggregates: /v2/aggs/ticker/{ticker}/range/1/{timespan}/{start}/{end}."""
+        ticker, timespan, start, end = path[4], path[7], path[8], path[9]
+        entries, timestamps = self.data[ticker]['minute' if timespan == 'minute' else 'day']
+        first = np.searchsorted(timestamps, _epoch_ms(start))
+        last = np.searchsorted(timestamps, _epoch_ms(pd.Timestamp(end) + pd.Timedelta(days=1)))
+        limit = int(query.get('limit', ['5000'])[0])
+        offset = first + int(query.get('cursor', ['0'])[0])
+        results = entries[offset:min(offset + limit, last)]
+        body = {'status': 'OK', 'resultsCount': len(results), 'results': results}
+        if offset + limit < last:
+            body['next_url'] = (f"{self.base_url}{'/'.join(path)}?cursor={offset + limit - first}&limit={limit}"
+                                f"&adjusted={query.get('adjusted', ['false'])[0]}&sort=asc")
+        return body
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    time.sleep(server.latency)
+                    url = urlparse(self.path)
+                    query = parse_qs(url.query)
+                    path = url.path.split('/')
+                    if query.get('apiKey') != [API_KEY]:
+                        status, body = 401, {'status': 'ERROR', 'error': 'Unknown API Key'}
+                    elif url.path.startswith('/v2/aggs/ticker/'):
+                        status, body = 200, server._aggregates(path, query)
+                    elif url.path.startswith('/v3/reference/'):
+                        reference = server.data[query['ticker'][0]]['reference']
+                        status, body = 200, {'status': 'OK', 'results': reference.get(path[-1], [])}
+                    else:
+                        status, body = 404, {'status': 'ERROR', 'error': f'Unknown path {url.path}'}
+                    payload = json.dumps(body).encode()
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class _PoolWarnings(logging.Handler):
+    """Collects the 'Connection pool is full' warnings of urllib3."""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        if 'pool is full' in record.getMessage():
+            self.messages.append(record.getMessage())
+
+
+def point_at(server, cache_dir):
+    """Send the requests of polygon_helpers to server, with its Parquet cache in cache_dir."""
+    polygon_helpers.API_KEY = API_KEY
+    polygon_helpers.BASE_URL = server.base_url
+    polygon_helpers.CACHE_DIR = cache_dir
+
+
+def run(latency=0.05, n_tickers=4, n_days=126):
+    bars = {f'TICK{i:03d}': make_ticker(n_days, seed=i) for i in range(n_tickers)}
+    tickers = {ticker: (minutes, {'dividends': dividend_entries(dividends)})
+               for ticker, (minutes, dividends) in bars.items()}
+    names = list(tickers)
+    minutes = bars[names[0]][0]
+    start_date = f"{minutes['caldt'].iloc[0]:%Y-%m-%d}"
+    end_date = f"{minutes['caldt'].iloc[-1]:%Y-%m-%d}"
+    expected = session_bars(minutes, start_date, end_date)
+
+    pool_warnings = _PoolWarnings()
+    logging.getLogger('urllib3').addHandler(pool_warnings)
+    with FakePolygonServer(tickers, latency) as server, tempfile.TemporaryDirectory() as cache_dir:
+        point_at(server, cache_dir)
+
+        # Paid tier: sub-ranges fetched concurrently.
+        polygon_helpers.set_rate_limit(1000, 1)
+        started = time.perf_counter()
+        concurrent = polygon_helpers.fetch_polygon_data(names[0], start_date, end_date, 'minute', use_cache=False)
+        t_concurrent = time.perf_counter() - started
+        pd.testing.assert_frame_equal(concurrent, expected, check_dtype=False)
+        print(f"sub-ranges, {polygon_helpers.MAX_WORKERS} workers: {server.requests} requests, "
+              f"{t_concurrent:.2f} s, at most {server.max_in_flight} in flight")
+
+        # Free tier: one paginated chain, which fits in the burst of 5 requests.
+        server.reset_counts()
+        polygon_helpers.set_rate_limit(polygon_helpers.RATE_LIMIT_REQUESTS, polygon_helpers.RATE_LIMIT_PERIOD)
+        started = time.perf_counter()
+        chain = polygon_helpers.fetch_polygon_data(names[0], start_date, end_date, 'minute', use_cache=False)
+        t_chain = time.perf_counter() - started
+        pd.testing.assert_frame_equal(chain, expected, check_dtype=False)
+        assert server.max_in_flight == 1 and server.requests <= polygon_helpers.RATE_LIMIT_REQUESTS
+        print(f"free tier, one chain: {server.requests} requests, {t_chain:.2f} s")
+        daily = polygon_helpers.fetch_polygon_data(names[0], start_date, end_date, 'day', use_cache=False)
+        pd.testing.assert_frame_equal(daily, daily_bars(minutes), check_dtype=False)
+
+        # Several tickers at once share MAX_WORKERS; the second pass is served from the cache.
+        polygon_helpers.set_rate_limit(1000, 1)
+        server.reset_counts()
+        many = polygon_helpers.fetch_polygon_data_many(names, start_date, end_date, 'minute')
+        assert server.max_in_flight <= polygon_helpers.MAX_WORKERS, server.max_in_flight
+        for ticker in names:
+            pd.testing.assert_frame_equal(many[ticker], session_bars(bars[ticker][0], start_date, end_date),
+                                          check_dtype=False)
+        print(f"{n_tickers} tickers: {server.requests} requests, at most {server.max_in_flight} in flight")
+        server.reset_counts()
+        cached = polygon_helpers.fetch_polygon_data_many(names, start_date, end_date, 'minute')
+        assert server.requests == 0
+        for ticker in names:
+            pd.testing.assert_frame_equal(cached[ticker], many[ticker])
+        assert not pool_warnings.messages, pool_warnings.messages[:1]
+
+        dividends = polygon_helpers.fetch_polygon_dividends(names[0])
+        pd.testing.assert_frame_equal(dividends, bars[names[0]][1], check_dtype=False)
+    print("All checks passed.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds every request waits on the server')
+    run(parser.parse_args().latency)
@@ -0,0 +1,169 @@
+"""
+Benchmark suite of the intraday momentum pipeline (intraday_momentum_spy.py) on seeded synthetic data.
+
+Times every stage of the pipeline on the same synthetic SPY-like minute bars, dividends and daily bars from
+synthetic_data.py: the decoding of Polygon pages done by fetch_polygon_data, the step-2 feature build (with the
+per-day corporate actions), the step-3 backtest and the step-4 stats and bootstrap intervals. Each benchmark
+records its best time over a few repeats, its throughput (bars or days per second) and its peak traced memory.
+Results can be saved as JSON and compared with an earlier run, so that slowdowns and memory growth show up as
+regressions.
+
+Usage:
+    python research-strategies/benchmarks/run_suite.py [--years 2] [--repeat 3] [--save results.json]
+                                                       [--compare baseline.json] [--tolerance 0.25]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'papers_strategy',
+                                'intraday_momentum_spy_strategy'))
+from bar_store import BarStore
+from bootstrap_helpers import bootstrap_stats
+from corporate_actions import CorporateActions
+from momentum_helpers import backtest_intraday_momentum, build_day_matrix, build_intraday_features
+from polygon_helpers import _decode_bars
+from report_helpers import report
+from synthetic_data import make_daily_bars, make_minute_bars, make_polygon_pages
+
+# Settings of step 3 in intraday_momentum_spy.py.
+BACKTEST_PARAMS = {'AUM_0': 100000.0, 'commission': 0.0035, 'min_comm_per_order': 0.35, 'band_mult': 1,
+                   'trade_freq': 30, 'sizing_type': 'vol_target', 'target_vol': 0.02, 'max_leverage': 4}
+
+DISPLAY_OPTIONS = ('display.float_format', '{:,.3f}'.format, 'display.width', 120, 'display.max_columns', None)
+
+
+def decode(data):
+    """Decoding of the Polygon pages of fetch_polygon_data (session filter included)."""
+    return pd.concat([_decode_bars(page, 'minute') for page in data['pages']], ignore_index=True)
+
+
+def features(data):
+    """Step 2: BarStore, intraday features and the per-day corporate actions."""
+    df = build_intraday_features(BarStore.from_frame(data['bars'], tick_size=0.01))
+    return df, CorporateActions.from_polygon(df['day'].unique(), data['dividends'])
+
+
+def backtest(data):
+    """Step 3: daily returns, day matrix and backtest kernel."""
+    df_daily = data['daily'].copy()
+    df_daily['caldt'] = pd.to_datetime(df_daily['caldt']).dt.date
+    df_daily.set_index('caldt', inplace=True)
+    df_daily['ret'] = df_daily['close'].diff() / df_daily['close'].shift()
+    df, actions = data['features']
+    return backtest_intraday_momentum(build_day_matrix(df, actions=actions), df_daily['ret'], **BACKTEST_PARAMS)
+
+
+def stats(data):
+    """Step 4: summary stats of the strat DataFrame, headless."""
+    return report(data['strat'].copy(), AUM_0=BACKTEST_PARAMS['AUM_0'], commission=BACKTEST_PARAMS['commission'])
+
+
+def bootstrap(data):
+    """Step 4: 10,000 stationary block-bootstrap resamples of the daily returns."""
+    return bootstrap_stats(data['strat']['ret'], n_resamples=10000, benchmark_ret=data['strat']['ret_spy'], seed=0)
+
+
+# name -> (stage function, unit of the throughput, function of the data giving the number of units).
+BENCHMARKS = {
+    'decode': (decode, 'bars', lambda data: sum(map(len, data['pages']))),
+    'features': (features, 'bars', lambda data: len(data['bars'])),
+    'backtest': (backtest, 'bars', lambda data: len(data['bars'])),
+    'stats': (stats, 'days', lambda data: len(data['strat'])),
+    'bootstrap': (bootstrap, 'days', lambda data: 10000 * len(data['strat'])),
+}
+
+
+def make_data(n_years, seed=0):
+    """Inputs of every stage: Polygon pages, minute and daily bars, dividends, and the outputs of steps 2 and 3."""
+    bars, dividends = make_minute_bars(252 * n_years, seed=seed)
+    data = {'bars': bars, 'dividends': dividends, 'daily': make_daily_bars(bars), 'pages': make_polygon_pages(bars)}
+    data['features'] = features(data)
+    data['strat'] = backtest(data)
+    return data
+
+
+def measure(function, data, repeat=3):
+    """Best and mean wall time of function(data) over repeat runs, and its peak traced memory in a separate run."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(data)
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        function(data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), float(np.mean(times)), peak
+
+
+def run_suite(n_years=2, seed=0, repeat=3, names=None):
+    """Run the benchmarks (all by default) and return their results as a DataFrame indexed by name."""
+    data = make_data(n_years, seed)
+    rows = []
+    for name in names or BENCHMARKS:
+        function, unit, count = BENCHMARKS[name]
+        best, mean, peak = measure(function, data, repeat)
+        rows.append({'name': name, 'unit': unit, 'count': count(data), 'best_s': best, 'mean_s': mean,
+                     'per_s': count(data) / best, 'peak_mib': peak / 2 ** 20})
+    return pd.DataFrame(rows).set_index('name')
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Ratios of the results to a baseline run and whether each benchmark regressed: more than tolerance slower
+       in best time or higher in peak memory.
+    """
+    joined = results.join(baseline[['best_s', 'peak_mib']], rsuffix='_baseline', how='inner')
+    joined['time_ratio'] = joined['best_s'] / joined['best_s_baseline']
+    joined['memory_ratio'] = joined['peak_mib'] / joined['peak_mib_baseline']
+    joined['regression'] = (joined['time_ratio'] > 1 + tolerance) | (joined['memory_ratio'] > 1 + tolerance)
+    return joined[['best_s', 'best_s_baseline', 'time_ratio', 'peak_mib', 'peak_mib_baseline', 'memory_ratio',
+                   'regression']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=2, help='years of synthetic minute bars')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark (the best is kept)')
+    parser.add_argument('--only', nargs='*', choices=list(BENCHMARKS), help='benchmarks to run, all by default')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown or memory growth')
+    args = parser.parse_args()
+
+    results = run_suite(args.years, args.seed, args.repeat, args.only)
+    with pd.option_context(*DISPLAY_OPTIONS):
+        print(results)
+
+    if args.save:
+        meta = {'date': datetime.now().isoformat(timespec='seconds'), 'years': args.years, 'seed': args.seed,
+                'repeat': args.repeat, 'python': platform.python_version(), 'numpy': np.__version__,
+                'pandas': pd.__version__, 'machine': platform.platform()}
+        with open(args.save, 'w') as file:
+            json.dump({'meta': meta, 'results': results.reset_index().to_dict(orient='records')}, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = pd.DataFrame(json.load(file)['results']).set_index('name')
+        comparison = compare(results, baseline, args.tolerance)
+        with pd.option_context(*DISPLAY_OPTIONS):
+            print(comparison)
+        if comparison['regression'].any():
+            sys.exit(f"Regressions: {', '.join(comparison.index[comparison['regression']])}")
+
+
+if __name__ == '__main__':
+    main()
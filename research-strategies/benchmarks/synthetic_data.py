@@ -0,0 +1,143 @@
+"""
+Seeded synthetic market data for offline benchmarks, in the layouts of polygon_helpers.
+
+make_minute_bars draws regular-session minute bars with the features the pipelines care about: a trading calendar
+with holidays and early closes, overnight gaps, volatility regimes, U-shaped intraday volatility and volume, a few
+missing minutes, cent prices and quarterly dividends whose ex-dates open lower by the amount paid. The same seed
+always gives the same data, so timings and results can be compared across runs and machines.
+"""
+
+import numpy as np
+import pandas as pd
+
+MINUTES_PER_DAY = 390
+EARLY_CLOSE_MINUTES = 210  # 09:30 to 12:59.
+EXTENDED_HOURS_MINUTES = 60  # Pre- and post-market bars per side in make_polygon_pages.
+
+
+def trading_days(n_days, start='2010-01-04', seed=0, holiday_rate=0.035):
+    """n_days business days from start, skipping about holiday_rate of them as holidays."""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start, periods=int(n_days * (1 + 2 * holiday_rate)) + 10)
+    days = days[rng.random(len(days)) >= holiday_rate]
+    return days[:n_days]
+
+
+def make_minute_bars(n_days, seed=0, start='2010-01-04', price=None, annual_vol=0.18, gap_vol=0.005,
+                     early_close_rate=0.012, missing_rate=0.001, dividend_yield=0.015):
+    """Synthetic regular-session minute bars (fetch_polygon_data layout: volume, open, high, low, close, caldt).
+       price: first close (drawn from the seed if None). annual_vol: average intraday volatility, spread over days by a
+       persistent regime and within a day by a U-shaped profile. gap_vol: overnight gap volatility, with rare
+       jumps. early_close_rate: share of days ending at 12:59. missing_rate: share of minutes without a bar.
+       dividend_yield: yearly yield paid in quarterly dividends (see dividend_dates); the open of an ex-date gaps
+       down by the dividend.
+       Returns (bars, dividends), the dividends in the fetch_polygon_dividends layout (caldt, dividend).
+    """
+    rng = np.random.default_rng(seed)
+    days = trading_days(n_days, start, seed)
+    n_days = len(days)
+    minutes = np.arange(MINUTES_PER_DAY)
+
+    # Daily volatility regime (log-AR(1)) times the intraday U shape, normalized to annual_vol.
+    log_regime = np.zeros(n_days)
+    shocks = rng.normal(0, 0.08, n_days)
+    for d in range(1, n_days):
+        log_regime[d] = 0.97 * log_regime[d - 1] + shocks[d]
+    profile = 1 + 1.5 * np.exp(-minutes / 20) + 0.6 * np.exp(-(MINUTES_PER_DAY - 1 - minutes) / 20)
+    profile /= np.sqrt(np.mean(profile ** 2))
+    minute_vol = annual_vol / np.sqrt(252 * MINUTES_PER_DAY) * np.exp(log_regime)[:, None] * profile[None, :]
+    returns = rng.standard_t(5, (n_days, MINUTES_PER_DAY)) * np.sqrt(3 / 5) * minute_vol
+
+    # Overnight gaps with occasional jumps.
+    gaps = rng.normal(0, gap_vol, n_days) + np.where(rng.random(n_days) < 0.01, rng.normal(0, 4 * gap_vol, n_days), 0)
+    gaps[0] = 0.0
+    returns[:, 0] += gaps
+    first_close = rng.uniform(50, 400) if price is None else price
+    close = first_close * np.exp(np.cumsum(returns.ravel())).reshape(n_days, MINUTES_PER_DAY)
+
+    # Every ex-date pays about dividend_yield / 4 of the previous close and scales all later prices down by it.
+    ex_dates = dividend_dates(days)
+    paid = np.zeros(n_days)
+    paid[ex_dates] = dividend_yield / 4 * rng.uniform(0.9, 1.1, len(ex_dates))
+    close *= np.cumprod(1 - paid)[:, None]
+    previous_close = np.r_[first_close, close[:-1, -1]]
+    dividends = pd.DataFrame({'caldt': days[ex_dates], 'dividend': np.round(previous_close[ex_dates]
+                                                                            * paid[ex_dates], 4)})
+
+    open_ = np.empty_like(close)
+    open_[:, 1:] = close[:, :-1]
+    open_[:, 0] = close[:, 0] * np.exp(-rng.normal(0, 0.3, n_days) * minute_vol[:, 0])
+    wick = np.abs(rng.normal(0, 0.5, (2, n_days, MINUTES_PER_DAY))) * minute_vol
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = np.round(rng.lognormal(np.log(2e4), 0.6, (n_days, MINUTES_PER_DAY))
+                      * (profile[None, :] ** 2) * np.exp(log_regime)[:, None])
+
+    # Early closes and missing minutes; the 09:30 bar is always there.
+    keep = rng.random((n_days, MINUTES_PER_DAY)) >= missing_rate
+    keep[(rng.random(n_days) < early_close_rate)[:, None] & (minutes >= EARLY_CLOSE_MINUTES)[None, :]] = False
+    keep[:, 0] = True
+
+    caldt = (days.values.astype('datetime64[m]')[:, None] + np.timedelta64(570, 'm') + minutes[None, :])
+    bars = pd.DataFrame({'volume': volume[keep], 'open': np.round(open_[keep], 2), 'high': np.round(high[keep], 2),
+                         'low': np.round(low[keep], 2), 'close': np.round(close[keep], 2),
+                         'caldt': caldt[keep].astype('datetime64[ns]')})
+    return bars, dividends
+
+
+def dividend_dates(days):
+    """Positions in days of quarterly ex-dividend dates: the first trading day on or after the 15th of March,
+       June, September and December.
+    """
+    days = pd.DatetimeIndex(days)
+    quarters = pd.date_range(days[0].replace(day=1), days[-1], freq='MS')
+    quarters = quarters[quarters.month % 3 == 0] + pd.Timedelta(days=14)
+    positions = days.searchsorted(quarters)
+    return positions[positions < len(days)]
+
+
+def make_daily_bars(minute_bars):
+    """Daily bars (fetch_polygon_data 'day' layout, caldt at midnight) aggregated from minute bars."""
+    day = minute_bars['caldt'].dt.normalize()
+    grouped = minute_bars.groupby(day, sort=True)
+    daily = pd.DataFrame({'volume': grouped['volume'].sum(), 'open': grouped['open'].first(),
+                          'high': grouped['high'].max(), 'low': grouped['low'].min(),
+                          'close': grouped['close'].last()})
+    daily['caldt'] = daily.index.values
+    return daily.reset_index(drop=True)
+
+
+def make_universe(n_tickers, n_years, seed=0, start='2010-01-04'):
+    """Minute bars and dividends of n_tickers synthetic tickers (TICK000, ...) over n_years, each with its own
+       seed derived from seed. Returns a dict of ticker -> (bars, dividends).
+    """
+    return {f'TICK{i:03d}': make_minute_bars(252 * n_years, seed=seed * 1000 + i, start=start)
+            for i in range(n_tickers)}
+
+
+def make_polygon_pages(minute_bars, page_size=50000, seed=0):
+    """The minute bars as pages of Polygon aggregate results ({'v', 'o', 'h', 'l', 'c', 't'} entries, t in epoch
+       milliseconds), with EXTENDED_HOURS_MINUTES of pre- and post-market bars on every day as the API returns them,
+       for benchmarking the decoding of fetch_polygon_data.
+    """
+    rng = np.random.default_rng(seed)
+    day = minute_bars['caldt'].dt.normalize()
+    first = minute_bars.groupby(day, sort=True).head(1)
+    last = minute_bars.groupby(day, sort=True).tail(1)
+    extended = []
+    # Pre-market bars end at 09:29 and post-market bars start at 16:00, also after early closes.
+    sessions = ((first, 570 - EXTENDED_HOURS_MINUTES), (last, 960))
+    for rows, start_minute in sessions:
+        for minute in range(start_minute, start_minute + EXTENDED_HOURS_MINUTES):
+            bars = rows.copy()
+            bars['caldt'] = bars['caldt'].dt.normalize() + pd.Timedelta(minutes=minute)
+            bars['volume'] = np.round(rng.lognormal(np.log(500), 0.8, len(bars)))
+            extended.append(bars)
+    bars = pd.concat([minute_bars, *extended], ignore_index=True).sort_values('caldt', kind='stable')
+
+    timestamps = (bars['caldt'].dt.tz_localize('America/New_York').dt.tz_convert('UTC')
+                  .astype('datetime64[ns, UTC]').astype(np.int64) // 10 ** 6)
+    entries = [{'v': v, 'o': o, 'h': h, 'l': l, 'c': c, 't': t}
+               for v, o, h, l, c, t in zip(bars['volume'].tolist(), bars['open'].tolist(), bars['high'].tolist(),
+                                           bars['low'].tolist(), bars['close'].tolist(), timestamps.tolist())]
+    return [entries[i:i + page_size] for i in range(0, len(entries), page_size)]
@@ -0,0 +1,120 @@
+"""
+Vectorized gap-fade backtests of study3_consolidator.py over grids of gap thresholds and exit times.
+
+Study3Consolidator decides once a day, at 09:31: short if the first minute opens at least 1% above the previous
+close, long if it closes at least 1% below, and it liquidates 15 minutes before the close. Everything it needs is
+one row per day: the previous close, the first bar's open and close, and the price at each candidate exit time.
+build_gap_table computes that table once; the directions of every threshold and the exits of every exit time
+then broadcast against it, and one cash recursion steps through the days for all tickers and parameters at once.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+INTRADAY_HELPERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'papers_strategy',
+                                    'intraday_momentum_spy_strategy')
+if INTRADAY_HELPERS_DIR not in sys.path:
+    sys.path.append(INTRADAY_HELPERS_DIR)
+from analytics_helpers import summary_stats  # noqa: E402
+from round_trip_helpers import align_days, daily_returns, session_matrix, simulate_round_trips  # noqa: E402
+
+
+def build_gap_table(df, exit_minutes=(15,)):
+    """Per-day prices of the gap strategy from regular-session minute bars.
+       df: minute bars as returned by fetch_polygon_data (volume, open, high, low, close, caldt).
+       exit_minutes: exits to price, in minutes before the close (the end of the day's last bar, so early
+                     closes are covered). Like a scheduled liquidation on the local QuantConnect stand-in, an exit
+                     fills at the last close known before that time.
+       Returns a dict with 'all_days' (datetime64[D]), 'prev_close' (last close of the previous trading day, NaN
+       on the first two days like study3's RollingWindow(2) of daily bars, which is ready from the third day),
+       'open' and 'entry_price' (open and close of the 09:30 bar, NaN if missing), 'exit_price'
+       (days x exit_minutes, NaN when the exit would come before the entry) and 'exit_minutes'.
+    """
+    if not df['caldt'].is_monotonic_increasing:
+        df = df.sort_values('caldt')
+    caldt = df['caldt'] if df['caldt'].dtype.kind == 'M' else pd.to_datetime(df['caldt'])
+    matrix = session_matrix(caldt.to_numpy(),
+                            {'open': df['open'].to_numpy(dtype=float), 'close': df['close'].to_numpy(dtype=float)})
+    valid, close = matrix['valid'], matrix['close']
+    columns = np.arange(valid.shape[1])
+
+    # Last bar of each day, and for every column the last bar at or before it (-1 if none).
+    last_bar = valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    last_before = np.maximum.accumulate(np.where(valid, columns, -1), axis=1)
+    last_close = close[np.arange(len(close)), last_bar]
+
+    # The liquidation at close - n minutes runs before the bar ending then, at the close of the bar before it.
+    exit_minutes = np.asarray(exit_minutes, dtype=np.int64)
+    exit_column = last_bar[:, None] - exit_minutes[None, :] - 1
+    exit_bar = np.where(exit_column >= 0, np.take_along_axis(last_before, np.maximum(exit_column, 0), axis=1), -1)
+    exit_price = np.where(exit_bar >= 0, np.take_along_axis(close, np.maximum(exit_bar, 0), axis=1), np.nan)
+
+    prev_close = np.full(len(close), np.nan)
+    prev_close[2:] = last_close[1:-1]
+    return {'all_days': matrix['all_days'], 'prev_close': prev_close, 'open': matrix['open'][:, 0],
+            'entry_price': close[:, 0], 'exit_price': exit_price, 'exit_minutes': exit_minutes}
+
+
+def gap_directions(table, thresholds):
+    """Direction of every day for every gap threshold, (thresholds x days): -1 (fade a gap up) when the first
+       bar opens at or above (1 + threshold) x the previous close, else 1 (fade a gap down) when it closes at or
+       below (1 - threshold) x the previous close, 0 otherwise or when a price is missing.
+    """
+    thresholds = np.asarray(thresholds, dtype=float)[:, None]
+    prev_close = table['prev_close'][None, :]
+    direction = np.zeros((thresholds.shape[0], prev_close.shape[1]), dtype=np.int8)
+    gap_down = table['entry_price'][None, :] <= (1 - thresholds) * prev_close
+    gap_up = table['open'][None, :] >= (1 + thresholds) * prev_close
+    direction[gap_down] = 1
+    direction[gap_up] = -1
+    return direction
+
+
+def gap_grid(tables, thresholds, exit_minutes, all_days):
+    """Directions, entry and exit prices of some tickers for every gap threshold and exit time, on the common
+       calendar all_days: direction is (tickers x thresholds x exits x days), entry_price (tickers x 1 x 1 x days)
+       and exit_price (tickers x 1 x exits x days), which broadcast against it. Each table must price the exits
+       in exit_minutes.
+    """
+    direction = np.zeros((len(tables), len(thresholds), len(exit_minutes), len(all_days)), dtype=np.int8)
+    entry_price = np.full((len(tables), 1, 1, len(all_days)), np.nan)
+    exit_price = np.full((len(tables), 1, len(exit_minutes), len(all_days)), np.nan)
+    for t, table in enumerate(tables):
+        days = table['all_days']
+        exit_price[t, 0] = align_days(days, table['exit_price'].T, all_days, np.nan)  # exits x days
+        entry_price[t, 0, 0] = align_days(days, table['entry_price'], all_days, np.nan)
+        directions = align_days(days, gap_directions(table, thresholds), all_days, 0)  # thresholds x days
+        direction[t] = np.where(np.isnan(exit_price[t]), 0, directions[:, None, :])
+    return direction, entry_price, exit_price
+
+
+def sweep_gap_fade(tickers, load_bars, thresholds=(0.01,), exit_minutes=(15,), all_days=None, cash=100000.0,
+                   **fee_params):
+    """Backtest the gap fade for every ticker, gap threshold and exit time, each run with its own capital.
+       load_bars: callable ticker -> minute bars (fetch_polygon_data layout); tickers are loaded one at a time
+       and reduced to their gap table, so memory stays at one (days x minutes) matrix plus the per-day results.
+       thresholds: gaps as fractions of the previous close (0.01 is study3's 1%).
+       exit_minutes: exits in minutes before the close (15 is study3's).
+       all_days: common calendar, the union of the tickers' days by default.
+       fee_params: free_portfolio_value_percentage, per_share, minimum and maximum_rate of simulate_round_trips.
+       Returns (stats, equity): a DataFrame of summary_stats indexed by (ticker, threshold, exit_minutes), and the
+       end-of-day equity of every run (days x runs, same column order).
+    """
+    tables = [build_gap_table(load_bars(ticker), exit_minutes) for ticker in tickers]
+    if all_days is None:
+        all_days = np.unique(np.concatenate([table['all_days'] for table in tables]))
+    all_days = np.asarray(all_days, dtype='datetime64[D]')
+
+    direction, entry_price, exit_price = gap_grid(tables, thresholds, exit_minutes, all_days)
+    equity, _, _ = simulate_round_trips(direction, entry_price, exit_price, cash, **fee_params)
+    equity = equity.reshape(-1, len(all_days))
+
+    index = pd.MultiIndex.from_product([list(tickers), list(thresholds), list(exit_minutes)],
+                                       names=['ticker', 'threshold', 'exit_minutes'])
+    with np.errstate(divide='ignore', invalid='ignore'):  # Runs that never trade have no volatility.
+        stats = pd.DataFrame(summary_stats(daily_returns(equity, cash), equity=equity), index=index)
+    equity = pd.DataFrame(equity.T, index=pd.DatetimeIndex(all_days, name='day'), columns=index)
+    return stats, equity
@@ -8,6 +8,7 @@ and is above its moving average, indicating upward momentum.
 
 # region imports
 from AlgorithmImports import *
+import math
 from collections import deque
 # endregion
 
@@ -30,6 +31,7 @@ class Study2Indicator(QCAlgorithm):
         - SPY daily data subscription
         - Historical data for SMA warm-up
         - Custom SMA indicator registration
+        - Rolling 52-week high/low indicator, warm started from history
         """
         self.set_start_date(2017,1,1)
         self.set_cash(10000)
@@ -46,6 +48,12 @@ class Study2Indicator(QCAlgorithm):
         # Custom SMA indicator
         self.sma_custom = CustomSimpleMovingAverage() 
         self.register_indicator(self.spy.symbol, self.sma_custom, resolution=Resolution.DAILY)
+
+        # 52-week high/low kept up to date with each daily bar, warm started from one history request
+        self._range = self.RollingRange("52w", span=timedelta(365))
+        hist = self.history(self.spy.symbol, timedelta(365), Resolution.DAILY)
+        self._range.warm_up(hist.index.get_level_values('time'), hist['high'], hist['low'])
+        self.register_indicator(self.spy.symbol, self._range, resolution=Resolution.DAILY)
         
         
 
@@ -54,7 +62,7 @@ class Study2Indicator(QCAlgorithm):
         Main trading logic executed on each data update.
         
         Implements 52-week range trading strategy:
-        - Gets 52-week high and low from historical data
+        - Gets 52-week high and low from the rolling high/low indicator
         - Goes long when price is within 5% of 52-week high and above SMA
         - Liquidates positions otherwise
         - Plots key metrics for analysis
@@ -65,11 +73,9 @@ class Study2Indicator(QCAlgorithm):
         if not self._sma.is_ready:
             return
 
-        hist = self.history(self.spy.symbol, timedelta(365), Resolution.DAILY)
-
-        # high inefficient, every day I call the self.histry method
-        low = min(hist['low'])
-        high = max(hist['high'])
+        # same window as history(timedelta(365)), without a history request per bar
+        low = self._range.low
+        high = self._range.high
 
         holding = self.securities[self.spy.symbol]
         price = holding.price
@@ -97,7 +103,8 @@ class Study2Indicator(QCAlgorithm):
         Custom Simple Moving Average indicator implementation.
         
         This indicator calculates a simple moving average of closing prices
-        over a specified period using a deque for efficient FIFO operations.
+        over a specified period using a deque for efficient FIFO operations and
+        a running sum, so each update is O(1) instead of summing the whole window.
         """
         
         def __init__(self, name, period):
@@ -112,6 +119,8 @@ class Study2Indicator(QCAlgorithm):
             self.time = datetime.min
             self.value = 0
             self.queue = deque(maxlen=period)
+            self._sum = 0.0
+            self._updates = 0
 
         def update(self, input):
             """
@@ -123,9 +132,92 @@ class Study2Indicator(QCAlgorithm):
             Returns:
                 bool: True if the indicator has enough data to be valid, False otherwise
             """
+            # Subtract the close the full deque is about to drop, add the new one
+            if len(self.queue) == self.queue.maxlen:
+                self._sum -= self.queue[-1]
             self.queue.appendleft(input.close)
+            self._sum += input.close
+            # Re-sum once per period (amortized O(1)) so rounding errors do not accumulate
+            self._updates += 1
+            if self._updates % self.queue.maxlen == 0:
+                self._sum = math.fsum(self.queue)
             self.time = input.EndTime
             count = len(self.queue)
-            self.value = sum(self.queue) / count
+            self.value = self._sum / count
+            # returns true if ready
+            return (count == self.queue.maxlen)
+
+    class RollingRange(PythonIndicator):
+        """
+        Rolling high/low indicator over a time span, e.g. the 52-week range.
+        
+        The highs and the lows of the window are kept in two monotonic deques of (time, price):
+        every bar is pushed and dropped at most once, so each update is amortized O(1) instead of
+        a history request and a min/max over the whole window.
+        """
+        
+        def __init__(self, name, span):
+            """
+            Initialize the RollingRange indicator.
+            
+            Args:
+                name (str): The name of the indicator
+                span (timedelta): Bars within this span of the latest one are in the window
+            """
+            self.name = name
+            self.span = span
+            self.time = datetime.min
+            self.value = 0
+            self.high = 0
+            self.low = 0
+            self._first_time = None
+            self._highs = deque()
+            self._lows = deque()
+
+        def warm_up(self, times, highs, lows):
+            """
+            Feed a bulk history (oldest first) covering the whole span, as if each row were a bar.
+            
+            Args:
+                times: End times of the history rows
+                highs: High prices of the history rows
+                lows: Low prices of the history rows
+            """
+            for time, high, low in zip(times, highs, lows):
+                self._push(time, high, low)
+            if self._first_time is not None:
+                self._first_time = self.time - self.span
+
+        def update(self, input):
+            """
+            Update the indicator with new price data.
+            
+            Args:
+                input: The price bar containing the latest data
+                
+            Returns:
+                bool: True once the window spans the whole period, False otherwise
+            """
+            return self._push(input.end_time, input.high, input.low)
+
+        def _push(self, time, high, low):
+            if self._first_time is None:
+                self._first_time = time
+            # Drop the prices the new one dominates, then those that left the window
+            while self._highs and self._highs[-1][1] <= high:
+                self._highs.pop()
+            self._highs.append((time, high))
+            while self._lows and self._lows[-1][1] >= low:
+                self._lows.pop()
+            self._lows.append((time, low))
+            cutoff = time - self.span
+            while self._highs[0][0] <= cutoff:
+                self._highs.popleft()
+            while self._lows[0][0] <= cutoff:
+                self._lows.popleft()
+            self.time = time
+            self.high = self._highs[0][1]
+            self.low = self._lows[0][1]
+            self.value = self.high
             # returns true if ready
-            return (count == self.queue.maxlen)
\ No newline at end of file
+            return time - self._first_time >= self.span
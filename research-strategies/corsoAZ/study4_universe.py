@@ -8,6 +8,7 @@ It creates an equally-weighted portfolio of these 10 stocks.
 
 # region imports
 from AlgorithmImports import *
+import heapq
 # endregion
 
 class Study4Universe(QCAlgorithm):
@@ -49,6 +50,8 @@ class Study4Universe(QCAlgorithm):
         - Have price > $10
         - Have fundamental data available
         - Rebalances monthly (every 30 days)
+        A heap keeps the 200 largest in O(n log 200) instead of sorting the whole universe,
+        with the same result (and tie order) as sorting it.
         
         Args:
             coarse: List of CoarseFundamental objects
@@ -61,11 +64,9 @@ class Study4Universe(QCAlgorithm):
 
         self._rebalance_time = self.time + timedelta(30)
 
-        sorted_by_dollar_volume = sorted(coarse, key = lambda x: x.dollar_volume,
-                                            reverse = True)
-
-        return [x.symbol for x in sorted_by_dollar_volume if x.price > 10 
-                                    and x.has_fundamental_data][:200]
+        top_by_dollar_volume = heapq.nlargest(200, (x for x in coarse if x.price > 10 and x.has_fundamental_data),
+                                              key=lambda x: x.dollar_volume)
+        return [x.symbol for x in top_by_dollar_volume]
 
     def _fine_filter(self, fine):
         """
@@ -80,8 +81,9 @@ class Study4Universe(QCAlgorithm):
         Returns:
             List of 10 symbols with the smallest market cap
         """
-        sorted_by_PE = sorted(fine, key= lambda x: x.market_cap)
-        return [x.symbol for x in sorted_by_PE if x.market_cap > 0][:10]
+        smallest_by_market_cap = heapq.nsmallest(10, (x for x in fine if x.market_cap > 0),
+                                                 key=lambda x: x.market_cap)
+        return [x.symbol for x in smallest_by_market_cap]
 
     def on_securities_changed(self, changes):
         """
@@ -1,11 +1,9 @@
 # region imports
 from AlgorithmImports import *
-from nltk.sentiment import SentimentIntensityAnalyzer
 # endregion
 
 # region imports
 from AlgorithmImports import *
-from nltk.sentiment import SentimentIntensityAnalyzer
 # endregion
 
 class Study5CustomData(QCAlgorithm):
@@ -101,9 +99,17 @@ class MuskTweet(PythonData):
     
     The sentiment score is stored in the 'value' property, while the
     tweet content is stored in the 'Tweet_value' property.
+
+    On the local stand-in, read_points serves the tweets from the
+    sentiment cache of local_lean/lean_sentiment.py, scored once in
+    batch, instead of downloading and scoring the file on every backtest.
     """
 
-    sia = SentimentIntensityAnalyzer()
+    SOURCE = "https://www.dropbox.com/scl/fi/7ff4n6bvzqnpl2r1poayp/MuskTweetsPreProcessed.csv?rlkey=15aamdr7fz8tb38ebosfuao0q&e=2&st=2xdff53b&dl=1"
+    KEYWORDS = ("tsla", "tesla")
+
+    # NLTK analyzer, built on the first tweet to score
+    sia = None
 
     def get_source(self, config, date, is_live_mode):
         """
@@ -120,8 +126,7 @@ class MuskTweet(PythonData):
         Returns:
             SubscriptionDataSource: Data source for the Musk tweets
         """
-        source = "https://www.dropbox.com/scl/fi/7ff4n6bvzqnpl2r1poayp/MuskTweetsPreProcessed.csv?rlkey=15aamdr7fz8tb38ebosfuao0q&e=2&st=2xdff53b&dl=1"
-        return SubscriptionDataSource(source, SubscriptionTransportMedium.REMOTE_FILE)
+        return SubscriptionDataSource(self.SOURCE, SubscriptionTransportMedium.REMOTE_FILE)
 
     def reader(self, config, line, date, is_live_mode):
         """
@@ -155,7 +160,10 @@ class MuskTweet(PythonData):
             tweet.time = datetime.strptime(data[0], "%Y-%m-%d %H:%M:%S") + timedelta(minutes = 1)
             content = data[1].lower()
 
-            if "tsla" in content or "tesla" in content:
+            if any(keyword in content for keyword in self.KEYWORDS):
+                if MuskTweet.sia is None:
+                    from nltk.sentiment import SentimentIntensityAnalyzer
+                    MuskTweet.sia = SentimentIntensityAnalyzer()
                 tweet.value = self.sia.polarity_scores(content)["compound"]
             else:
                 tweet.value = 0
@@ -165,4 +173,34 @@ class MuskTweet(PythonData):
         except ValueError:
             return None
 
-        return tweet
\ No newline at end of file
+        return tweet
+
+    def read_points(self, config, start, end):
+        """
+        Return the tweets between start and end from the local sentiment cache.
+        
+        Used by the local QuantConnect stand-in in place of get_source/reader:
+        the tweet file is downloaded and scored once, in parallel, by
+        lean_sentiment.py; later backtests only binary-search the memory-mapped
+        cache by date. Times get the same 1-minute shift as in reader.
+        
+        Parameters:
+            config: Configuration for the data subscription
+            start: Start of the backtest
+            end: End of the backtest
+            
+        Returns:
+            list: MuskTweet objects in time order
+        """
+        from lean_sentiment import sentiment_cache
+
+        cache = sentiment_cache(self.SOURCE, keywords=self.KEYWORDS)
+        tweets = []
+        for time, score, content in cache.between(start - timedelta(minutes = 1), end - timedelta(minutes = 1)):
+            tweet = MuskTweet()
+            tweet.symbol = config.symbol
+            tweet.time = time + timedelta(minutes = 1)
+            tweet.value = score
+            tweet["Tweet_value"] = content
+            tweets.append(tweet)
+        return tweets
@@ -0,0 +1,183 @@
+"""
+Walk-forward optimization of the sma_length of study6_performance_analysis.py on local daily bars.
+
+The algorithm holds 80% SPY / 20% BND while SPY closes at or above its SMA and 20% / 80% below, rebalancing on a
+change of trend or when its 30-day cooldown runs out. Instead of one backtest per sma_length, the SMAs of every
+candidate length come from a single cumulative sum as a (lengths x days) matrix, and one pass over the days
+simulates all lengths at once with the same order sizing and fees as the local QuantConnect stand-in. Walk-forward
+windows pick the best length in-sample (in parallel) and chain the next out-of-sample periods into one equity curve.
+"""
+
+import os
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+INTRADAY_HELPERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'papers_strategy',
+                                    'intraday_momentum_spy_strategy')
+if INTRADAY_HELPERS_DIR not in sys.path:
+    sys.path.append(INTRADAY_HELPERS_DIR)
+from analytics_helpers import summary_stats  # noqa: E402
+from round_trip_helpers import daily_returns, order_fee  # noqa: E402
+
+DEFAULT_LENGTHS = np.arange(5, 201)
+
+# Worker-side inputs of the in-sample scoring: prices, SMA matrix and settings.
+_worker_inputs = None
+
+
+def sma_matrix(close, lengths):
+    """SMA of close for every length in one pass, (lengths x days), NaN until a length has enough values.
+       The window sums are differences of one cumulative sum, taken relative to the first close so that the
+       running total stays small.
+    """
+    close = np.asarray(close, dtype=float)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    base = close[0] if len(close) else 0.0
+    cumulative = np.r_[0.0, np.cumsum(close - base)]
+    ends = np.arange(1, len(close) + 1)
+    starts = ends[None, :] - lengths[:, None]
+    sums = cumulative[ends][None, :] - cumulative[np.maximum(starts, 0)]
+    sma = base + sums / lengths[:, None]
+    sma[starts < 0] = np.nan
+    return sma
+
+
+def allocation_inputs(spy, bnd, lengths=DEFAULT_LENGTHS):
+    """Align daily SPY and BND bars (fetch_polygon_data 'day' layout: caldt, close, ...) on their common calendar.
+       Returns a dict with the 'days' (datetime64[D]), their 'day_numbers', the last known 'spy' and 'bnd' closes
+       (0 before the first bar), the 'both' mask of days with a bar of each, the 'lengths' and the 'sma' matrix
+       of SPY (lengths x days; computed over SPY's own bars, NaN on days without one).
+    """
+    frames = {}
+    for name, df in (('spy', spy), ('bnd', bnd)):
+        df = df.sort_values('caldt')
+        frames[name] = pd.Series(df['close'].to_numpy(dtype=float),
+                                 index=pd.to_datetime(df['caldt']).to_numpy().astype('datetime64[D]'))
+    days = np.union1d(frames['spy'].index.to_numpy(), frames['bnd'].index.to_numpy()).astype('datetime64[D]')
+
+    inputs = {'days': days, 'day_numbers': days.astype(np.int64), 'lengths': np.asarray(lengths, dtype=np.int64)}
+    present = {}
+    for name, series in frames.items():
+        aligned = series.reindex(days)
+        present[name] = aligned.notna().to_numpy()
+        inputs[name] = aligned.ffill().fillna(0.0).to_numpy()
+    inputs['both'] = present['spy'] & present['bnd']
+    inputs['sma'] = np.full((len(lengths), len(days)), np.nan)
+    inputs['sma'][:, present['spy']] = sma_matrix(frames['spy'].to_numpy(), lengths)
+    return inputs
+
+
+def _set_holdings(target, cash, quantity, price, holdings_value, free_portfolio_value_percentage, fees):
+    """set_holdings(symbol, target) of the local stand-in for a batch of portfolios; returns (cash, quantity)."""
+    value = target * (cash + holdings_value) * (1 - free_portfolio_value_percentage)
+    order = np.trunc((value - quantity * price) / price)
+    fee = order_fee(order, price, **fees)
+    traded = order != 0
+    return np.where(traded, cash - (order * price + fee), cash), quantity + order
+
+
+def simulate_sma_allocation(inputs, sma, start=0, end=None, cash=100000.0, cooldown=30,
+                            free_portfolio_value_percentage=0.0025, **fees):
+    """Run study6's allocation for every row of sma (e.g. inputs['sma'] or a selection of its rows) over the days
+       start:end of inputs, each from cash and a fresh state (trend up, rebalance due), with whole shares and the
+       IB fee model like the local QuantConnect stand-in. fees: per_share, minimum and maximum_rate of order_fee.
+       Returns (equity, trend): the end-of-day equity and the held trend (1 up, 0 down) of every row.
+    """
+    end = len(inputs['days']) if end is None else end
+    spy_close, bnd_close, both = inputs['spy'], inputs['bnd'], inputs['both']
+    day_numbers = inputs['day_numbers']
+    runs = sma.shape[0]
+
+    cash = np.full(runs, float(cash))
+    spy_quantity = np.zeros(runs)
+    bnd_quantity = np.zeros(runs)
+    uptrend = np.ones(runs, dtype=bool)
+    rebalance_day = np.full(runs, np.iinfo(np.int64).min)
+    equity = np.empty((runs, end - start))
+    trend = np.empty((runs, end - start), dtype=np.int8)
+
+    for d in range(start, end):
+        spy, bnd = spy_close[d], bnd_close[d]
+        if both[d]:
+            ready = ~np.isnan(sma[:, d])
+            above = spy >= sma[:, d]
+            due = day_numbers[d] >= rebalance_day
+            rebalance = ready & np.where(above, due | ~uptrend, due | uptrend)
+            if rebalance.any():
+                # set_holdings(SPY, w) then set_holdings(BND, 1 - w), each at the portfolio value of the moment.
+                new_cash, new_spy = _set_holdings(np.where(above, 0.8, 0.2), cash, spy_quantity, spy,
+                                                  spy_quantity * spy + bnd_quantity * bnd,
+                                                  free_portfolio_value_percentage, fees)
+                cash, spy_quantity = np.where(rebalance, new_cash, cash), np.where(rebalance, new_spy, spy_quantity)
+                new_cash, new_bnd = _set_holdings(np.where(above, 0.2, 0.8), cash, bnd_quantity, bnd,
+                                                  spy_quantity * spy + bnd_quantity * bnd,
+                                                  free_portfolio_value_percentage, fees)
+                cash, bnd_quantity = np.where(rebalance, new_cash, cash), np.where(rebalance, new_bnd, bnd_quantity)
+                uptrend = np.where(rebalance, above, uptrend)
+                rebalance_day = np.where(rebalance, day_numbers[d] + cooldown, rebalance_day)
+        equity[:, d - start] = cash + (spy_quantity * spy + bnd_quantity * bnd)
+        trend[:, d - start] = uptrend
+    return equity, trend
+
+
+def _init_worker(inputs):
+    """Pool initializer: keep the prices and the SMA matrix in this worker."""
+    global _worker_inputs
+    _worker_inputs = inputs
+
+
+def _score_window(bounds):
+    """Metric of every length over the in-sample days start:end."""
+    start, end = bounds
+    inputs = _worker_inputs
+    equity, _ = simulate_sma_allocation(inputs, inputs['sma'], start, end, inputs['cash'], **inputs['params'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return summary_stats(daily_returns(equity, inputs['cash']), equity=equity)[inputs['metric']]
+
+
+def walk_forward_sma(spy, bnd, lengths=DEFAULT_LENGTHS, in_sample=756, out_of_sample=252, metric='sharpe_ratio',
+                     cash=100000.0, n_workers=None, **params):
+    """Walk-forward choice of study6's sma_length.
+       spy, bnd: daily bars of the two ETFs. lengths: candidate SMA lengths (5 to 200 days by default).
+       Every out_of_sample days, the length with the best metric (a summary_stats key, higher is better) over
+       the previous in_sample days trades the next out_of_sample days. In-sample runs start fresh, with SMAs
+       warm from the bars before them; each out-of-sample period restarts the strategy with the equity the
+       previous one ended with. The in-sample windows are scored across n_workers processes (all cores if
+       None, in process if 1). params: cooldown, free_portfolio_value_percentage and the fees of
+       simulate_sma_allocation.
+       Returns (windows, equity): a DataFrame with the dates, chosen length and in-sample metric of every
+       window, and the out-of-sample equity curve indexed by day.
+    """
+    inputs = allocation_inputs(spy, bnd, lengths)
+    inputs.update(cash=float(cash), metric=metric, params=params)
+    n_days = len(inputs['days'])
+    bounds = [(start, start + in_sample) for start in range(0, n_days - in_sample, out_of_sample)]
+    if not bounds:
+        raise ValueError(f"Walk-forward needs more than in_sample={in_sample} days, got {n_days}")
+
+    if n_workers == 1 or len(bounds) == 1:
+        _init_worker(inputs)
+        scores = [_score_window(window) for window in bounds]
+    else:
+        with Pool(n_workers, initializer=_init_worker, initargs=(inputs,)) as pool:
+            scores = pool.map(_score_window, bounds)
+
+    rows, curves = [], []
+    balance = float(cash)
+    for (start, end), score in zip(bounds, scores):
+        best = int(np.nanargmax(score)) if not np.isnan(score).all() else 0
+        oos_end = min(end + out_of_sample, n_days)
+        equity, _ = simulate_sma_allocation(inputs, inputs['sma'][best:best + 1], end, oos_end, balance, **params)
+        balance = equity[0, -1]
+        curves.append(equity[0])
+        rows.append({'in_sample_start': inputs['days'][start], 'in_sample_end': inputs['days'][end - 1],
+                     'out_of_sample_start': inputs['days'][end], 'out_of_sample_end': inputs['days'][oos_end - 1],
+                     'sma_length': int(inputs['lengths'][best]), metric: score[best]})
+
+    first_oos = bounds[0][1]
+    equity = pd.Series(np.concatenate(curves), name='equity',
+                       index=pd.DatetimeIndex(inputs['days'][first_oos:first_oos + sum(map(len, curves))], name='day'))
+    return pd.DataFrame(rows), equity
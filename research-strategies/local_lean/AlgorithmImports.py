@@ -0,0 +1,16 @@
+"""
+Local stand-in for QuantConnect's AlgorithmImports, so `from AlgorithmImports import *` works offline.
+Put this folder on sys.path (run_local.py does it) and run the algorithm with run_algorithm().
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from lean_algorithm import PortfolioTarget, QCAlgorithm, Security, SecurityChanges, run_algorithm
+from lean_data import (FrameData, PolygonCacheData, PythonData, Resolution, RollingWindow, Slice,
+                       SubscriptionDataSource, SubscriptionTransportMedium, Symbol, TradeBar, TradeBarConsolidator)
+from lean_fills import ConstantFeeModel, ConstantSlippageModel, InteractiveBrokersFeeModel, NullSlippageModel
+from lean_indicators import (ExponentialMovingAverage, IndicatorDataPoint, PythonIndicator, RollingHighLow,
+                             SimpleMovingAverage, StandardDeviation, VolumeWeightedAveragePriceIndicator)
+from lean_orders import (OrderDirection, OrderEvent, OrderResponse, OrderStatus, OrderTicket, OrderType,
+                         UpdateOrderFields)
+from lean_universe import Universe
@@ -0,0 +1,608 @@
+"""
+QCAlgorithm and the event loop of the offline QuantConnect stand-in.
+
+run_algorithm() calls initialize(), loads the subscribed bars from a local provider and replays them day by
+day: universe selection at midnight, then for every time step the due scheduled events, the resting orders,
+consolidators and indicators of each bar, and on_data(slice). Market orders fill at the last price and resting
+orders against the following bars (see lean_fills); there are no margin checks.
+"""
+
+import bisect
+from datetime import datetime, timedelta, time
+
+import pandas as pd
+
+from lean_data import (MARKET_CLOSE, MARKET_OPEN, RESOLUTION_PERIODS, BarSeries, PolygonCacheData, Resolution,
+                       Slice, Symbol, TradeBar, TradeBarConsolidator, read_custom_data)
+from lean_fills import InteractiveBrokersFeeModel, NullSlippageModel
+from lean_indicators import ExponentialMovingAverage, SimpleMovingAverage, StandardDeviation, update_indicator
+from lean_orders import SecurityHolding, SecurityPortfolioManager, SecurityTransactionManager
+from lean_universe import FundamentalsTable, Universe
+
+_TIMESPANS = {Resolution.MINUTE: 'minute', Resolution.HOUR: 'minute', Resolution.DAILY: 'day'}
+
+
+class Security:
+    def __init__(self, symbol, resolution, data_type=None):
+        self.symbol = symbol
+        self.resolution = resolution
+        self.data_type = data_type
+        self.price = 0.0
+        self.data = None
+        self.holdings = SecurityHolding(self)
+        self.fee_model = InteractiveBrokersFeeModel()
+        self.slippage_model = NullSlippageModel()
+
+    @property
+    def has_data(self):
+        return self.data is not None
+
+    def set_fee_model(self, fee_model):
+        self.fee_model = fee_model
+
+    def set_slippage_model(self, slippage_model):
+        self.slippage_model = slippage_model
+
+    SetFeeModel = set_fee_model
+    SetSlippageModel = set_slippage_model
+
+    Symbol = property(lambda self: self.symbol)
+    Price = property(lambda self: self.price)
+    Holdings = property(lambda self: self.holdings)
+    HasData = has_data
+
+
+class Subscription:
+    """Data of one security for the run plus the consolidators, indicators and resting orders fed by it."""
+
+    def __init__(self, security, order_book):
+        self.security = security
+        self.order_book = order_book
+        self.series = None
+        self.points = None
+        self.consolidators = []
+        self.indicators = []
+        self.active = True
+
+    def set_points(self, points):
+        """Use custom data points (sorted by time) instead of bars."""
+        self.points = points
+        self.points_by_day = {}
+        for point in points:
+            self.points_by_day.setdefault(point.time.date(), []).append(point)
+
+    def day_range(self, day):
+        """Offsets lo:hi of the bars of day in series."""
+        i = bisect.bisect_left(self.series.days, day)
+        if i == len(self.series.days) or self.series.days[i] != day:
+            return 0, 0
+        return self.series.day_offsets[i], self.series.day_offsets[i + 1]
+
+
+class PortfolioTarget:
+    def __init__(self, symbol, quantity):
+        self.symbol = symbol
+        self.quantity = quantity
+
+    Symbol = property(lambda self: self.symbol)
+    Quantity = property(lambda self: self.quantity)
+
+
+class SecurityChanges:
+    def __init__(self, added_securities, removed_securities):
+        self.added_securities = added_securities
+        self.removed_securities = removed_securities
+
+    AddedSecurities = property(lambda self: self.added_securities)
+    RemovedSecurities = property(lambda self: self.removed_securities)
+
+
+class UniverseSettings:
+    def __init__(self):
+        self.resolution = Resolution.MINUTE
+
+    Resolution = property(lambda self: self.resolution)
+
+
+class AlgorithmSettings:
+    def __init__(self):
+        # Share of the portfolio value set_holdings keeps free, as in LEAN.
+        self.free_portfolio_value_percentage = 0.0025
+
+
+class DateRules:
+    """Date rules resolve to a callable (algorithm, day) -> whether the event runs that trading day."""
+
+    def every_day(self, symbol=None):
+        return lambda algorithm, day: True
+
+    def every(self, *days_of_week):
+        return lambda algorithm, day: day.weekday() in days_of_week
+
+    def month_start(self, symbol=None, days_offset=0):
+        return lambda algorithm, day: algorithm._is_month_start(day, days_offset)
+
+    EveryDay = every_day
+    Every = every
+    MonthStart = month_start
+
+
+class TimeRules:
+    """Time rules resolve to a callable (algorithm, day) -> datetime of the event that day."""
+
+    def at(self, hour, minute=0, second=0):
+        return lambda algorithm, day: datetime.combine(day, time(hour, minute, second))
+
+    def after_market_open(self, symbol=None, minutes_after_open=0):
+        return lambda algorithm, day: (datetime.combine(day, MARKET_OPEN) + timedelta(minutes=minutes_after_open))
+
+    def before_market_close(self, symbol=None, minutes_before_close=0):
+        return lambda algorithm, day: algorithm._market_close(symbol, day) - timedelta(minutes=minutes_before_close)
+
+    @property
+    def midnight(self):
+        return self.at(0)
+
+    @property
+    def noon(self):
+        return self.at(12)
+
+    At = at
+    AfterMarketOpen = after_market_open
+    BeforeMarketClose = before_market_close
+
+
+class ScheduleManager:
+    def __init__(self):
+        self.events = []
+
+    def on(self, date_rule, time_rule, callback):
+        self.events.append((date_rule, time_rule, callback))
+
+    On = on
+
+
+class QCAlgorithm:
+    """Base class of the algorithms. Subclasses implement initialize() and on_data(slice)."""
+
+    def __init__(self):
+        self.time = datetime.min
+        self.start_date = None
+        self.end_date = None
+        self.securities = {}
+        self.portfolio = SecurityPortfolioManager()
+        self.transactions = SecurityTransactionManager(self)
+        self.schedule = ScheduleManager()
+        self.date_rules = DateRules()
+        self.time_rules = TimeRules()
+        self.universe = Universe
+        self.universe_settings = UniverseSettings()
+        self.settings = AlgorithmSettings()
+        self.benchmark = None
+        self.logs = []
+        self.charts = {}
+        self.equity = []
+        self._subscriptions = {}
+        self._universe_filters = None
+        self._universe_members = set()
+        self._parameters = {}
+        self._provider = None
+        self._date_overrides = (None, None)
+        self._running = False
+        self._fundamentals = None
+        self._history_days = 400
+        self._history_cache = {}
+
+    # Setup
+
+    def set_start_date(self, year, month=None, day=None):
+        # Dates given to run_algorithm() win over the ones in initialize().
+        self.start_date = self._date_overrides[0] or (year if month is None else datetime(year, month, day))
+        self.time = self.start_date
+
+    def set_end_date(self, year, month=None, day=None):
+        self.end_date = self._date_overrides[1] or (year if month is None else datetime(year, month, day))
+
+    def set_cash(self, cash):
+        self.portfolio.cash = float(cash)
+
+    def set_benchmark(self, symbol):
+        self.benchmark = symbol
+
+    def get_parameter(self, name, default_value=None):
+        return self._parameters.get(name, default_value)
+
+    def add_equity(self, ticker, resolution=Resolution.MINUTE, **kwargs):
+        symbol = Symbol(ticker)
+        if symbol in self.securities:
+            return self.securities[symbol]
+        security = Security(symbol, resolution)
+        self._add_security(security)
+        if self._running:
+            # Added while running (universe selection): load the bars from today on.
+            self._load_subscription(self._subscriptions[symbol], self.time)
+        return security
+
+    def add_data(self, data_type, ticker, resolution=Resolution.DAILY, **kwargs):
+        security = Security(Symbol(ticker), resolution, data_type)
+        self._add_security(security)
+        return security
+
+    def _add_security(self, security):
+        self.securities[security.symbol] = security
+        self.portfolio[security.symbol] = security.holdings
+        self._subscriptions[security.symbol] = Subscription(security, self.transactions.book(security.symbol))
+
+    def add_universe(self, coarse, fine=None):
+        self._universe_filters = (coarse, fine)
+
+    # Consolidators and indicators
+
+    def consolidate(self, symbol, period, handler):
+        """Call handler with the bars of symbol consolidated over period (a Resolution or a timedelta)."""
+        period = RESOLUTION_PERIODS.get(period, period)
+        consolidator = TradeBarConsolidator(period, handler)
+        self._subscriptions[symbol].consolidators.append(consolidator)
+        return consolidator
+
+    def register_indicator(self, symbol, indicator, resolution=None):
+        """Update indicator with every bar of symbol, consolidated first if resolution is coarser than the data."""
+        subscription = self._subscriptions[symbol]
+        if resolution is None or RESOLUTION_PERIODS.get(resolution, resolution) == RESOLUTION_PERIODS[
+                subscription.security.resolution]:
+            subscription.indicators.append(indicator)
+        else:
+            self.consolidate(symbol, resolution, lambda bar: update_indicator(indicator, bar))
+
+    def sma(self, symbol, period, resolution=None):
+        indicator = SimpleMovingAverage(f'SMA({symbol},{period})', period)
+        self.register_indicator(symbol, indicator, resolution)
+        return indicator
+
+    def ema(self, symbol, period, resolution=None):
+        indicator = ExponentialMovingAverage(f'EMA({symbol},{period})', period)
+        self.register_indicator(symbol, indicator, resolution)
+        return indicator
+
+    def std(self, symbol, period, resolution=None):
+        indicator = StandardDeviation(f'STD({symbol},{period})', period)
+        self.register_indicator(symbol, indicator, resolution)
+        return indicator
+
+    # Orders and portfolio
+
+    def market_order(self, symbol, quantity, asynchronous=False, tag=''):
+        return self.transactions.market_order(symbol, int(quantity), tag)
+
+    def limit_order(self, symbol, quantity, limit_price, asynchronous=False, tag=''):
+        return self.transactions.limit_order(symbol, quantity, limit_price, tag)
+
+    def stop_market_order(self, symbol, quantity, stop_price, asynchronous=False, tag=''):
+        return self.transactions.stop_market_order(symbol, quantity, stop_price, tag)
+
+    def trailing_stop_order(self, symbol, quantity, trailing_amount, trailing_as_percentage=False, asynchronous=False,
+                            tag=''):
+        return self.transactions.trailing_stop_order(symbol, quantity, trailing_amount, trailing_as_percentage, tag)
+
+    def calculate_order_quantity(self, symbol, target):
+        """Whole shares to trade to hold target (a fraction of the portfolio value) of symbol."""
+        price = self.securities[symbol].price
+        if price == 0:
+            return 0
+        value = target * self.portfolio.total_portfolio_value * (1 - self.settings.free_portfolio_value_percentage)
+        return int((value - self.portfolio[symbol].quantity * price) / price)
+
+    def set_holdings(self, symbol, percentage=None, liquidate_existing_holdings=False, tag=''):
+        targets = symbol if isinstance(symbol, list) else [PortfolioTarget(symbol, percentage)]
+        if liquidate_existing_holdings:
+            wanted = {target.symbol for target in targets}
+            for held in [s for s, holding in self.portfolio.items() if holding.quantity and s not in wanted]:
+                self.liquidate(held, tag)
+        # Reduce positions before adding to others so the cash is there.
+        quantities = [(target.symbol, self.calculate_order_quantity(target.symbol, target.quantity))
+                      for target in targets]
+        for target_symbol, quantity in sorted(quantities, key=lambda item: self.portfolio[item[0]].quantity * item[1]
+                                              >= 0):
+            if quantity:
+                self.market_order(target_symbol, quantity, tag=tag)
+
+    def liquidate(self, symbol=None, tag='Liquidated'):
+        symbols = list(self.portfolio) if symbol is None else [symbol]
+        tickets = []
+        for held in symbols:
+            self.transactions.cancel_open_orders(held)
+            quantity = self.portfolio[held].quantity
+            if quantity:
+                tickets.append(self.market_order(held, -quantity, tag=tag))
+        return tickets
+
+    # Output
+
+    def log(self, message):
+        self.logs.append(f'{self.time} {message}')
+
+    debug = error = log
+
+    def plot(self, chart, series, value=None):
+        self.charts.setdefault(chart, {}).setdefault(series, []).append((self.time, float(value)))
+
+    # Event handlers
+
+    def initialize(self):
+        pass
+
+    def on_data(self, data):
+        pass
+
+    def on_securities_changed(self, changes):
+        pass
+
+    def on_order_event(self, order_event):
+        pass
+
+    def on_end_of_algorithm(self):
+        pass
+
+    def _on_order_event(self, order_event):
+        self._order_event_handler(order_event)
+
+    # Data
+
+    def history(self, symbol, periods, resolution=None):
+        """Bars of symbol ending at or before the current time: the last `periods` bars, or those within `periods`
+           if it is a timedelta. Returns a DataFrame indexed by (symbol, time) like LEAN's history().
+        """
+        if isinstance(symbol, (list, tuple)):
+            return pd.concat([self.history(s, periods, resolution) for s in symbol])
+        resolution = resolution or self.securities[symbol].resolution
+        series = self._history_series(symbol, resolution)
+        hi = bisect.bisect_right(series.end_times, self.time)
+        if isinstance(periods, timedelta):
+            lo = bisect.bisect_right(series.end_times, self.time - periods)
+        else:
+            lo = max(0, hi - periods)
+        return series.to_frame(lo, hi)
+
+    def _history_series(self, symbol, resolution):
+        key = (symbol, resolution)
+        if key not in self._history_cache:
+            start = self.start_date - timedelta(days=self._history_days)
+            df = self._provider.load(str(symbol), _TIMESPANS[resolution], start, self._end())
+            self._history_cache[key] = BarSeries(symbol, df, resolution)
+        return self._history_cache[key]
+
+    def _end(self):
+        return self.end_date or datetime.combine(datetime.today().date(), time())
+
+    def _load_subscription(self, subscription, start):
+        security = subscription.security
+        if security.data_type is not None:
+            subscription.set_points(read_custom_data(security.data_type, security.symbol, security.resolution, start,
+                                                     self._end() + timedelta(days=1)))
+            return
+        df = self._provider.load(str(security.symbol), _TIMESPANS[security.resolution], start, self._end())
+        if df is None or df.empty:
+            raise ValueError(f"No {security.resolution} bars for {security.symbol} between {start:%Y-%m-%d} and "
+                             f"{self._end():%Y-%m-%d}")
+        subscription.series = BarSeries(security.symbol, df, security.resolution)
+
+    def _market_close(self, symbol, day):
+        """End of the last intraday bar of symbol on day (covers early closes), 16:00 otherwise."""
+        subscription = self._subscriptions.get(symbol)
+        if subscription is not None and subscription.series is not None and \
+                subscription.security.resolution != Resolution.DAILY:
+            lo, hi = subscription.day_range(day)
+            if hi > lo:
+                return subscription.series.end_times[hi - 1]
+        return datetime.combine(day, MARKET_CLOSE)
+
+    def _is_month_start(self, day, days_offset=0):
+        month_days = self._month_days.get((day.year, day.month), ())
+        return len(month_days) > days_offset and month_days[days_offset] == day
+
+    # Universe selection
+
+    def _select_universe(self, day):
+        fundamentals = self._fundamentals.on(day)
+        if fundamentals is None:
+            return
+        coarse, fine = self._universe_filters
+        selected = coarse(fundamentals)
+        if selected is not Universe.UNCHANGED and fine is not None:
+            selected = fine(fundamentals.subset(selected))
+        if selected is Universe.UNCHANGED:
+            return
+
+        selected = {Symbol(symbol) for symbol in selected}
+        added = [self.add_equity(symbol, self.universe_settings.resolution)
+                 for symbol in sorted(selected - self._universe_members)]
+        removed = [self.securities[symbol] for symbol in sorted(self._universe_members - selected)]
+        for security in added:
+            self._subscriptions[security.symbol].active = True
+        for security in removed:
+            self._subscriptions[security.symbol].active = False
+        self._universe_members = selected
+        if added or removed:
+            self.on_securities_changed(SecurityChanges(added, removed))
+
+    # Event loop
+
+    def _run(self):
+        # Algorithms may use the PascalCase handler names instead.
+        cls = type(self)
+        self._on_data = (self.OnData if cls.on_data is QCAlgorithm.on_data and hasattr(self, 'OnData')
+                         else self.on_data)
+        self._order_event_handler = (self.OnOrderEvent if cls.on_order_event is QCAlgorithm.on_order_event and
+                                     hasattr(self, 'OnOrderEvent') else self.on_order_event)
+        self._running = True
+
+        for subscription in self._subscriptions.values():
+            self._load_subscription(subscription, self.start_date)
+
+        days = set()
+        for subscription in self._subscriptions.values():
+            days.update(subscription.series.days if subscription.series is not None else [])
+        if self._universe_filters is not None:
+            if self._fundamentals is None:
+                raise ValueError("add_universe() needs a fundamentals table: pass fundamentals= to run_algorithm")
+            if not isinstance(self._fundamentals, FundamentalsTable):
+                self._fundamentals = FundamentalsTable(self._fundamentals)
+            days.update(day for day in self._fundamentals.days
+                        if self.start_date.date() <= day <= self._end().date())
+        self._trading_days = sorted(days)
+        self._month_days = {}  # (year, month) -> the sorted trading days of that month, for date rules.
+        for day in self._trading_days:
+            self._month_days.setdefault((day.year, day.month), []).append(day)
+
+        for day in self._trading_days:
+            self._run_day(day)
+            self.equity.append((day, self.portfolio.total_portfolio_value))
+        self.on_end_of_algorithm()
+
+    def _run_day(self, day):
+        midnight = datetime.combine(day, time())
+        self.time = midnight
+        for subscription in self._subscriptions.values():
+            for consolidator in subscription.consolidators:
+                consolidator.scan(midnight)
+        if self._universe_filters is not None:
+            self._select_universe(day)
+
+        events = sorted(((time_rule(self, day), i, callback)
+                         for i, (date_rule, time_rule, callback) in enumerate(self.schedule.events)
+                         if date_rule(self, day)), key=lambda event: event[:2])
+        events.append((datetime.max, 0, None))
+        self._events = events
+        self._event_index = 0
+
+        active = [s for s in self._subscriptions.values() if s.active]
+        ranges = [(s, *s.day_range(day)) for s in active if s.series is not None]
+        ranges = [(s, lo, hi) for s, lo, hi in ranges if hi > lo]
+        custom = [(s, s.points_by_day[day]) for s in active if s.points is not None and day in s.points_by_day]
+        if len(ranges) == 1 and not custom:
+            self._run_bars(*ranges[0])
+        elif ranges or custom:
+            self._run_merged(ranges, custom)
+
+        self._fire_events(datetime.max)
+
+    def _fire_events(self, now):
+        """Run the scheduled events due at or before now; return the time of the next one."""
+        events = self._events
+        while events[self._event_index][0] <= now and events[self._event_index][2] is not None:
+            event_time, _, callback = events[self._event_index]
+            self._event_index += 1
+            self.time = event_time
+            callback()
+        return events[self._event_index][0]
+
+    def _run_bars(self, subscription, lo, hi):
+        """Hot loop for a day with a single subscription: no merging, everything bound to locals."""
+        series = subscription.series
+        security = subscription.security
+        symbol = series.symbol
+        times, end_times = series.times, series.end_times
+        opens, highs, lows, closes, volumes = series.open, series.high, series.low, series.close, series.volume
+        consolidators = subscription.consolidators
+        indicators = subscription.indicators
+        book = subscription.order_book
+        process_orders = self.transactions.process_bar
+        on_data = self._on_data
+        new_bar = tuple.__new__
+        next_event = self._events[self._event_index][0]
+
+        for k in range(lo, hi):
+            end_time = end_times[k]
+            if end_time >= next_event:
+                next_event = self._fire_events(end_time)
+            bar = new_bar(TradeBar, (symbol, times[k], end_time, opens[k], highs[k], lows[k], closes[k], volumes[k]))
+            self.time = end_time
+            security.price = closes[k]
+            security.data = bar
+            if book.size:
+                process_orders(book, bar)
+            for consolidator in consolidators:
+                consolidator.update(bar)
+            for indicator in indicators:
+                update_indicator(indicator, bar)
+            data = Slice()
+            data[symbol] = bar
+            on_data(data)
+
+    def _run_merged(self, ranges, custom):
+        """Loop for a day with several subscriptions: bars and custom points grouped by end time."""
+        items = []
+        for subscription, lo, hi in ranges:
+            series = subscription.series
+            items.extend((series.end_times[k], i, subscription, k) for i, k in enumerate(range(lo, hi)))
+        for subscription, points in custom:
+            items.extend((point.end_time, i, subscription, point) for i, point in enumerate(points))
+        items.sort(key=lambda item: item[:2])
+
+        next_event = self._events[self._event_index][0]
+        data = None
+        for end_time, _, subscription, item in items:
+            if data is None or end_time != self.time:
+                if data is not None:
+                    self._on_data(data)
+                if end_time >= next_event:
+                    next_event = self._fire_events(end_time)
+                self.time = end_time
+                data = Slice()
+            security = subscription.security
+            if subscription.series is not None:
+                item = subscription.series.bar(item)
+            security.price = item.price
+            security.data = item
+            if subscription.series is not None:
+                if subscription.order_book.size:
+                    self.transactions.process_bar(subscription.order_book, item)
+                for consolidator in subscription.consolidators:
+                    consolidator.update(item)
+                for indicator in subscription.indicators:
+                    update_indicator(indicator, item)
+            data[security.symbol] = item
+        if data is not None:
+            self._on_data(data)
+
+    AddEquity = add_equity
+    AddData = add_data
+    SetHoldings = set_holdings
+    LimitOrder = limit_order
+    StopMarketOrder = stop_market_order
+    MarketOrder = market_order
+    Liquidate = liquidate
+    History = history
+    Consolidate = consolidate
+    Portfolio = property(lambda self: self.portfolio)
+    Securities = property(lambda self: self.securities)
+    Time = property(lambda self: self.time)
+
+
+def run_algorithm(algorithm, data=None, start=None, end=None, parameters=None, fundamentals=None,
+                  history_days=400):
+    """Run a QCAlgorithm subclass (or instance) over local data and return the algorithm.
+       data: bar provider with load(ticker, 'minute' | 'day', start, end), PolygonCacheData() by default.
+       start/end: override the dates set in initialize(). parameters: values for get_parameter().
+       fundamentals: DataFrame (date, symbol, price, dollar_volume, has_fundamental_data, market_cap, ...)
+       or FundamentalsTable for add_universe(). history_days: how far before the start history() can look back.
+       The daily portfolio value is in algorithm.equity, plots in algorithm.charts and logs in algorithm.logs.
+    """
+    if isinstance(algorithm, type):
+        algorithm = algorithm()
+    algorithm._parameters = {name: str(value) for name, value in (parameters or {}).items()}
+    algorithm._provider = data if data is not None else PolygonCacheData()
+    algorithm._fundamentals = fundamentals
+    algorithm._history_days = history_days
+    algorithm._date_overrides = tuple(None if date is None else pd.Timestamp(date).to_pydatetime()
+                                      for date in (start, end))
+    if start is not None:
+        algorithm.set_start_date(start)
+    if end is not None:
+        algorithm.set_end_date(end)
+    algorithm.initialize()
+    if algorithm.start_date is None:
+        raise ValueError("The algorithm has no start date: call set_start_date() or pass start=")
+    algorithm._run()
+    algorithm.equity = pd.Series(dict(algorithm.equity), name='equity')
+    return algorithm
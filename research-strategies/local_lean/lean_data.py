@@ -0,0 +1,375 @@
+"""
+Data types and local data providers for the offline QuantConnect stand-in.
+
+Bars are read from the monthly Parquet cache written by polygon_helpers.fetch_polygon_data
+(or from in-memory DataFrames) and exposed with the LEAN names used by the corsoAZ studies.
+"""
+
+import glob
+import os
+import sys
+import urllib.request
+from collections import namedtuple
+from datetime import datetime, timedelta, time
+
+import numpy as np
+import pandas as pd
+
+# Default location of the polygon_helpers Parquet cache.
+POLYGON_HELPERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'papers_strategy',
+                                   'intraday_momentum_spy_strategy')
+DEFAULT_CACHE_DIR = os.getenv("POLYGON_CACHE_DIR", os.path.join(POLYGON_HELPERS_DIR, 'polygon_cache'))
+
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+
+
+class Resolution:
+    TICK = 'tick'
+    SECOND = 'second'
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    DAILY = 'daily'
+    Tick, Second, Minute, Hour, Daily = TICK, SECOND, MINUTE, HOUR, DAILY
+
+
+RESOLUTION_PERIODS = {
+    Resolution.SECOND: timedelta(seconds=1),
+    Resolution.MINUTE: timedelta(minutes=1),
+    Resolution.HOUR: timedelta(hours=1),
+    Resolution.DAILY: timedelta(days=1),
+}
+
+
+def _add_aliases(cls, names):
+    """Add read-only PascalCase aliases (e.g. Close for close) to a class."""
+    for snake in names:
+        pascal = ''.join(part.capitalize() for part in snake.split('_'))
+        setattr(cls, pascal, property(lambda self, name=snake: getattr(self, name)))
+
+
+class Symbol(str):
+    """Ticker symbol. A str subclass, so dicts keyed by symbols also accept plain tickers."""
+
+    @property
+    def value(self):
+        return str(self)
+
+    Value = value
+
+
+_TradeBarBase = namedtuple('_TradeBarBase', 'symbol time end_time open high low close volume')
+
+
+class TradeBar(_TradeBarBase):
+    """Immutable OHLCV bar. time is the bar start, end_time the time it becomes available."""
+    __slots__ = ()
+
+    @property
+    def price(self):
+        return self.close
+
+    value = price
+    period = property(lambda self: self.end_time - self.time)
+
+
+_add_aliases(TradeBar, ('symbol', 'time', 'end_time', 'open', 'high', 'low', 'close', 'volume', 'price',
+                        'value', 'period'))
+
+
+def make_trade_bar(time, symbol, open, high, low, close, volume, period=timedelta(minutes=1)):
+    """Build a TradeBar with the LEAN constructor argument order."""
+    return TradeBar(symbol, time, time + period, open, high, low, close, volume)
+
+
+class Slice(dict):
+    """Data available at one time step: symbol -> TradeBar or custom data point."""
+
+    def contains_key(self, symbol):
+        return symbol in self
+
+    ContainsKey = contains_key
+
+    @property
+    def bars(self):
+        return {symbol: data for symbol, data in self.items() if isinstance(data, TradeBar)}
+
+    Bars = bars
+
+
+class RollingWindow:
+    """Fixed-size window of the most recent items; index 0 is the newest. RollingWindow[TradeBar](n) works too."""
+
+    def __init__(self, size):
+        self.size = size
+        self._items = []
+        self.count = 0
+
+    def __class_getitem__(cls, item_type):
+        return cls
+
+    def add(self, item):
+        self._items.insert(0, item)
+        if len(self._items) > self.size:
+            self._items.pop()
+        self.count += 1
+
+    def __getitem__(self, i):
+        return self._items[i]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    @property
+    def is_ready(self):
+        return len(self._items) == self.size
+
+    Add = add
+    IsReady = is_ready
+    Count = property(lambda self: self.count)
+    Size = property(lambda self: self.size)
+
+
+class TradeBarConsolidator:
+    """Aggregates bars into fixed windows aligned on midnight (one minute, one hour, one day, ...) and calls
+       handler with each completed bar. A window is emitted as soon as a bar reaches its end, or when a bar of
+       a later window arrives or the clock is scanned past it; the emitted bar spans its first to last input bar.
+    """
+
+    def __init__(self, period, handler):
+        self.period = period
+        self.handler = handler
+        self._symbol = None
+        self._end = None
+
+    def update(self, bar):
+        if self._symbol is not None and bar.time >= self._end:
+            self._emit()
+        if self._symbol is None:
+            midnight = datetime.combine(bar.time.date(), time())
+            self._end = midnight + ((bar.time - midnight) // self.period + 1) * self.period
+            self._symbol, self._time = bar.symbol, bar.time
+            self._open, self._high, self._low = bar.open, bar.high, bar.low
+            self._volume = bar.volume
+        else:
+            if bar.high > self._high:
+                self._high = bar.high
+            if bar.low < self._low:
+                self._low = bar.low
+            self._volume += bar.volume
+        self._close, self._end_time = bar.close, bar.end_time
+        if bar.end_time >= self._end:
+            self._emit()
+
+    def scan(self, now):
+        """Emit the pending window if the clock has moved past its end."""
+        if self._symbol is not None and now >= self._end:
+            self._emit()
+
+    def _emit(self):
+        bar = TradeBar(self._symbol, self._time, self._end_time, self._open, self._high, self._low, self._close,
+                       self._volume)
+        self._symbol = None
+        self.handler(bar)
+
+
+class SubscriptionTransportMedium:
+    LOCAL_FILE = 'local_file'
+    REMOTE_FILE = 'remote_file'
+    REST = 'rest'
+    LocalFile, RemoteFile, Rest = LOCAL_FILE, REMOTE_FILE, REST
+
+
+class SubscriptionDataSource:
+    def __init__(self, source, transport_medium=SubscriptionTransportMedium.LOCAL_FILE, format=None):
+        self.source = source
+        self.transport_medium = transport_medium
+        self.format = format
+
+
+class SubscriptionDataConfig:
+    def __init__(self, symbol, resolution):
+        self.symbol = symbol
+        self.resolution = resolution
+
+    Symbol = property(lambda self: self.symbol)
+
+
+class PythonData:
+    """Base class of custom data. Extra properties set with data["Name"] = x are readable as data.Name.
+       Locally, an optional read_points(config, start, end) method replaces get_source/reader (see read_custom_data).
+    """
+
+    def __init__(self):
+        self.symbol = None
+        self.time = datetime.min
+        self.value = 0.0
+        self._properties = {}
+
+    def __setitem__(self, name, value):
+        self._properties[name] = value
+
+    def __getitem__(self, name):
+        return self._properties[name]
+
+    def __getattr__(self, name):
+        properties = self.__dict__.get('_properties', {})
+        if name in properties:
+            return properties[name]
+        raise AttributeError(name)
+
+    @property
+    def end_time(self):
+        return self.time
+
+    price = property(lambda self: self.value)
+    Symbol = property(lambda self: self.symbol)
+    Time = property(lambda self: self.time)
+    EndTime = end_time
+    Value = property(lambda self: self.value)
+    Price = price
+
+
+def read_custom_data(data_type, symbol, resolution, start, end):
+    """Run a PythonData subclass' get_source/reader over its file once and return its points sorted by time.
+       A subclass can define read_points(config, start, end) to return its points from a local store instead.
+    """
+    config = SubscriptionDataConfig(symbol, resolution)
+    reader = data_type()
+    if hasattr(reader, 'read_points'):
+        points = [point for point in reader.read_points(config, start, end) if start <= point.time <= end]
+        for point in points:
+            point.symbol = symbol
+        points.sort(key=lambda point: point.time)
+        return points
+
+    source = reader.get_source(config, start, False)
+    if source.transport_medium == SubscriptionTransportMedium.LOCAL_FILE:
+        with open(source.source) as f:
+            lines = f.read().splitlines()
+    else:
+        with urllib.request.urlopen(source.source) as response:
+            lines = response.read().decode('utf-8').splitlines()
+
+    points = []
+    for line in lines:
+        point = reader.reader(config, line, start, False)
+        if point is not None and start <= point.time <= end:
+            point.symbol = symbol
+            points.append(point)
+    points.sort(key=lambda point: point.time)
+    return points
+
+
+class FrameData:
+    """Bar provider over in-memory DataFrames in the fetch_polygon_data format.
+       frames: dict of (ticker, 'minute' | 'day') -> DataFrame with caldt, open, high, low, close, volume.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def load(self, ticker, timespan, start, end):
+        df = self.frames.get((ticker, timespan))
+        if df is None:
+            return None
+        days = pd.to_datetime(df['caldt']).dt.normalize()
+        return df[(days >= pd.Timestamp(start.date())) & (days <= pd.Timestamp(end.date()))]
+
+
+class PolygonCacheData:
+    """Bar provider reading the monthly Parquet partitions of the polygon_helpers cache.
+       fetch: download missing months through polygon_helpers.fetch_polygon_data (needs POLYGON_API_KEY).
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, adjusted=False, fetch=False):
+        self.cache_dir = cache_dir
+        self.adjusted = adjusted
+        self.fetch = fetch
+
+    def load(self, ticker, timespan, start, end):
+        if self.fetch:
+            sys.path.insert(0, POLYGON_HELPERS_DIR)
+            import polygon_helpers
+            polygon_helpers.CACHE_DIR = self.cache_dir
+            return polygon_helpers.fetch_polygon_data(ticker, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'),
+                                                      timespan, adjusted=self.adjusted)
+
+        folder = os.path.join(self.cache_dir, ticker, timespan, f"adjusted={str(self.adjusted).lower()}")
+        months = {str(month) for month in pd.period_range(start, end, freq='M')}
+        paths = [path for path in sorted(glob.glob(os.path.join(folder, '*.parquet')))
+                 if os.path.basename(path)[:-len('.parquet')] in months]
+        if not paths:
+            return None
+        df = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+        days = df['caldt'].dt.normalize()
+        return df[(days >= pd.Timestamp(start.date())) & (days <= pd.Timestamp(end.date()))]
+
+
+class BarSeries:
+    """Bars of one symbol at one resolution as plain Python lists, with the offsets of every trading day.
+       Lists of floats and datetimes are what the event loop iterates fastest.
+    """
+
+    def __init__(self, symbol, df, resolution):
+        df = _resample(df, resolution)
+        start = df['caldt'].to_numpy()
+        end = start + np.timedelta64(RESOLUTION_PERIODS[Resolution.MINUTE])
+        if resolution == Resolution.HOUR:
+            end = df['end'].to_numpy()
+        elif resolution == Resolution.DAILY:
+            # Daily bars become available at the close.
+            end = start.astype('datetime64[D]') + np.timedelta64(16, 'h')
+
+        self.symbol = symbol
+        self.resolution = resolution
+        self.end_ns = end.astype('datetime64[ns]').astype(np.int64)
+        # datetime64[us] converts to datetime objects in C, far faster than going through pandas Timestamps.
+        self.times = start.astype('datetime64[us]').tolist()
+        self.end_times = end.astype('datetime64[us]').tolist()
+        self.open = df['open'].to_numpy(dtype=float).tolist()
+        self.high = df['high'].to_numpy(dtype=float).tolist()
+        self.low = df['low'].to_numpy(dtype=float).tolist()
+        self.close = df['close'].to_numpy(dtype=float).tolist()
+        self.volume = df['volume'].to_numpy(dtype=float).tolist()
+
+        day_numbers = start.astype('datetime64[D]')
+        starts = np.flatnonzero(np.diff(day_numbers.astype(np.int64), prepend=-1)) if len(start) else np.array([], int)
+        self.days = [day.item() for day in day_numbers[starts]]
+        self.day_offsets = np.append(starts, len(start)).tolist()
+
+    def __len__(self):
+        return len(self.times)
+
+    def bar(self, k):
+        return TradeBar(self.symbol, self.times[k], self.end_times[k], self.open[k], self.high[k], self.low[k],
+                        self.close[k], self.volume[k])
+
+    def to_frame(self, lo, hi):
+        """History DataFrame of bars lo:hi in the LEAN layout (symbol, time) -> open/high/low/close/volume."""
+        index = pd.MultiIndex.from_arrays([[self.symbol] * (hi - lo), self.end_times[lo:hi]], names=['symbol', 'time'])
+        return pd.DataFrame({'open': self.open[lo:hi], 'high': self.high[lo:hi], 'low': self.low[lo:hi],
+                             'close': self.close[lo:hi], 'volume': self.volume[lo:hi]}, index=index)
+
+
+def _resample(df, resolution):
+    """Sort bars and, for hourly resolution, consolidate minute bars into clock-hour bars ending at most at the close."""
+    df = df.sort_values('caldt').reset_index(drop=True)
+    df['caldt'] = pd.to_datetime(df['caldt'])
+    if resolution != Resolution.HOUR:
+        return df
+
+    hour = df['caldt'].dt.floor('h')
+    grouped = df.groupby(hour)
+    hourly = pd.DataFrame({'open': grouped['open'].first(), 'high': grouped['high'].max(),
+                           'low': grouped['low'].min(), 'close': grouped['close'].last(),
+                           'volume': grouped['volume'].sum()})
+    hourly['caldt'] = hourly.index
+    close = hourly.index.normalize() + pd.Timedelta(hours=16)
+    hourly['end'] = np.minimum(hourly.index + pd.Timedelta(hours=1), close)
+    # Hour bars start at the first minute actually traded (09:30 for the first one).
+    hourly['caldt'] = grouped['caldt'].first()
+    return hourly.reset_index(drop=True)
@@ -0,0 +1,145 @@
+"""
+Fill simulation of the offline QuantConnect stand-in: fee and slippage models and the per-symbol book of
+resting limit, stop-market and trailing-stop orders.
+
+Orders rest from the bar after the one they were submitted on. Against each bar (OHLC semantics):
+- a buy limit fills if low <= limit, at min(limit, open); a sell limit if high >= limit, at max(limit, open),
+- a buy stop triggers if high >= stop, at max(stop, open); a sell stop if low <= stop, at min(stop, open),
+  so gaps through the trigger fill at the open. Stop and market fills pay slippage, limit fills do not,
+- a trailing stop is checked against its current stop first, then ratcheted with the bar's high (sell)
+  or low (buy); orders submitted from the fill callbacks start resting on the next bar.
+Orders a bar triggers fill in submission order. A fill callback can still cancel a later one of them (an OCO or
+bracket exit), which then does not fill, or update it, which makes it rest again from the next bar.
+Orders fill completely; volume is not a constraint.
+"""
+
+import bisect
+import math
+
+
+class ConstantFeeModel:
+    """The same fee for every order."""
+
+    def __init__(self, fee=0.0):
+        self.fee = fee
+
+    def get_order_fee(self, price, quantity):
+        return self.fee
+
+
+class InteractiveBrokersFeeModel:
+    """IB fixed US equity pricing, LEAN's default: per share with a minimum and a cap of a share of the trade value."""
+
+    def __init__(self, per_share=0.005, minimum=1.0, maximum_rate=0.005):
+        self.per_share = per_share
+        self.minimum = minimum
+        self.maximum_rate = maximum_rate
+
+    def get_order_fee(self, price, quantity):
+        quantity = abs(quantity)
+        fee = max(self.minimum, self.per_share * quantity)
+        return min(fee, self.maximum_rate * quantity * price)
+
+
+class NullSlippageModel:
+    def get_slippage_approximation(self, price, quantity):
+        return 0.0
+
+
+class ConstantSlippageModel:
+    """Slippage as a fixed fraction of the price, paid against the direction of the order."""
+
+    def __init__(self, slippage_percent):
+        self.slippage_percent = slippage_percent
+
+    def get_slippage_approximation(self, price, quantity):
+        return price * self.slippage_percent
+
+
+class PendingOrderBook:
+    """Resting orders of one symbol in two lists sorted by trigger price, so that a bar only looks at the
+       orders it can trigger: the head of the rising side (<= high) and the tail of the falling side (>= low).
+       Checking a bar that triggers nothing is two comparisons, whatever the number of resting orders.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._rising_keys = []
+        self._rising = []
+        self._falling_keys = []
+        self._falling = []
+        self._trailing = []
+
+    def __len__(self):
+        return self.size
+
+    def add(self, ticket):
+        self._insert(ticket)
+        if ticket.is_trailing:
+            self._trailing.append(ticket)
+
+    def remove(self, ticket):
+        self._delete(ticket)
+        if ticket.is_trailing:
+            self._trailing.remove(ticket)
+
+    def __contains__(self, ticket):
+        """Whether ticket rests in this book; pop_triggered takes the orders a bar triggers out of it."""
+        key = getattr(ticket, '_key', None)
+        if key is None:
+            return False
+        keys, orders = self._side(ticket)
+        i = bisect.bisect_left(keys, key)
+        return i < len(keys) and orders[i] is ticket
+
+    def tickets(self):
+        return self._rising + self._falling
+
+    def _side(self, ticket):
+        if ticket.triggers_when_rising:
+            return self._rising_keys, self._rising
+        return self._falling_keys, self._falling
+
+    def _insert(self, ticket):
+        ticket._key = (ticket.trigger_price, ticket.order_id)
+        keys, orders = self._side(ticket)
+        i = bisect.bisect_left(keys, ticket._key)
+        keys.insert(i, ticket._key)
+        orders.insert(i, ticket)
+        self.size += 1
+
+    def _delete(self, ticket):
+        keys, orders = self._side(ticket)
+        i = bisect.bisect_left(keys, ticket._key)
+        if i == len(keys) or orders[i] is not ticket:
+            raise ValueError(f"Order {ticket.order_id} is not resting in this book")
+        del keys[i]
+        del orders[i]
+        self.size -= 1
+
+    def pop_triggered(self, high, low):
+        """Remove and return the orders a bar with this high and low triggers, in submission order."""
+        triggered = []
+        if self._rising_keys and self._rising_keys[0][0] <= high:
+            n = bisect.bisect_right(self._rising_keys, (high, math.inf))
+            triggered += self._rising[:n]
+            del self._rising_keys[:n], self._rising[:n]
+        if self._falling_keys and self._falling_keys[-1][0] >= low:
+            n = bisect.bisect_left(self._falling_keys, (low, -math.inf))
+            triggered += self._falling[n:]
+            del self._falling_keys[n:], self._falling[n:]
+        if self._trailing:
+            for ticket in triggered:
+                if ticket.is_trailing:
+                    self._trailing.remove(ticket)
+        self.size -= len(triggered)
+        if len(triggered) > 1:
+            triggered.sort(key=lambda ticket: ticket.order_id)
+        return triggered
+
+    def trail(self, high, low):
+        """Ratchet the stops of the resting trailing orders with a bar's high (sell) or low (buy)."""
+        for ticket in self._trailing:
+            if ticket.trail(high, low):
+                self._delete(ticket)
+                self._insert(ticket)
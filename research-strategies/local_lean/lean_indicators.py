@@ -0,0 +1,279 @@
+"""
+Indicators of the offline QuantConnect stand-in, updated bar by bar by the event loop.
+"""
+
+import bisect
+import math
+import sys
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from lean_data import POLYGON_HELPERS_DIR
+
+if POLYGON_HELPERS_DIR not in sys.path:
+    sys.path.append(POLYGON_HELPERS_DIR)
+from indicator_helpers import EMA, SMA, VWAP, RollingStd  # noqa: E402
+
+
+class IndicatorDataPoint:
+    __slots__ = ('time', 'value')
+
+    def __init__(self, time, value):
+        self.time = time
+        self.value = value
+
+    Time = property(lambda self: self.time)
+    Value = property(lambda self: self.value)
+
+    def __float__(self):
+        return float(self.value)
+
+
+class IndicatorBase:
+    """Built-in indicator: update() consumes a TradeBar (or a time and a value) and refreshes current."""
+
+    def __init__(self, name, period):
+        self.name = name
+        self.period = period
+        self.samples = 0
+        self.current = IndicatorDataPoint(datetime.min, 0.0)
+
+    def update(self, input, value=None):
+        if value is None:
+            time, value = input.end_time, self._input_value(input)
+            self._update_bar(input)
+        else:
+            time = input
+        self.samples += 1
+        self.current = IndicatorDataPoint(time, self._compute(value))
+        return self.is_ready
+
+    def _input_value(self, bar):
+        return bar.close
+
+    def _update_bar(self, bar):
+        pass
+
+    @property
+    def is_ready(self):
+        return self.samples >= self.period
+
+    def reset(self):
+        self.__init__(self.name, self.period)
+
+    Update = update
+    Reset = reset
+    IsReady = is_ready
+    Current = property(lambda self: self.current)
+    Name = property(lambda self: self.name)
+
+
+class StreamingIndicator(IndicatorBase):
+    """Built-in indicator computed by an indicator_helpers instance (self._indicator) in O(1) per update,
+       which can also be warm started from a bulk history in one vectorized pass.
+    """
+
+    def _compute(self, value):
+        return self._indicator.update(value)
+
+    def warm_up(self, times, values):
+        """Reset the indicator to the state after updating it with a bulk history (oldest first)."""
+        self.reset()
+        times = list(times)
+        result = self._indicator.warm_up(values)
+        self.samples = len(times)
+        if times:
+            self.current = IndicatorDataPoint(times[-1], float(result[-1]))
+        return self.is_ready
+
+    WarmUp = warm_up
+
+
+class SimpleMovingAverage(StreamingIndicator):
+    """Mean of the last `period` values."""
+
+    def __init__(self, name, period=None):
+        if period is None:
+            name, period = f'SMA({name})', name
+        super().__init__(name, period)
+        self._indicator = SMA(period)
+
+
+class ExponentialMovingAverage(StreamingIndicator):
+    """Exponential moving average with smoothing 2 / (period + 1), seeded with the first value."""
+
+    def __init__(self, name, period=None):
+        if period is None:
+            name, period = f'EMA({name})', name
+        super().__init__(name, period)
+        self._indicator = EMA(period)
+
+
+class StandardDeviation(StreamingIndicator):
+    """Population standard deviation of the last `period` values, like LEAN's."""
+
+    def __init__(self, name, period=None):
+        if period is None:
+            name, period = f'STD({name})', name
+        super().__init__(name, period)
+        self._indicator = RollingStd(period, ddof=0)
+
+
+class VolumeWeightedAveragePriceIndicator(IndicatorBase):
+    """Volume weighted average of the (open + high + low + close) / 4 price over the last `period` bars."""
+
+    def __init__(self, name, period=None):
+        if period is None:
+            name, period = f'VWAP({name})', name
+        super().__init__(name, period)
+        self._vwap = VWAP(period)
+
+    def update(self, input, value=None):
+        if value is not None:
+            raise TypeError("VolumeWeightedAveragePriceIndicator needs TradeBars")
+        return super().update(input)
+
+    def _update_bar(self, bar):
+        self._vwap.update((bar.open + bar.high + bar.low + bar.close) / 4, bar.volume)
+
+    def _compute(self, value):
+        # Without volume in the window, carry the last price like LEAN does.
+        return value if math.isnan(self._vwap.value) else self._vwap.value
+
+
+class RollingHighLow(IndicatorBase):
+    """Highest high and lowest low over the last `period` samples or, with span, over the samples whose time is
+       within span of the latest one. Each side is a monotonic deque of (sample number, time, value), so an
+       update is amortized O(1) whatever the window. current is the high; maximum and minimum hold both sides.
+       update(time, value) tracks a single series; update(bar) uses the bar's high and low.
+    """
+
+    def __init__(self, name, period=None, span=None):
+        if (period is None) == (span is None):
+            raise ValueError("RollingHighLow needs exactly one of period (samples) or span (a timedelta)")
+        super().__init__(name, period)
+        self.span = span
+        self._first_time = None
+        self._highs = deque()
+        self._lows = deque()
+        self.maximum = IndicatorDataPoint(datetime.min, math.nan)
+        self.minimum = IndicatorDataPoint(datetime.min, math.nan)
+
+    def update(self, input, value=None):
+        if value is None:
+            self._push(input.end_time, input.high, input.low)
+        else:
+            self._push(input, value, value)
+        return self.is_ready
+
+    def _push(self, time, high, low):
+        n = self.samples
+        if self._first_time is None:
+            self._first_time = time
+        highs, lows = self._highs, self._lows
+        while highs and highs[-1][2] <= high:
+            highs.pop()
+        highs.append((n, time, high))
+        while lows and lows[-1][2] >= low:
+            lows.pop()
+        lows.append((n, time, low))
+        self.samples = n + 1
+        self._evict(time)
+        self.maximum = IndicatorDataPoint(time, highs[0][2])
+        self.minimum = IndicatorDataPoint(time, lows[0][2])
+        self.current = self.maximum
+
+    def _evict(self, time):
+        if self.span is None:
+            oldest = self.samples - self.period
+            while self._highs[0][0] < oldest:
+                self._highs.popleft()
+            while self._lows[0][0] < oldest:
+                self._lows.popleft()
+        else:
+            cutoff = time - self.span
+            while self._highs[0][1] <= cutoff:
+                self._highs.popleft()
+            while self._lows[0][1] <= cutoff:
+                self._lows.popleft()
+
+    def warm_up(self, times, highs, lows=None):
+        """Reset the indicator to the state after updating it with a bulk history (oldest first), in one vectorized
+           pass: only the samples still in the window are kept, as the deques would hold them after the updates.
+           With span, the history is taken to cover the whole span (like history(symbol, span)), so it is ready.
+        """
+        self.reset()
+        times = list(times)
+        if not times:
+            return self.is_ready
+        highs = np.asarray(highs, dtype=float)
+        lows = highs if lows is None else np.asarray(lows, dtype=float)
+        if self.span is None:
+            start = max(0, len(times) - self.period)
+            self._first_time = times[0]
+        else:
+            start = bisect.bisect_right(times, times[-1] - self.span)
+            self._first_time = times[-1] - self.span
+        self.samples = len(times)
+
+        # A sample stays in the max deque while no later sample of the window is as high (strict suffix records).
+        for deck, values, best, beats, fill in ((self._highs, highs[start:], np.maximum, np.greater, -np.inf),
+                                                (self._lows, lows[start:], np.minimum, np.less, np.inf)):
+            later_first = values[::-1]
+            best_later = np.r_[fill, best.accumulate(later_first)[:-1]]
+            kept = len(values) - 1 - np.flatnonzero(beats(later_first, best_later))[::-1]
+            values = values.tolist()
+            deck.extend((start + i, times[start + i], values[i]) for i in kept.tolist())
+
+        self.maximum = IndicatorDataPoint(times[-1], self._highs[0][2])
+        self.minimum = IndicatorDataPoint(times[-1], self._lows[0][2])
+        self.current = self.maximum
+        return self.is_ready
+
+    @property
+    def is_ready(self):
+        if self.span is None:
+            return self.samples >= self.period
+        return self.samples > 0 and self.maximum.time - self._first_time >= self.span
+
+    def reset(self):
+        self.__init__(self.name, self.period, self.span)
+
+    Maximum = property(lambda self: self.maximum)
+    Minimum = property(lambda self: self.minimum)
+    WarmUp = warm_up
+
+
+class PythonIndicator:
+    """Base class of user indicators. Subclasses set self.value in update(input) and return whether they
+       are ready; like in LEAN they may skip calling this __init__, so everything has a class-level default.
+    """
+    name = ''
+    time = datetime.min
+    value = 0.0
+    _is_ready = False
+
+    def update(self, input):
+        raise NotImplementedError
+
+    @property
+    def current(self):
+        return IndicatorDataPoint(self.time, self.value)
+
+    @property
+    def is_ready(self):
+        return self._is_ready
+
+    Current = current
+    IsReady = is_ready
+    Value = property(lambda self: self.value)
+
+
+def update_indicator(indicator, bar):
+    """Feed one bar to a built-in or Python indicator."""
+    if isinstance(indicator, PythonIndicator):
+        indicator._is_ready = bool(indicator.update(bar))
+    else:
+        indicator.update(bar)
@@ -0,0 +1,408 @@
+"""
+Orders, tickets and the portfolio of the offline QuantConnect stand-in.
+"""
+
+from lean_data import _add_aliases
+from lean_fills import PendingOrderBook
+
+
+class OrderStatus:
+    NEW = 'new'
+    SUBMITTED = 'submitted'
+    PARTIALLY_FILLED = 'partially_filled'
+    FILLED = 'filled'
+    CANCELED = 'canceled'
+    INVALID = 'invalid'
+    UPDATE_SUBMITTED = 'update_submitted'
+    New, Submitted, PartiallyFilled, Filled = NEW, SUBMITTED, PARTIALLY_FILLED, FILLED
+    Canceled, Invalid, UpdateSubmitted = CANCELED, INVALID, UPDATE_SUBMITTED
+
+
+class OrderType:
+    MARKET = 'market'
+    LIMIT = 'limit'
+    STOP_MARKET = 'stop_market'
+    TRAILING_STOP = 'trailing_stop'
+    Market, Limit, StopMarket, TrailingStop = MARKET, LIMIT, STOP_MARKET, TRAILING_STOP
+
+
+class OrderDirection:
+    BUY = 'buy'
+    SELL = 'sell'
+    HOLD = 'hold'
+    Buy, Sell, Hold = BUY, SELL, HOLD
+
+
+def order_direction(quantity):
+    return OrderDirection.BUY if quantity > 0 else OrderDirection.SELL if quantity < 0 else OrderDirection.HOLD
+
+
+class OrderEvent:
+    def __init__(self, order_id, symbol, time, status, direction, fill_price=0.0, fill_quantity=0, order_fee=0.0,
+                 message=''):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.time = time
+        self.utc_time = time
+        self.status = status
+        self.direction = direction
+        self.fill_price = fill_price
+        self.fill_quantity = fill_quantity
+        self.order_fee = order_fee
+        self.message = message
+
+    def __repr__(self):
+        return (f"OrderEvent({self.order_id}, {self.symbol}, {self.status}, "
+                f"{self.fill_quantity} @ {self.fill_price})")
+
+
+_add_aliases(OrderEvent, ('order_id', 'symbol', 'time', 'utc_time', 'status', 'direction', 'fill_price',
+                          'fill_quantity', 'order_fee', 'message'))
+
+
+class UpdateOrderFields:
+    """Fields to amend on an open order; those left to None keep their value."""
+
+    def __init__(self, quantity=None, limit_price=None, stop_price=None, trailing_amount=None, tag=None):
+        self.quantity = quantity
+        self.limit_price = limit_price
+        self.stop_price = stop_price
+        self.trailing_amount = trailing_amount
+        self.tag = tag
+
+
+class OrderResponse:
+    def __init__(self, order_id, error_message=''):
+        self.order_id = order_id
+        self.error_message = error_message
+
+    @property
+    def is_success(self):
+        return not self.error_message
+
+
+_add_aliases(OrderResponse, ('order_id', 'error_message', 'is_success'))
+
+_OPEN_STATUSES = (OrderStatus.NEW, OrderStatus.SUBMITTED, OrderStatus.PARTIALLY_FILLED, OrderStatus.UPDATE_SUBMITTED)
+
+
+class OrderTicket:
+    """Handle on a submitted order, updated in place as the order fills."""
+
+    def __init__(self, transactions, order_id, symbol, quantity, order_type, time, tag='', limit_price=None,
+                 stop_price=None, trailing_amount=None, trailing_as_percentage=False):
+        self._transactions = transactions
+        self.order_id = order_id
+        self.symbol = symbol
+        self.quantity = quantity
+        self.order_type = order_type
+        self.time = time
+        self.tag = tag
+        self.limit_price = limit_price
+        self.stop_price = stop_price
+        self.trailing_amount = trailing_amount
+        self.trailing_as_percentage = trailing_as_percentage
+        self.status = OrderStatus.NEW
+        self.quantity_filled = 0
+        self.average_fill_price = 0.0
+
+    def __repr__(self):
+        return f"OrderTicket({self.order_id}, {self.symbol}, {self.order_type}, {self.quantity}, {self.status})"
+
+    @property
+    def is_open(self):
+        return self.status in _OPEN_STATUSES
+
+    @property
+    def is_trailing(self):
+        return self.order_type == OrderType.TRAILING_STOP
+
+    @property
+    def triggers_when_rising(self):
+        """Sell limits and buy stops trigger when the price rises to them, the others when it falls to them."""
+        return (self.order_type == OrderType.LIMIT) == (self.quantity < 0)
+
+    @property
+    def trigger_price(self):
+        return self.limit_price if self.order_type == OrderType.LIMIT else self.stop_price
+
+    def trailing_stop_price(self, price):
+        """Stop of a trailing order trailing_amount (or that fraction) away from price, on the losing side."""
+        amount = price * self.trailing_amount if self.trailing_as_percentage else self.trailing_amount
+        return price - amount if self.quantity < 0 else price + amount
+
+    def trail(self, high, low):
+        """Move the stop of a trailing order towards the bar's high (sell) or low (buy); return whether it moved."""
+        stop = self.trailing_stop_price(high if self.quantity < 0 else low)
+        if (stop > self.stop_price) if self.quantity < 0 else (stop < self.stop_price):
+            self.stop_price = stop
+            return True
+        return False
+
+    def fill_price(self, bar):
+        """Price at which this resting order fills on a bar that triggers it, before slippage."""
+        if self.order_type == OrderType.LIMIT:
+            return min(self.limit_price, bar.open) if self.quantity > 0 else max(self.limit_price, bar.open)
+        return max(self.stop_price, bar.open) if self.quantity > 0 else min(self.stop_price, bar.open)
+
+    def update(self, fields):
+        return self._transactions.update_order(self, fields)
+
+    def cancel(self, tag=''):
+        return self._transactions.cancel_order(self, tag)
+
+    Update = update
+    Cancel = cancel
+
+
+_add_aliases(OrderTicket, ('order_id', 'symbol', 'quantity', 'order_type', 'time', 'tag', 'status',
+                           'quantity_filled', 'average_fill_price', 'limit_price', 'stop_price'))
+
+
+class SecurityHolding:
+    def __init__(self, security):
+        self.security = security
+        self.quantity = 0
+        self.average_price = 0.0
+        self.net_profit = 0.0
+        self.total_fees = 0.0
+
+    @property
+    def symbol(self):
+        return self.security.symbol
+
+    @property
+    def invested(self):
+        return self.quantity != 0
+
+    @property
+    def is_long(self):
+        return self.quantity > 0
+
+    @property
+    def is_short(self):
+        return self.quantity < 0
+
+    @property
+    def absolute_quantity(self):
+        return abs(self.quantity)
+
+    @property
+    def price(self):
+        return self.security.price
+
+    @property
+    def holdings_value(self):
+        return self.quantity * self.security.price
+
+    @property
+    def unrealized_profit(self):
+        return self.quantity * (self.security.price - self.average_price)
+
+    def apply_fill(self, quantity, price, fee):
+        """Update quantity, average price and realized profit with one fill."""
+        old = self.quantity
+        new = old + quantity
+        if old == 0 or (old > 0) == (quantity > 0):
+            self.average_price = (self.average_price * old + price * quantity) / new
+        else:
+            closed = -quantity if abs(quantity) <= abs(old) else old
+            self.net_profit += closed * (price - self.average_price)
+            if new == 0:
+                self.average_price = 0.0
+            elif (new > 0) != (old > 0):
+                self.average_price = price
+        self.quantity = new
+        self.net_profit -= fee
+        self.total_fees += fee
+
+
+_add_aliases(SecurityHolding, ('symbol', 'quantity', 'average_price', 'invested', 'is_long', 'is_short',
+                               'absolute_quantity', 'price', 'holdings_value', 'unrealized_profit', 'net_profit',
+                               'total_fees'))
+
+
+class SecurityPortfolioManager(dict):
+    """symbol -> SecurityHolding, plus the cash balance."""
+
+    def __init__(self):
+        super().__init__()
+        self.cash = 0.0
+
+    @property
+    def total_holdings_value(self):
+        return sum(holding.quantity * holding.security.price for holding in self.values() if holding.quantity)
+
+    @property
+    def total_portfolio_value(self):
+        return self.cash + self.total_holdings_value
+
+    @property
+    def invested(self):
+        return any(holding.quantity for holding in self.values())
+
+    @property
+    def total_fees(self):
+        return sum(holding.total_fees for holding in self.values())
+
+    def apply_fill(self, symbol, quantity, price, fee):
+        self[symbol].apply_fill(quantity, price, fee)
+        self.cash -= quantity * price + fee
+
+
+_add_aliases(SecurityPortfolioManager, ('cash', 'total_holdings_value', 'total_portfolio_value', 'invested',
+                                        'total_fees'))
+
+
+class SecurityTransactionManager:
+    """Order book of the algorithm. Market orders fill immediately at the security's last price; limit, stop
+       and trailing orders rest in a PendingOrderBook per symbol that the event loop checks with each bar.
+       Fills apply the security's slippage (market and stop orders) and fee models.
+    """
+
+    def __init__(self, algorithm):
+        self.algorithm = algorithm
+        self.tickets = {}
+        self.books = {}
+        self._triggered = ()  # Orders the current bar took out of a book, while their fills are processed.
+        self._next_id = 1
+
+    def book(self, symbol):
+        """Resting orders of symbol; the event loop keeps a reference per subscription."""
+        if symbol not in self.books:
+            self.books[symbol] = PendingOrderBook()
+        return self.books[symbol]
+
+    def _new_ticket(self, symbol, quantity, order_type, tag, **prices):
+        ticket = OrderTicket(self, self._next_id, symbol, int(quantity), order_type, self.algorithm.time, tag,
+                             **prices)
+        self.tickets[ticket.order_id] = ticket
+        self._next_id += 1
+        return ticket
+
+    def market_order(self, symbol, quantity, tag=''):
+        ticket = self._new_ticket(symbol, quantity, OrderType.MARKET, tag)
+        if ticket.quantity == 0:
+            ticket.status = OrderStatus.INVALID
+            return ticket
+        self._submit(ticket)
+        security = self.algorithm.securities[symbol]
+        price = security.price
+        self.fill(ticket, price + _signed(security.slippage_model.get_slippage_approximation(price, quantity),
+                                          ticket.quantity))
+        return ticket
+
+    def limit_order(self, symbol, quantity, limit_price, tag=''):
+        return self._rest(self._new_ticket(symbol, quantity, OrderType.LIMIT, tag, limit_price=limit_price))
+
+    def stop_market_order(self, symbol, quantity, stop_price, tag=''):
+        return self._rest(self._new_ticket(symbol, quantity, OrderType.STOP_MARKET, tag, stop_price=stop_price))
+
+    def trailing_stop_order(self, symbol, quantity, trailing_amount, trailing_as_percentage=False, tag=''):
+        ticket = self._new_ticket(symbol, quantity, OrderType.TRAILING_STOP, tag, trailing_amount=trailing_amount,
+                                  trailing_as_percentage=trailing_as_percentage)
+        ticket.stop_price = ticket.trailing_stop_price(self.algorithm.securities[symbol].price)
+        return self._rest(ticket)
+
+    def _rest(self, ticket):
+        if ticket.quantity == 0:
+            ticket.status = OrderStatus.INVALID
+            return ticket
+        self._submit(ticket)
+        self.book(ticket.symbol).add(ticket)
+        return ticket
+
+    def _submit(self, ticket):
+        ticket.status = OrderStatus.SUBMITTED
+        self._event(ticket, OrderStatus.SUBMITTED)
+
+    def _event(self, ticket, status, fill_price=0.0, fill_quantity=0, fee=0.0, message=''):
+        self.algorithm._on_order_event(OrderEvent(ticket.order_id, ticket.symbol, self.algorithm.time, status,
+                                                  order_direction(ticket.quantity), fill_price, fill_quantity, fee,
+                                                  message))
+
+    def update_order(self, ticket, fields):
+        """Amend the quantity, prices or tag of an open resting order and re-index it. An order the current bar
+           triggered but has not filled yet (from the fill callback of another order) rests again from the next bar.
+        """
+        if not ticket.is_open or ticket.order_type == OrderType.MARKET:
+            return OrderResponse(ticket.order_id, f"Order {ticket.order_id} is not an open resting order")
+        book = self.book(ticket.symbol)
+        if ticket in book:
+            book.remove(ticket)
+        for name in ('quantity', 'limit_price', 'stop_price', 'trailing_amount', 'tag'):
+            value = getattr(fields, name)
+            if value is not None:
+                setattr(ticket, name, int(value) if name == 'quantity' else value)
+        book.add(ticket)
+        self._event(ticket, OrderStatus.UPDATE_SUBMITTED)
+        return OrderResponse(ticket.order_id)
+
+    def cancel_order(self, ticket, tag=''):
+        if not ticket.is_open:
+            return OrderResponse(ticket.order_id, f"Order {ticket.order_id} is not open")
+        if ticket.order_type != OrderType.MARKET:
+            book = self.book(ticket.symbol)
+            if ticket in book:  # Not when the current bar triggered it and it waits for its fill.
+                book.remove(ticket)
+        ticket.status = OrderStatus.CANCELED
+        self._event(ticket, OrderStatus.CANCELED, message=tag)
+        return OrderResponse(ticket.order_id)
+
+    def cancel_open_orders(self, symbol=None, tag=''):
+        return [self.cancel_order(ticket, tag) for ticket in self.get_open_order_tickets(symbol)]
+
+    def process_bar(self, book, bar):
+        """Fill the resting orders of book that bar triggers, then trail the remaining trailing stops."""
+        triggered = book.pop_triggered(bar.high, bar.low)
+        if book._trailing:
+            book.trail(bar.high, bar.low)
+        self._triggered = triggered
+        try:
+            for ticket in triggered:
+                # The fill callback of an earlier order may have canceled this one, or updated it back into the book.
+                if not ticket.is_open or ticket in book:
+                    continue
+                price = ticket.fill_price(bar)
+                if ticket.order_type != OrderType.LIMIT:
+                    slippage = self.algorithm.securities[ticket.symbol].slippage_model
+                    price += _signed(slippage.get_slippage_approximation(price, ticket.quantity), ticket.quantity)
+                self.fill(ticket, price)
+        finally:
+            self._triggered = ()
+
+    def fill(self, ticket, price):
+        """Fill the remaining quantity of a ticket at price, charge the fee and notify the algorithm."""
+        quantity = ticket.quantity - ticket.quantity_filled
+        fee = self.algorithm.securities[ticket.symbol].fee_model.get_order_fee(price, quantity)
+        self.algorithm.portfolio.apply_fill(ticket.symbol, quantity, price, fee)
+        ticket.average_fill_price = ((ticket.average_fill_price * ticket.quantity_filled + price * quantity)
+                                     / ticket.quantity)
+        ticket.quantity_filled = ticket.quantity
+        ticket.status = OrderStatus.FILLED
+        self._event(ticket, OrderStatus.FILLED, price, quantity, fee)
+
+    def get_open_orders(self, symbol=None):
+        return self.get_open_order_tickets(symbol)
+
+    def get_open_order_tickets(self, symbol=None):
+        books = self.books.values() if symbol is None else [self.books[symbol]] if symbol in self.books else []
+        tickets = [ticket for book in books for ticket in book.tickets()]
+        # Orders triggered by the current bar are still open until their fill, e.g. for an OCO cancel.
+        tickets += [ticket for ticket in self._triggered
+                    if ticket.is_open and (symbol is None or ticket.symbol == symbol)
+                    and ticket not in self.books[ticket.symbol]]
+        return sorted(tickets, key=lambda ticket: ticket.order_id)
+
+    def get_order_ticket(self, order_id):
+        return self.tickets.get(order_id)
+
+    GetOpenOrders = get_open_orders
+    GetOpenOrderTickets = get_open_order_tickets
+    CancelOpenOrders = cancel_open_orders
+    GetOrderTicket = get_order_ticket
+
+
+def _signed(slippage, quantity):
+    """Slippage moves the fill price against the order: up for buys, down for sells."""
+    return slippage if quantity > 0 else -slippage
@@ -0,0 +1,211 @@
+"""
+Sentiment cache of the offline QuantConnect stand-in: a text file of timestamped lines (the tweets of
+study5_custom_data.py) is scored once, in batch and across processes, and stored next to its text in a compact
+local index keyed by a hash of its content. Readers memory-map the index and binary-search it by date, so a
+backtest starts without downloading the file or running any NLP.
+
+    python lean_sentiment.py "https://www.dropbox.com/...MuskTweetsPreProcessed.csv?...&dl=1" --keywords tsla tesla
+
+The cache directory is --cache-dir, SENTIMENT_CACHE_DIR or local_lean/sentiment_cache.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import urllib.request
+from datetime import datetime
+from multiprocessing import Pool
+from time import perf_counter
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.getenv("SENTIMENT_CACHE_DIR",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sentiment_cache'))
+
+# Bump when the layout of the index or the parsing of the lines changes, so old caches are rebuilt.
+FORMAT_VERSION = 1
+
+INDEX_DTYPE = np.dtype([('time', 'datetime64[s]'), ('score', 'f8'), ('offset', 'i8'), ('length', 'i4')])
+
+_analyzer = None
+
+
+def vader_scores(texts):
+    """NLTK VADER compound scores of some texts; the analyzer is built once per process."""
+    global _analyzer
+    if _analyzer is None:
+        from nltk.sentiment import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+    return [_analyzer.polarity_scores(text)["compound"] for text in texts]
+
+
+def read_source(source):
+    """The bytes of a local file or a URL."""
+    if source.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source) as response:
+            return response.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def parse_lines(content):
+    """(times, texts) of the 'YYYY-mm-dd HH:MM:SS,text' lines of a file, lowercased, in file order.
+       Lines like MuskTweet.reader rejects them are skipped: blank, not starting with a digit or with a bad time.
+    """
+    times, texts = [], []
+    for line in content.decode('utf-8').splitlines():
+        if not (line.strip() and line[0].isdigit()):
+            continue
+        data = line.split(",")
+        try:
+            time = datetime.strptime(data[0], "%Y-%m-%d %H:%M:%S")
+            text = data[1].lower()
+        except (ValueError, IndexError):
+            continue
+        times.append(time)
+        texts.append(text)
+    return times, texts
+
+
+def score_texts(texts, scorer=vader_scores, processes=None, chunk_size=2000):
+    """scorer over texts in chunks, across processes worker processes (all cores if None, in process if 1).
+       scorer must be a module-level function taking a list of texts and returning their scores.
+    """
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    if processes == 1 or len(chunks) <= 1:
+        scores = [scorer(chunk) for chunk in chunks]
+    else:
+        with Pool(processes) as pool:
+            scores = pool.map(scorer, chunks)
+    return np.array([score for chunk in scores for score in chunk], dtype=float)
+
+
+def cache_key(content, keywords, scorer):
+    digest = hashlib.sha256(content)
+    digest.update(repr((FORMAT_VERSION, sorted(keywords) if keywords else None,
+                        f"{scorer.__module__}.{scorer.__qualname__}")).encode())
+    return digest.hexdigest()
+
+
+def _write_atomic(path, write):
+    directory = os.path.dirname(path)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def build_sentiment_cache(content, cache_dir=DEFAULT_CACHE_DIR, keywords=None, scorer=vader_scores,
+                          processes=None):
+    """Score the lines of content (bytes) and write <key>.npy, the index sorted by time, and <key>.txt, the
+       utf-8 texts it points into. Only texts containing one of keywords are scored (all of them if None), the
+       others score 0. Returns the cache key; an existing cache of the same key is reused as is.
+    """
+    key = cache_key(content, keywords, scorer)
+    prefix = os.path.join(cache_dir, key)
+    if os.path.exists(prefix + '.npy') and os.path.exists(prefix + '.txt'):
+        return key
+
+    times, texts = parse_lines(content)
+    scores = np.zeros(len(texts))
+    if keywords:
+        scored = [i for i, text in enumerate(texts) if any(keyword in text for keyword in keywords)]
+    else:
+        scored = range(len(texts))
+    scores[scored] = score_texts([texts[i] for i in scored], scorer, processes)
+
+    order = np.argsort(np.array(times, dtype='datetime64[s]'), kind='stable')
+    encoded = [texts[i].encode('utf-8') for i in order]
+    index = np.zeros(len(order), dtype=INDEX_DTYPE)
+    index['time'] = np.array(times, dtype='datetime64[s]')[order]
+    index['score'] = scores[order]
+    index['length'] = [len(text) for text in encoded]
+    index['offset'] = np.r_[0, np.cumsum(index['length'][:-1], dtype=np.int64)]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_atomic(prefix + '.txt', lambda f: f.write(b''.join(encoded)))
+    _write_atomic(prefix + '.npy', lambda f: np.save(f, index))
+    return key
+
+
+class SentimentCache:
+    """A scored text file from build_sentiment_cache, memory-mapped: times, scores and texts by date."""
+
+    def __init__(self, cache_dir, key):
+        prefix = os.path.join(cache_dir, key)
+        self.key = key
+        self.index = np.load(prefix + '.npy', mmap_mode='r')
+        self.times = self.index['time']
+        self.scores = self.index['score']
+        self._text = np.memmap(prefix + '.txt', dtype=np.uint8, mode='r') if os.path.getsize(prefix + '.txt') \
+            else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.index)
+
+    def text(self, i):
+        offset, length = int(self.index['offset'][i]), int(self.index['length'][i])
+        return self._text[offset:offset + length].tobytes().decode('utf-8')
+
+    def rows(self, start, end):
+        """The positions i with start <= times[i] <= end, found by binary search."""
+        lo = np.datetime64(start, 'us')
+        first = lo.astype('datetime64[s]')
+        if first < lo:
+            first += np.timedelta64(1, 's')
+        last = np.datetime64(end, 'us').astype('datetime64[s]')
+        return range(np.searchsorted(self.times, first, 'left'), np.searchsorted(self.times, last, 'right'))
+
+    def between(self, start, end):
+        """(time, score, text) of the lines timed between start and end included, in time order."""
+        rows = self.rows(start, end)
+        times = self.times[rows.start:rows.stop].astype('datetime64[us]').tolist()
+        scores = self.scores[rows.start:rows.stop].tolist()
+        return [(time, score, self.text(i)) for time, score, i in zip(times, scores, rows)]
+
+
+def sentiment_cache(source, cache_dir=DEFAULT_CACHE_DIR, keywords=None, scorer=vader_scores, processes=None,
+                    refresh=False):
+    """The SentimentCache of a file or URL, built on first use. sources.json in cache_dir remembers the key of
+       every source, so later calls neither download nor hash it; refresh reads the source again.
+    """
+    manifest_path = os.path.join(cache_dir, 'sources.json')
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    entry = repr((source, sorted(keywords) if keywords else None, f"{scorer.__module__}.{scorer.__qualname__}",
+                  FORMAT_VERSION))
+
+    key = manifest.get(entry)
+    if refresh or key is None or not os.path.exists(os.path.join(cache_dir, key + '.npy')):
+        key = build_sentiment_cache(read_source(source), cache_dir, keywords, scorer, processes)
+        manifest[entry] = key
+        _write_atomic(manifest_path, lambda f: f.write(json.dumps(manifest, indent=1).encode()))
+    return SentimentCache(cache_dir, key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a timestamped text file once into the sentiment cache.")
+    parser.add_argument('source', help="local path or URL of the 'YYYY-mm-dd HH:MM:SS,text' file")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--keywords', nargs='*', help="score only the lines containing one of these (lowercase)")
+    parser.add_argument('--processes', type=int, help="worker processes, all cores by default")
+    parser.add_argument('--refresh', action='store_true', help="read the source again even if already cached")
+    args = parser.parse_args()
+
+    started = perf_counter()
+    cache = sentiment_cache(args.source, args.cache_dir, args.keywords, processes=args.processes,
+                            refresh=args.refresh)
+    print(f"{len(cache):,} lines, {int((cache.scores != 0).sum()):,} non-zero scores, "
+          f"{os.path.join(args.cache_dir, cache.key)}.npy ({perf_counter() - started:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Universe selection of the offline QuantConnect stand-in: the fundamentals table kept column by column, the
+per-day slices handed to the universe filters, and UniverseSelection, chained filters and top-k rankings
+evaluated on the columns with np.partition instead of sorting Fundamental objects.
+"""
+
+import numpy as np
+import pandas as pd
+
+from lean_data import Symbol
+
+
+class _Unchanged:
+    def __repr__(self):
+        return 'Universe.UNCHANGED'
+
+
+class Universe:
+    UNCHANGED = _Unchanged()
+    Unchanged = unchanged = UNCHANGED
+
+
+class Fundamental:
+    """One row of the fundamentals table handed to the universe filters (coarse and fine)."""
+
+    def __init__(self, row):
+        self.__dict__.update(row)
+        self.symbol = Symbol(row['symbol'])
+
+    Symbol = property(lambda self: self.symbol)
+
+
+class FundamentalsTable:
+    """Fundamentals (date, symbol, price, dollar_volume, has_fundamental_data, market_cap, ...) as one numpy
+       array per column sorted by date, symbols as integer codes, and the row range of every day.
+       fundamentals: a DataFrame or a mapping of column name to array (a Categorical symbol column is not
+       expanded). Build it once and pass it to run_algorithm to reuse it across backtests.
+    """
+
+    def __init__(self, fundamentals):
+        dates = np.asarray(fundamentals['date'])
+        if dates.dtype.kind != 'M':
+            dates = pd.to_datetime(dates).values
+        dates = dates.astype('datetime64[D]', copy=False)
+        symbols = fundamentals['symbol']
+        if isinstance(symbols.dtype, pd.CategoricalDtype):
+            symbols = pd.Categorical(symbols)
+            codes, names = symbols.codes, symbols.categories
+        else:
+            codes, names = pd.factorize(symbols)
+        self.columns = {name: np.asarray(fundamentals[name]) for name in fundamentals.keys()
+                        if name not in ('date', 'symbol')}
+        self.symbol_codes = codes.astype(np.int32)
+        if len(dates) and (dates[1:] < dates[:-1]).any():
+            order = np.argsort(dates, kind='stable')
+            dates, self.symbol_codes = dates[order], self.symbol_codes[order]
+            self.columns = {name: values[order] for name, values in self.columns.items()}
+        self.symbols = np.array([Symbol(name) for name in names], dtype=object)
+        self._codes = {symbol: code for code, symbol in enumerate(self.symbols)}
+
+        starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]]) if len(dates) else np.zeros(0, dtype=int)
+        self.days = dates[starts].tolist()
+        self._ranges = dict(zip(self.days, zip(starts.tolist(), np.r_[starts[1:], len(dates)].tolist())))
+
+    def on(self, day):
+        """The fundamentals of a date as a FundamentalsSlice, None if the table has no row for it."""
+        bounds = self._ranges.get(day)
+        return None if bounds is None else FundamentalsSlice(self, slice(*bounds))
+
+    def codes(self, symbols):
+        return np.array([self._codes[symbol] for symbol in symbols if symbol in self._codes], dtype=np.int32)
+
+
+class FundamentalsSlice:
+    """Rows of a FundamentalsTable (one day, or a subset of it), in table order. Iterating yields Fundamental
+       objects like LEAN's coarse and fine lists, built only then; column() reads the values without them.
+    """
+
+    def __init__(self, table, rows):
+        self.table = table
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.table.symbol_codes[self.rows])
+
+    def column(self, name):
+        if name == 'symbol':
+            return self.symbols
+        return self.table.columns[name][self.rows]
+
+    @property
+    def symbols(self):
+        return self.table.symbols[self.table.symbol_codes[self.rows]]
+
+    def subset(self, symbols):
+        """The rows of these symbols, still in table order."""
+        codes = self.table.symbol_codes[self.rows]
+        positions = np.flatnonzero(np.isin(codes, self.table.codes(symbols)))
+        if isinstance(self.rows, slice):
+            return FundamentalsSlice(self.table, self.rows.start + positions)
+        return FundamentalsSlice(self.table, self.rows[positions])
+
+    def __iter__(self):
+        names = list(self.table.columns)
+        values = [self.column(name).tolist() for name in names]
+        for symbol, row in zip(self.symbols.tolist(), zip(*values)):
+            yield Fundamental(dict(zip(names, row), symbol=symbol))
+
+
+class _Columns:
+    """Attribute access to the columns of some rows of a FundamentalsSlice: f.price, f.market_cap, ..."""
+
+    def __init__(self, fundamentals, positions):
+        self._fundamentals = fundamentals
+        self._positions = positions
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._fundamentals.column(name)[self._positions]
+
+
+def top_k(values, k, largest=True):
+    """Positions of the k largest (or smallest) values, best first, with ties in position order as a stable
+       sort would give them; NaN ranks last. The k-th value comes from np.partition, O(n), and only the k
+       winners are sorted, instead of sorting all n values.
+    """
+    values = np.asarray(values, dtype=float)
+    key = np.where(np.isnan(values), np.inf, -values if largest else values)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(key):
+        kth = np.partition(key, k - 1)[k - 1]
+        better = np.flatnonzero(key < kth)
+        ties = np.flatnonzero(key == kth)[:k - len(better)]
+        chosen = np.concatenate([better, ties])
+    else:
+        chosen = np.arange(len(key))
+    return chosen[np.argsort(key[chosen], kind='stable')]
+
+
+class UniverseSelection:
+    """Chained filters and rank keys over the columns of the fundamentals, e.g.
+
+           UniverseSelection(rebalance=timedelta(30)).where(lambda f: f.price > 10).top(200, 'dollar_volume')
+
+       where(condition) keeps the rows for which condition(f) is True, f giving each column as an array.
+       top(k, key) and bottom(k, key) keep the k rows with the largest or smallest key (a column name or a
+       function of f), ties broken by table order like sorted() would. Each stage sees the rows of the previous
+       one in table order; select() returns their symbols in the order of the last ranking.
+
+       With rebalance, select(fundamentals, time) recomputes only once more than rebalance has passed since
+       the last selection and returns Universe.UNCHANGED in between, so a selection function can return it as
+       is; the cached symbols stay in selected.
+    """
+
+    def __init__(self, rebalance=None):
+        self.rebalance = rebalance
+        self.selected = None
+        self._stages = []
+        self._next_time = None
+
+    def where(self, condition):
+        self._stages.append((condition, None, None))
+        return self
+
+    def top(self, k, key):
+        self._stages.append((key, k, True))
+        return self
+
+    def bottom(self, k, key):
+        self._stages.append((key, k, False))
+        return self
+
+    def select(self, fundamentals, time=None):
+        if self.rebalance is not None and time is not None:
+            if self._next_time is not None and time <= self._next_time:
+                return Universe.UNCHANGED
+            self._next_time = time + self.rebalance
+
+        if not isinstance(fundamentals, FundamentalsSlice):
+            raise TypeError("UniverseSelection needs the columnar fundamentals the local event loop passes")
+        order = np.arange(len(fundamentals))
+        for key, k, largest in self._stages:
+            if k is None:
+                order = order[np.asarray(key(_Columns(fundamentals, order)), dtype=bool)]
+            else:
+                rows = np.sort(order)
+                f = _Columns(fundamentals, rows)
+                order = rows[top_k(getattr(f, key) if isinstance(key, str) else key(f), k, largest)]
+        self.selected = fundamentals.symbols[order].tolist()
+        return self.selected
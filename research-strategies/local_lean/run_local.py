@@ -0,0 +1,69 @@
+"""
+Run a QuantConnect algorithm file unmodified on local data.
+
+    python run_local.py ../corsoAZ/study3_consolidator.py --start 2023-01-01 --end 2023-12-31
+    python run_local.py ../corsoAZ/study6_performance_analysis.py --param sma_length=50
+
+Bars come from the polygon_helpers Parquet cache (--cache-dir, POLYGON_CACHE_DIR); with --fetch, missing
+months are downloaded through polygon_helpers first.
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lean_algorithm import QCAlgorithm, run_algorithm  # noqa: E402
+from lean_data import DEFAULT_CACHE_DIR, PolygonCacheData  # noqa: E402
+
+
+def load_algorithm_class(path, name=None):
+    """Import an algorithm file and return its QCAlgorithm subclass (the one called name, if given)."""
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+
+    classes = [value for value in vars(module).values()
+               if isinstance(value, type) and issubclass(value, QCAlgorithm) and value.__module__ == module_name]
+    if name is not None:
+        classes = [cls for cls in classes if cls.__name__ == name]
+    if len(classes) != 1:
+        raise ValueError(f"Expected one QCAlgorithm subclass in {path}, found {[cls.__name__ for cls in classes]}")
+    return classes[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('algorithm', help='path of the algorithm file')
+    parser.add_argument('--name', help='algorithm class name, if the file defines several')
+    parser.add_argument('--start', help='override the start date (YYYY-MM-DD)')
+    parser.add_argument('--end', help='override the end date (YYYY-MM-DD)')
+    parser.add_argument('--param', action='append', default=[], help='get_parameter value as name=value')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='polygon_helpers Parquet cache')
+    parser.add_argument('--fetch', action='store_true', help='download missing months from Polygon')
+    parser.add_argument('--adjusted', action='store_true', help='use split-adjusted bars')
+    args = parser.parse_args()
+
+    parameters = dict(param.split('=', 1) for param in args.param)
+    data = PolygonCacheData(args.cache_dir, adjusted=args.adjusted, fetch=args.fetch)
+    algorithm_class = load_algorithm_class(os.path.abspath(args.algorithm), args.name)
+
+    started = time.perf_counter()
+    algorithm = run_algorithm(algorithm_class, data, args.start, args.end, parameters)
+    elapsed = time.perf_counter() - started
+
+    for line in algorithm.logs:
+        print(line)
+    equity = algorithm.equity
+    print(f"{algorithm_class.__name__}: {len(equity)} days in {elapsed:.2f}s, "
+          f"final portfolio value {equity.iloc[-1]:,.2f}, "
+          f"{len(algorithm.transactions.tickets)} orders")
+
+
+if __name__ == '__main__':
+    main()
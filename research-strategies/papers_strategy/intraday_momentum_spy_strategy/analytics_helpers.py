@@ -0,0 +1,115 @@
+import numpy as np
+
+# Trading days per year used to annualize daily statistics.
+PERIODS_PER_YEAR = 252
+
+
+def _as_2d(values):
+    """View a 1-D series or a 2-D batch (series x days) as 2-D; also return whether the input was 1-D."""
+    values = np.asarray(values, dtype=float)
+    return np.atleast_2d(values), values.ndim == 1
+
+
+def _unwrap(result, one_dimensional):
+    return result[0] if one_dimensional else result
+
+
+def total_return(ret):
+    """Compounded return over the non-NaN periods."""
+    ret, one_dimensional = _as_2d(ret)
+    return _unwrap(np.nanprod(1 + ret, axis=-1) - 1, one_dimensional)
+
+
+def annualized_return(ret, periods_per_year=PERIODS_PER_YEAR):
+    """Compounded return of the non-NaN periods, annualized over the full span (NaN periods included)."""
+    ret, one_dimensional = _as_2d(ret)
+    return _unwrap(np.nanprod(1 + ret, axis=-1) ** (periods_per_year / ret.shape[-1]) - 1, one_dimensional)
+
+
+def annualized_volatility(ret, periods_per_year=PERIODS_PER_YEAR):
+    """Sample standard deviation (ddof=1) of the non-NaN returns, annualized."""
+    ret, one_dimensional = _as_2d(ret)
+    return _unwrap(np.nanstd(ret, axis=-1, ddof=1) * np.sqrt(periods_per_year), one_dimensional)
+
+
+def sharpe_ratio(ret, periods_per_year=PERIODS_PER_YEAR):
+    """Annualized mean over standard deviation of the non-NaN returns (zero risk-free rate)."""
+    ret, one_dimensional = _as_2d(ret)
+    sharpe = np.nanmean(ret, axis=-1) / np.nanstd(ret, axis=-1, ddof=1) * np.sqrt(periods_per_year)
+    return _unwrap(sharpe, one_dimensional)
+
+
+def hit_ratio(ret):
+    """Share of positive returns among the non-zero, non-NaN returns."""
+    ret, one_dimensional = _as_2d(ret)
+    return _unwrap((ret > 0).sum(axis=-1) / (np.abs(ret) > 0).sum(axis=-1), one_dimensional)
+
+
+def equity_curve(ret, initial=1.0):
+    """Equity path compounding the returns, flat on NaN periods."""
+    ret, one_dimensional = _as_2d(ret)
+    return _unwrap(initial * np.cumprod(1 + np.nan_to_num(ret), axis=-1), one_dimensional)
+
+
+def _running_max(values):
+    """Running maximum along the last axis of a 2-D array, one row at a time: np.maximum.accumulate over the
+       last axis of a whole batch is an order of magnitude slower than over each contiguous row.
+    """
+    out = np.empty_like(values)
+    for row, source in zip(out, values):
+        np.maximum.accumulate(source, out=row)
+    return out
+
+
+def max_drawdown(equity):
+    """Maximum drawdown (as a positive fraction) and its duration (longest run of periods below a previous peak)."""
+    equity, one_dimensional = _as_2d(equity)
+    peak = _running_max(equity)
+    drawdown = -(equity / peak - 1).min(axis=-1)
+
+    periods = np.arange(equity.shape[-1])
+    last_peak = _running_max(np.where(equity >= peak, periods, 0))
+    duration = (periods - last_peak).max(axis=-1)
+    return _unwrap(drawdown, one_dimensional), _unwrap(duration, one_dimensional)
+
+
+def alpha_beta(ret, benchmark_ret, periods_per_year=PERIODS_PER_YEAR):
+    """Closed-form OLS of ret on benchmark_ret over the periods where both are present.
+       benchmark_ret may be a single series broadcast against a 2-D batch of returns.
+       Returns (annualized alpha, beta).
+    """
+    ret, one_dimensional = _as_2d(ret)
+    both = ~np.isnan(ret) & ~np.isnan(benchmark_ret)
+    n = both.sum(axis=-1, keepdims=True)
+    y = np.where(both, ret, 0.0)
+    x = np.where(both, benchmark_ret, 0.0)
+    x_mean = x.sum(axis=-1, keepdims=True) / n
+    y_mean = y.sum(axis=-1, keepdims=True) / n
+    x_dev = np.where(both, x - x_mean, 0.0)
+    beta = (x_dev * y).sum(axis=-1) / (x_dev ** 2).sum(axis=-1)
+    alpha = y_mean[..., 0] - beta * x_mean[..., 0]
+    return _unwrap(alpha * periods_per_year, one_dimensional), _unwrap(beta, one_dimensional)
+
+
+def summary_stats(ret, equity=None, benchmark_ret=None, periods_per_year=PERIODS_PER_YEAR):
+    """All performance stats of a return series, or of a (series x days) batch in one vectorized call.
+       equity: AUM path(s) for the drawdown; defaults to compounding ret.
+       benchmark_ret: adds alpha (annualized) and beta against this benchmark.
+       Returns a dict of unrounded values (scalars for 1-D input, arrays for a batch).
+    """
+    if equity is None:
+        equity = equity_curve(ret)
+    drawdown, drawdown_duration = max_drawdown(equity)
+    stats = {
+        'total_return': total_return(ret),
+        'annualized_return': annualized_return(ret, periods_per_year),
+        'annualized_volatility': annualized_volatility(ret, periods_per_year),
+        'sharpe_ratio': sharpe_ratio(ret, periods_per_year),
+        'hit_ratio': hit_ratio(ret),
+        'max_drawdown': drawdown,
+        'max_drawdown_duration': drawdown_duration,
+        'n_trading_days': _unwrap((~np.isnan(_as_2d(ret)[0])).sum(axis=-1), np.ndim(ret) == 1),
+    }
+    if benchmark_ret is not None:
+        stats['alpha'], stats['beta'] = alpha_beta(ret, benchmark_ret, periods_per_year)
+    return stats
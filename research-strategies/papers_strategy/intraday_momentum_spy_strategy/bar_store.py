@@ -0,0 +1,121 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+
+class BarStore:
+    """Compact columnar storage for minute bars, backed by NumPy arrays or read-only memmaps.
+
+    Layout (per bar unless noted):
+    - ts: int64 minutes since the epoch of the naive Eastern bar time ('caldt'),
+    - open/high/low/close: float32 prices, or int32 tick counts when tick_size is set (exact prices),
+    - volume: int32 (int64 only if a volume does not fit),
+    - day_ordinals: int32 date.toordinal() of each trading day (per day),
+    - day_offsets: int64 index of the first bar of each day, plus the total bar count (per day + 1).
+
+    Bars are sorted by time, so every day is a contiguous slice and day(i) returns zero-copy views.
+    """
+
+    def __init__(self, ts, prices, volume, day_ordinals, day_offsets, tick_size=None):
+        self.ts = ts
+        self.prices = prices
+        self.volume = volume
+        self.day_ordinals = day_ordinals
+        self.day_offsets = day_offsets
+        self.tick_size = tick_size
+
+    @classmethod
+    def from_frame(cls, df, tick_size=None):
+        """Build a store from bars as returned by fetch_polygon_data (volume, open, high, low, close, caldt).
+           tick_size: store prices as exact integer multiples of this tick (e.g. 0.01) instead of float32.
+        """
+        df = df.sort_values('caldt')
+        ts = pd.to_datetime(df['caldt']).to_numpy().astype('datetime64[m]').astype(np.int64)
+
+        if tick_size is None:
+            prices = {column: df[column].to_numpy(dtype=np.float32) for column in PRICE_COLUMNS}
+        else:
+            prices = {column: np.round(df[column].to_numpy(dtype=float) / tick_size).astype(np.int32)
+                      for column in PRICE_COLUMNS}
+
+        volume = df['volume'].to_numpy()
+        volume = volume.astype(np.int32 if volume.max(initial=0) <= np.iinfo(np.int32).max else np.int64)
+
+        # Days are contiguous because bars are sorted: keep only where each one starts.
+        day_numbers = ts // (24 * 60)
+        starts = np.flatnonzero(np.diff(day_numbers, prepend=-1))
+        day_ordinals = (day_numbers[starts] + pd.Timestamp('1970-01-01').toordinal()).astype(np.int32)
+        day_offsets = np.append(starts, len(ts)).astype(np.int64)
+        return cls(ts, prices, volume, day_ordinals, day_offsets, tick_size)
+
+    def save(self, path):
+        """Write the store as one .npy file per array plus a small JSON metadata file."""
+        os.makedirs(path, exist_ok=True)
+        arrays = {'ts': self.ts, 'volume': self.volume, 'day_ordinals': self.day_ordinals,
+                  'day_offsets': self.day_offsets, **self.prices}
+        for name, values in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), values)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'tick_size': self.tick_size}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Open a store written by save(); by default the arrays are memory-mapped, not read into memory."""
+        def load_array(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        prices = {column: load_array(column) for column in PRICE_COLUMNS}
+        return cls(load_array('ts'), prices, load_array('volume'), load_array('day_ordinals'),
+                   load_array('day_offsets'), meta['tick_size'])
+
+    def __len__(self):
+        return len(self.ts)
+
+    @property
+    def n_days(self):
+        return len(self.day_ordinals)
+
+    @property
+    def nbytes(self):
+        """Total size of the stored arrays in bytes."""
+        arrays = [self.ts, self.volume, self.day_ordinals, self.day_offsets, *self.prices.values()]
+        return sum(values.nbytes for values in arrays)
+
+    def caldt(self):
+        """Bar times as a zero-copy datetime64[m] view."""
+        return self.ts.view('datetime64[m]')
+
+    def days(self):
+        """Trading days as datetime.date objects."""
+        return [pd.Timestamp.fromordinal(int(ordinal)).date() for ordinal in self.day_ordinals]
+
+    def price(self, column):
+        """Prices of one column as float64 (decoded from ticks if the store uses exact ticks)."""
+        values = self.prices[column]
+        if self.tick_size is None:
+            return values.astype(np.float64)
+        # Dividing by the integral ticks-per-unit gives the correctly rounded price (40001 / 100 == 400.01).
+        return values / round(1 / self.tick_size)
+
+    def day_slice(self, i):
+        """Slice of the bars of the i-th trading day."""
+        return slice(self.day_offsets[i], self.day_offsets[i + 1])
+
+    def day(self, i):
+        """Zero-copy views on the raw arrays of the i-th trading day."""
+        bars = self.day_slice(i)
+        return {'ts': self.ts[bars], 'volume': self.volume[bars],
+                **{column: values[bars] for column, values in self.prices.items()}}
+
+    def to_frame(self):
+        """Bars as a DataFrame in the fetch_polygon_data format, for the pandas-based feature stage."""
+        df = pd.DataFrame({'volume': self.volume.astype(np.float64),
+                           **{column: self.price(column) for column in PRICE_COLUMNS}})
+        df['caldt'] = self.caldt().astype('datetime64[ns]')
+        return df
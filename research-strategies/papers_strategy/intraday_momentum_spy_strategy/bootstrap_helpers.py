@@ -0,0 +1,149 @@
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from analytics_helpers import PERIODS_PER_YEAR, summary_stats
+
+# Resampling schemes of bootstrap_stats.
+METHODS = ('stationary', 'reshuffle')
+
+# Default number of resampled values (paths x days, over all series) generated and scored at a time: chunks of a
+# few MB stay in cache and are much faster than fewer, larger ones.
+CHUNK_VALUES = 2 ** 18
+
+# Worker-side inputs of the resampling: returns, benchmark returns and settings.
+_worker_inputs = None
+
+
+def stationary_bootstrap_indices(n_days, n_resamples, mean_block, rng, out=None):
+    """Day indices of n_resamples stationary block-bootstrap paths (Politis-Romano), (n_resamples x n_days).
+       Each path is made of blocks of consecutive days with geometric lengths of mean mean_block, each block
+       starting on a uniformly drawn day and wrapping around the end of the series.
+       out: preallocated int64 array of that shape to fill instead of allocating one.
+    """
+    positions = np.arange(n_days)
+    new_block = rng.random((n_resamples, n_days)) < 1.0 / mean_block
+    new_block[:, 0] = True
+
+    # Within a block, index - position is constant: the block's first day minus its start. Spreading the change
+    # of that constant at every block start and summing them over the flattened paths (each path opens a block)
+    # gives it for every day without a running maximum over the starts.
+    shift = rng.integers(0, n_days, int(new_block.sum())) - np.broadcast_to(positions, new_block.shape)[new_block]
+    out = np.empty((n_resamples, n_days), dtype=np.int64) if out is None else out
+    out[...] = 0
+    out[new_block] = np.diff(shift, prepend=0)
+    np.cumsum(out, out=out.reshape(-1))
+    out += positions
+    out %= n_days
+    return out
+
+
+def reshuffle_indices(n_days, n_resamples, rng, out=None):
+    """Day indices of n_resamples random reorderings of the days, (n_resamples x n_days).
+       out: preallocated int64 array of that shape to fill instead of allocating one.
+    """
+    out = np.empty((n_resamples, n_days), dtype=np.int64) if out is None else out
+    out[...] = np.arange(n_days)
+    return rng.permuted(out, axis=1, out=out)
+
+
+def _init_worker(inputs):
+    """Pool initializer: keep the returns to resample in this worker."""
+    global _worker_inputs
+    _worker_inputs = inputs
+
+
+def _resample_chunk(task):
+    """summary_stats of one chunk of resampled paths of every series, each stat as (series x chunk)."""
+    seed, size = task
+    inputs = _worker_inputs
+    ret, benchmark_ret = inputs['ret'], inputs['benchmark_ret']
+    n_series, n_days = ret.shape
+    rng = np.random.default_rng(seed)
+
+    # The index buffer of the last chunk is reused, so memory stays at one chunk whatever the resample count.
+    buffer = inputs.get('buffer')
+    if buffer is None or buffer.shape[0] != size:
+        buffer = inputs['buffer'] = np.empty((size, n_days), dtype=np.int64)
+    if inputs['method'] == 'stationary':
+        indices = stationary_bootstrap_indices(n_days, size, inputs['mean_block'], rng, out=buffer)
+    else:
+        indices = reshuffle_indices(n_days, size, rng, out=buffer)
+
+    paths = ret[:, indices].reshape(n_series * size, n_days)
+    benchmark = None if benchmark_ret is None else np.tile(benchmark_ret[indices], (n_series, 1))
+    with np.errstate(divide='ignore', invalid='ignore'):  # Paths without any variation have no volatility.
+        stats = summary_stats(paths, benchmark_ret=benchmark, periods_per_year=inputs['periods_per_year'])
+    return {name: np.asarray(values, dtype=float).reshape(n_series, size) for name, values in stats.items()}
+
+
+def bootstrap_stats(ret, n_resamples=10000, method='stationary', mean_block=20, benchmark_ret=None,
+                    confidence=0.95, chunk_size=None, n_workers=1, seed=None, periods_per_year=PERIODS_PER_YEAR):
+    """Confidence intervals of the summary_stats of daily strategy returns from resampled return paths.
+       ret: daily returns, one series or a (series x days) batch; NaN days stay NaN wherever they are drawn.
+       method: 'stationary' draws stationary block-bootstrap paths (blocks of mean length mean_block keep
+               short-range autocorrelation); 'reshuffle' reorders the days, which leaves return, volatility and
+               Sharpe unchanged and only spreads the path-dependent stats (drawdown and its duration).
+       benchmark_ret: daily benchmark returns (one series), resampled on the same days, to add alpha and beta.
+       chunk_size: resamples generated and scored at a time (about CHUNK_VALUES values by default); memory is
+                   one chunk of paths (chunk_size x days per series), not n_resamples of them.
+       n_workers: processes scoring chunks (None for os.cpu_count()); 1 runs in the current process. Results
+                  depend on seed only, not on n_workers.
+       Returns (intervals, samples): a DataFrame indexed by stat (by (series, stat) for a batch) with the point
+       'estimate' of the original returns and the 'mean', 'std', 'lower' and 'upper' confidence bounds of the
+       resampled stats, and a dict of stat -> resampled values (n_resamples, or series x n_resamples).
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown resampling method {method!r}, expected one of {METHODS}")
+    ret = np.asarray(ret, dtype=float)
+    one_dimensional = ret.ndim == 1
+    ret = np.atleast_2d(ret)
+    if benchmark_ret is not None:
+        benchmark_ret = np.asarray(benchmark_ret, dtype=float)
+
+    chunk_size = chunk_size or max(1, CHUNK_VALUES // ret.size)
+    sizes = [min(chunk_size, n_resamples - start) for start in range(0, n_resamples, chunk_size)]
+    tasks = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+    inputs = {'ret': ret, 'benchmark_ret': benchmark_ret, 'method': method, 'mean_block': mean_block,
+              'periods_per_year': periods_per_year}
+    n_workers = n_workers or os.cpu_count()
+
+    samples = {}
+    offset = 0
+
+    def collect(chunk):
+        nonlocal offset
+        for name, values in chunk.items():
+            if name not in samples:
+                samples[name] = np.empty((ret.shape[0], n_resamples))
+            samples[name][:, offset:offset + values.shape[1]] = values
+        offset += next(iter(chunk.values())).shape[1]
+
+    if n_workers == 1 or len(tasks) == 1:
+        _init_worker(inputs)
+        for task in tasks:
+            collect(_resample_chunk(task))
+        _init_worker(None)
+    else:
+        with Pool(processes=min(n_workers, len(tasks)), initializer=_init_worker, initargs=(inputs,)) as pool:
+            for chunk in pool.imap(_resample_chunk, tasks):
+                collect(chunk)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        estimate = summary_stats(ret, benchmark_ret=benchmark_ret, periods_per_year=periods_per_year)
+    tail = (1 - confidence) / 2 * 100
+    rows = {}
+    for name, values in samples.items():
+        lower, upper = np.nanpercentile(values, [tail, 100 - tail], axis=-1)
+        for series in range(ret.shape[0]):
+            rows[(series, name)] = {'estimate': float(np.asarray(estimate[name], dtype=float)[series]),
+                                    'mean': np.nanmean(values[series]), 'std': np.nanstd(values[series]),
+                                    'lower': lower[series], 'upper': upper[series]}
+
+    intervals = pd.DataFrame.from_dict(rows, orient='index')
+    intervals.index.names = ['series', 'stat']
+    if one_dimensional:
+        return intervals.loc[0], {name: values[0] for name, values in samples.items()}
+    return intervals, samples
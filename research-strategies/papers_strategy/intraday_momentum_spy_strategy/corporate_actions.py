@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+# date.toordinal() of 1970-01-01, to turn epoch day numbers into the ordinals used by BarStore.
+EPOCH_ORDINAL = pd.Timestamp('1970-01-01').toordinal()
+
+
+def day_ordinals(days):
+    """date.toordinal() of dates, Timestamps or datetime64 values, as an int32 array."""
+    days = pd.to_datetime(pd.Index(days)).to_numpy().astype('datetime64[D]').astype(np.int64)
+    return (days + EPOCH_ORDINAL).astype(np.int32)
+
+
+def carry_last_close(last_close, dividend, split_ratio=None):
+    """Last close of every day, (..., days), where a day without a close (NaN, e.g. no bars for the ticker on a
+       shared calendar) carries the previous one forward, adjusted for that day's actions. Leading NaN days stay NaN.
+    """
+    last_close = np.array(last_close, dtype=float)
+    missing = np.isnan(last_close)
+    gap_days = np.flatnonzero(missing[..., 1:].any(axis=tuple(range(missing.ndim - 1)))) + 1
+    if len(gap_days) == 0:
+        return last_close
+    dividend = np.broadcast_to(dividend, last_close.shape)
+    split_ratio = np.broadcast_to(1.0 if split_ratio is None else split_ratio, last_close.shape)
+    for d in gap_days.tolist():  # In day order, so that gaps of several days chain.
+        gap = missing[..., d]
+        carried = last_close[..., d]
+        carried[gap] = last_close[..., d - 1][gap] / split_ratio[..., d][gap] - dividend[..., d][gap]
+    return last_close
+
+
+def adjust_prev_close(last_close, dividend, split_ratio=None):
+    """Previous close of every day adjusted for the actions going effective that day, (..., days); NaN on the
+       first day. last_close, dividend and split_ratio are per day on the last axis (dividend per share after the
+       split; split_ratio is new shares per old share). Days without a close are bridged by carry_last_close, so
+       the day after a gap compares with the last traded close.
+    """
+    last_close = carry_last_close(last_close, dividend, split_ratio)
+    prev_close_adjusted = np.full(last_close.shape, np.nan)
+    prev_close = last_close[..., :-1]
+    if split_ratio is not None:
+        prev_close = prev_close / np.asarray(split_ratio)[..., 1:]
+    prev_close_adjusted[..., 1:] = prev_close - np.asarray(dividend)[..., 1:]
+    return prev_close_adjusted
+
+
+class CorporateActions:
+    """Dividends and splits of one ticker as small per-day arrays on its trading calendar.
+
+    Layout (per trading day):
+    - day_ordinals: int32 date.toordinal() of each trading day, sorted,
+    - dividend: float64 cash dividend going ex that day (0 if none; several on one day are summed),
+    - split_ratio: float64 new shares per old share of a split effective that day (1 if none).
+
+    A day's adjusted previous close is one lookup (prev_close_adjusted_at), and adjusted price series are only
+    computed when asked for (adjustment_factors, adjusted), so minute frames never carry an action column.
+    """
+
+    def __init__(self, day_ordinals, dividend, split_ratio):
+        self.day_ordinals = day_ordinals
+        self.dividend = dividend
+        self.split_ratio = split_ratio
+
+    @classmethod
+    def from_polygon(cls, all_days, dividends=None, splits=None):
+        """Build the arrays for the trading days all_days (dates, Timestamps or datetime64).
+           dividends: DataFrame from fetch_polygon_dividends (caldt, dividend).
+           splits: DataFrame from fetch_polygon_splits (caldt, split_ratio).
+           Actions dated on days outside all_days are ignored, like the left merge on trading days they replace.
+        """
+        ordinals = np.unique(day_ordinals(all_days))
+        dividend = np.zeros(len(ordinals))
+        split_ratio = np.ones(len(ordinals))
+        for events, column, values, combine in ((dividends, 'dividend', dividend, np.add),
+                                                (splits, 'split_ratio', split_ratio, np.multiply)):
+            if events is None or len(events) == 0:
+                continue
+            event_ordinals = day_ordinals(events['caldt'])
+            positions = np.searchsorted(ordinals, event_ordinals)
+            inside = positions < len(ordinals)
+            inside[inside] = ordinals[positions[inside]] == event_ordinals[inside]
+            combine.at(values, positions[inside], events[column].to_numpy(dtype=float)[inside])
+        return cls(ordinals, dividend, split_ratio)
+
+    def __len__(self):
+        return len(self.day_ordinals)
+
+    def index(self, day):
+        """Position of a trading day (date or Timestamp) in the arrays."""
+        ordinal = pd.Timestamp(day).toordinal()
+        position = int(np.searchsorted(self.day_ordinals, ordinal))
+        if position == len(self.day_ordinals) or self.day_ordinals[position] != ordinal:
+            raise KeyError(f"{day} is not a trading day of these corporate actions")
+        return position
+
+    def on(self, days):
+        """(dividend, split_ratio) aligned on another calendar days; days without an entry get no action."""
+        ordinals = day_ordinals(days)
+        dividend = np.zeros(len(ordinals))
+        split_ratio = np.ones(len(ordinals))
+        positions = np.searchsorted(self.day_ordinals, ordinals)
+        known = positions < len(self.day_ordinals)
+        known[known] = self.day_ordinals[positions[known]] == ordinals[known]
+        dividend[known] = self.dividend[positions[known]]
+        split_ratio[known] = self.split_ratio[positions[known]]
+        return dividend, split_ratio
+
+    def prev_close_adjusted_at(self, d, prev_close):
+        """Close of the day before day position d adjusted for the actions of day d."""
+        return prev_close / self.split_ratio[d] - self.dividend[d]
+
+    def prev_close_adjusted(self, last_close):
+        """Adjusted previous close of every day from the last close of every day (NaN on the first day)."""
+        return adjust_prev_close(last_close, self.dividend, self.split_ratio)
+
+    def adjustment_factors(self, last_close):
+        """Backward adjustment factor of every day: multiplying a day's prices by it makes them comparable with
+           the last day's (total-return adjustment for dividends, share-count adjustment for splits).
+        """
+        last_close = np.asarray(last_close, dtype=float)
+        event = np.ones(len(last_close))
+        event[1:] = (1 - self.dividend[1:] * self.split_ratio[1:] / last_close[:-1]) / self.split_ratio[1:]
+        factors = np.ones(len(last_close))
+        factors[:-1] = np.cumprod(event[:0:-1])[::-1]
+        return factors
+
+    def adjusted(self, prices, day_codes, last_close):
+        """Adjusted copy of per-bar prices whose trading day positions are day_codes, computed on demand."""
+        return np.asarray(prices, dtype=float) * self.adjustment_factors(last_close)[day_codes]
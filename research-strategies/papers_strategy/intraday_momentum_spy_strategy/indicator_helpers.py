@@ -0,0 +1,370 @@
+"""
+Streaming indicators (SMA, EMA, VWAP, rolling std) with an O(1) update() and a vectorized compute() that
+returns exactly the values update() would, so a batch warm-up and a live stream never disagree.
+
+Rolling windows keep the cumulative sum of their input and a ring buffer holding the cumulative sum at each
+of the last `period` samples: a window sum is the cumulative sum minus the one `period` samples ago.
+Rounding error is never carried from update to update like with add-the-new, subtract-the-old running sums;
+it only grows with the magnitude of the cumulative sum, which is rebased on zero every RESYNC_EVERY samples
+(or `period`, if larger) so the drift stays bounded however long the stream. compute() runs the same float
+operations block by block with np.cumsum, and warm_up() leaves an instance in the state those updates would.
+
+Instances use __slots__ and an array('d') ring, about 8 bytes per window slot and per summed series plus a
+fixed ~100 bytes, so tens of thousands of them (symbols x parameters) fit in memory. Inputs must not be NaN:
+a NaN poisons the running sums until reset().
+"""
+
+import math
+from array import array
+
+import numpy as np
+
+# Samples between two rebases of the cumulative sums of a rolling window.
+RESYNC_EVERY = 4096
+
+
+def _recenter(total, squares, age, delta):
+    """Move the origin of sums of y and y**2 to y - delta; age: samples each sum covers beyond the current one."""
+    return total + age * delta, squares - 2 * delta * total - age * (delta * delta)
+
+
+def _rebase(ring, cumulative, shift, last):
+    """The rebase of _RollingSums (and the recentering on the last value of RollingStd) on a whole ring."""
+    ring = [r - c for r, c in zip(ring, cumulative)]
+    if shift is not None:
+        age = np.arange(len(ring[0]) - 1, -1, -1).reshape((-1,) + (1,) * (ring[0].ndim - 1))
+        ring = list(_recenter(ring[0], ring[1], age, last - shift))
+        shift = last
+    return ring, [np.zeros_like(c) for c in cumulative], shift
+
+
+def _simulate(inputs, period, block, centered=False):
+    """Run _RollingSums over whole series (along axis 0) with numpy, one block between two rebases at a time.
+       inputs: one array per summed channel or, centered, the one series whose first two moments are summed.
+       Returns (sums, ring, cumulative, shift): the window sums after every sample (one array per channel) and
+       the state after the last sample, the ring holding the cumulative sums of the last `period` samples.
+    """
+    n = len(inputs[0])
+    tail = inputs[0].shape[1:]
+    width = 2 if centered else len(inputs)
+    shift = inputs[0][0] if centered and n else None
+    ring = [np.zeros((period,) + tail) for _ in range(width)]
+    cumulative = [np.zeros(tail) for _ in range(width)]
+    sums = [np.empty((n,) + tail) for _ in range(width)]
+    for start in range(0, n, block):
+        if start:
+            ring, cumulative, shift = _rebase(ring, cumulative, shift, inputs[0][start - 1])
+        if centered:
+            y = inputs[0][start:start + block] - shift
+            chunk = (y, y * y)
+        else:
+            chunk = [values[start:start + block] for values in inputs]
+        for j, values in enumerate(chunk):
+            cum = np.cumsum(values, axis=0)
+            # The sum `period` samples back comes from the ring for the first samples of the block.
+            history = np.concatenate([ring[j], cum])
+            sums[j][start:start + len(cum)] = cum - history[:len(cum)]
+            ring[j] = history[-period:]
+            cumulative[j] = cum[-1]
+    if n and n % block == 0:
+        ring, cumulative, shift = _rebase(ring, cumulative, shift, inputs[0][n - 1])
+    return sums, ring, cumulative, shift
+
+
+def _counts(n, period, ndim):
+    """Number of samples in the window after each of n updates, shaped to broadcast along axis 0."""
+    return np.minimum(np.arange(1, n + 1), period).reshape((n,) + (1,) * (ndim - 1))
+
+
+class _RollingSums:
+    """Sums of one (width 1) or two (width 2) series over the last `period` samples."""
+    __slots__ = ('period', 'samples', '_block', '_pos', '_c0', '_c1', '_ring')
+    width = 1
+
+    def __init__(self, period):
+        if period < 1:
+            raise ValueError(f"period must be at least 1, got {period}")
+        self.period = int(period)
+        self._block = max(self.period, RESYNC_EVERY)
+        self.reset()
+
+    def reset(self):
+        self.samples = 0
+        self._pos = 0
+        self._c0 = self._c1 = 0.0
+        self._ring = array('d', bytes(8 * self.width * self.period))
+
+    @property
+    def count(self):
+        """Number of samples in the window."""
+        return min(self.samples, self.period)
+
+    @property
+    def is_ready(self):
+        return self.samples >= self.period
+
+    def _push(self, x):
+        c = self._c0 + x
+        pos = self._pos
+        total = c - self._ring[pos]
+        self._ring[pos] = c
+        self._c0 = c
+        self._advance(pos)
+        return total
+
+    def _push2(self, x, y):
+        c0 = self._c0 + x
+        c1 = self._c1 + y
+        pos = self._pos
+        ring = self._ring
+        i = 2 * pos
+        total0 = c0 - ring[i]
+        total1 = c1 - ring[i + 1]
+        ring[i] = c0
+        ring[i + 1] = c1
+        self._c0 = c0
+        self._c1 = c1
+        self._advance(pos)
+        return total0, total1
+
+    def _advance(self, pos):
+        pos += 1
+        self._pos = 0 if pos == self.period else pos
+        self.samples += 1
+        if self.samples % self._block == 0:
+            # Rebase: the window sums are differences, so moving the origin of every cumulative sum keeps them.
+            self._ring_view()[:] -= (self._c0, self._c1)[:self.width]
+            self._c0 = self._c1 = 0.0
+
+    def _ring_view(self):
+        """The ring as a (period, width) array sharing its memory, indexed by slot (sample number % period)."""
+        return np.frombuffer(self._ring).reshape(-1, self.width)
+
+    def _simulate(self, inputs, centered=False):
+        return _simulate(inputs, self.period, self._block, centered)
+
+    def _load(self, samples, ring, cumulative):
+        """Set the state of the sums to the one _simulate returned after that many samples."""
+        self.reset()
+        self.samples = samples
+        self._pos = samples % self.period
+        slots = (samples - self.period + np.arange(self.period)) % self.period
+        self._ring_view()[slots] = np.column_stack(ring)
+        self._c0 = float(cumulative[0])
+        if self.width == 2:
+            self._c1 = float(cumulative[1])
+
+
+class SMA(_RollingSums):
+    """Mean of the last `period` values; before the window is full, the mean of the values so far."""
+    __slots__ = ('value',)
+
+    def reset(self):
+        super().reset()
+        self.value = math.nan
+
+    def update(self, x):
+        total = self._push(x)
+        self.value = total / (self.samples if self.samples < self.period else self.period)
+        return self.value
+
+    def compute(self, values):
+        """SMA after each value of values (along axis 0 for a 2-D array of series), as update() gives it."""
+        values = np.asarray(values, dtype=float)
+        sums = self._simulate([values])[0]
+        return sums[0] / _counts(len(values), self.period, values.ndim)
+
+    def warm_up(self, values):
+        """Reset and load a history (oldest first) in one vectorized pass; returns compute(values)."""
+        values = np.asarray(values, dtype=float)
+        sums, ring, cumulative, _ = self._simulate([values])
+        self._load(len(values), ring, cumulative)
+        result = sums[0] / _counts(len(values), self.period, 1)
+        self.value = float(result[-1]) if len(result) else math.nan
+        return result
+
+
+class EMA:
+    """Exponential moving average with smoothing alpha (default 2 / (period + 1)), seeded with the first value.
+       Ready after `period` values, like LEAN's.
+    """
+    __slots__ = ('period', 'alpha', 'samples', 'value', '_beta')
+
+    def __init__(self, period, alpha=None):
+        self.period = int(period)
+        self.alpha = 2.0 / (period + 1) if alpha is None else float(alpha)
+        self._beta = 1.0 - self.alpha
+        self.reset()
+
+    def reset(self):
+        self.samples = 0
+        self.value = math.nan
+
+    @property
+    def is_ready(self):
+        return self.samples >= self.period
+
+    def update(self, x):
+        self.value = x if self.samples == 0 else self.alpha * x + self._beta * self.value
+        self.samples += 1
+        return self.value
+
+    def compute(self, values):
+        """EMA after each value of values (along axis 0 for a 2-D array of series), as update() gives it.
+           The recursion has no exact vectorized form, so this is a plain Python loop over axis 0 running the
+           step of update() (on floats, or on rows of all series at once): bit-identical, but one Python step per
+           value, about the cost of calling update() (see benchmarks/bench_indicators.py).
+        """
+        values = np.asarray(values, dtype=float)
+        result = np.empty_like(values)
+        if not len(values):
+            return result
+        alpha, beta = self.alpha, self._beta
+        steps = values.tolist() if values.ndim == 1 else values
+        previous = steps[0]
+        out = [previous]
+        for x in steps[1:]:
+            previous = alpha * x + beta * previous
+            out.append(previous)
+        result[:] = out
+        return result
+
+    def warm_up(self, values):
+        """Reset and load a history (oldest first); returns compute(values)."""
+        result = self.compute(values)
+        self.samples = len(result)
+        self.value = float(result[-1]) if len(result) else math.nan
+        return result
+
+
+class VWAP(_RollingSums):
+    """Volume weighted average price over the last `period` updates or, with period=None, cumulative since the
+       last reset() (a session VWAP: reset at the first bar of each session). NaN while the volume is zero.
+       The caller picks the bar price, e.g. (high + low + close) / 3.
+    """
+    __slots__ = ('value',)
+    width = 2
+
+    def __init__(self, period=None):
+        if period is None:
+            self.period = None
+            self.reset()
+        else:
+            super().__init__(period)
+
+    def reset(self):
+        if self.period is None:
+            self.samples = 0
+            self._c0 = self._c1 = 0.0
+        else:
+            super().reset()
+        self.value = math.nan
+
+    @property
+    def is_ready(self):
+        return self.samples >= (1 if self.period is None else self.period)
+
+    def update(self, price, volume):
+        if self.period is None:
+            self._c0 += price * volume
+            self._c1 += volume
+            self.samples += 1
+            total_pv, total_volume = self._c0, self._c1
+        else:
+            total_pv, total_volume = self._push2(price * volume, volume)
+        self.value = total_pv / total_volume if total_volume else math.nan
+        return self.value
+
+    def compute(self, prices, volumes, sessions=None):
+        """VWAP after each bar as update() gives it. For a session VWAP, sessions holds a session key per bar
+           (e.g. the day) and the sums restart where it changes, as if reset() was called there.
+        """
+        prices = np.asarray(prices, dtype=float)
+        volumes = np.asarray(volumes, dtype=float)
+        pv = prices * volumes
+        if self.period is None:
+            total_pv, total_volume = np.empty_like(pv), np.empty_like(volumes)
+            bounds = [0, len(pv)]
+            if sessions is not None:
+                sessions = np.asarray(sessions)
+                bounds[1:1] = (np.flatnonzero(sessions[1:] != sessions[:-1]) + 1).tolist()
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                total_pv[lo:hi] = np.cumsum(pv[lo:hi], axis=0)
+                total_volume[lo:hi] = np.cumsum(volumes[lo:hi], axis=0)
+        else:
+            total_pv, total_volume = self._simulate([pv, volumes])[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total_volume != 0, total_pv / total_volume, np.nan)
+
+    def warm_up(self, prices, volumes):
+        """Reset and load a history (oldest first, one session for a session VWAP); returns compute()."""
+        prices = np.asarray(prices, dtype=float)
+        volumes = np.asarray(volumes, dtype=float)
+        result = self.compute(prices, volumes)
+        if self.period is None:
+            self.reset()
+            self.samples = len(prices)
+            if len(prices):
+                self._c0 = float(np.cumsum(prices * volumes)[-1])
+                self._c1 = float(np.cumsum(volumes)[-1])
+        else:
+            _, ring, cumulative, _ = self._simulate([prices * volumes, volumes])
+            self._load(len(prices), ring, cumulative)
+        self.value = float(result[-1]) if len(result) else math.nan
+        return result
+
+
+class RollingStd(_RollingSums):
+    """Standard deviation (ddof=1 like pandas, ddof=0 like LEAN's) of the last `period` values, NaN until
+       more than ddof values were seen. The sums are of the values minus a shift, the first value and then
+       the last one at every rebase, so that on series far from zero (prices) the sums of squares do not lose
+       the variance to cancellation.
+    """
+    __slots__ = ('ddof', 'value', '_shift')
+    width = 2
+
+    def __init__(self, period, ddof=1):
+        self.ddof = ddof
+        super().__init__(period)
+
+    def reset(self):
+        super().reset()
+        self.value = math.nan
+        self._shift = None
+
+    def update(self, x):
+        if self._shift is None:
+            self._shift = x
+        y = x - self._shift
+        total, squares = self._push2(y, y * y)
+        n = self.samples if self.samples < self.period else self.period
+        self.value = math.sqrt(max(squares - total * (total / n), 0.0) / (n - self.ddof)) if n > self.ddof \
+            else math.nan
+        if self.samples % self._block == 0:
+            ring = self._ring_view()
+            age = (self.samples - 1 - np.arange(self.period)) % self.period
+            ring[:, 0], ring[:, 1] = _recenter(ring[:, 0], ring[:, 1], age, x - self._shift)
+            self._shift = x
+        return self.value
+
+    def _std(self, sums, n):
+        total, squares = sums
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(np.maximum(squares - total * (total / n), 0.0) / (n - self.ddof))
+        return np.where(n > self.ddof, std, np.nan)
+
+    def compute(self, values):
+        """Rolling std after each value of values (along axis 0 for a 2-D array of series), as update() gives it."""
+        values = np.asarray(values, dtype=float)
+        return self._std(self._simulate([values], centered=True)[0], _counts(len(values), self.period, values.ndim))
+
+    def warm_up(self, values):
+        """Reset and load a history (oldest first) in one vectorized pass; returns compute(values)."""
+        values = np.asarray(values, dtype=float)
+        sums, ring, cumulative, shift = self._simulate([values], centered=True)
+        self._load(len(values), ring, cumulative)
+        result = self._std(sums, _counts(len(values), self.period, 1))
+        if len(values):
+            self._shift = float(shift)
+            self.value = float(result[-1])
+        return result
@@ -8,88 +8,41 @@ from   datetime import datetime
 import numpy as np
 import pytz
 import math
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from   matplotlib.ticker import FuncFormatter
-import statsmodels.api as sm
 from polygon_helpers import *
+from bar_store import BarStore
+from corporate_actions import CorporateActions
+from momentum_helpers import build_intraday_features, build_day_matrix, backtest_intraday_momentum
+from report_helpers import report
+from bootstrap_helpers import bootstrap_stats
+from profiling_helpers import RECORDER, STAGE_REPORT, span
+
+# Stage timings (wall, CPU, rows, peak RSS) are recorded with STAGE_TIMING=1 and profiled with STAGE_PROFILE
+# (see profiling_helpers.py); the run report is written to STAGE_REPORT at the end.
 
 # step 1: initiate the backtest
 ticker = 'SPY'
 from_date = '2022-05-09'
 until_date = '2024-04-22'
 
-spy_intra_data = fetch_polygon_data(ticker, from_date, until_date, 'minute')
+# Minute bars are kept in a compact BarStore (exact cent prices, int32 volume) instead of a float64 DataFrame.
+spy_intra_data = BarStore.from_frame(fetch_polygon_data(ticker, from_date, until_date, 'minute'), tick_size=0.01)
 spy_daily_data = fetch_polygon_data(ticker, from_date, until_date, 'day')
 dividends      = fetch_polygon_dividends(ticker)
+splits         = fetch_polygon_splits(ticker)
 
 # step 2: building technical indicators
 
-# Load the intraday data into a DataFrame and set the datetime column as the index.
-df = pd.DataFrame(spy_intra_data)
-df['day'] = pd.to_datetime(df['caldt']).dt.date  # Extract the date part from the datetime for daily analysis.
-df.set_index('caldt', inplace=True)  # Setting the datetime as the index for easier time series manipulation.
-
-# Group the DataFrame by the 'day' column to facilitate operations that need daily aggregation.
-daily_groups = df.groupby('day')
+# Load the intraday data into a DataFrame and compute VWAP, move from open, SPY's daily volatility
+# and the per-minute sigma_open in a single vectorized pass (see momentum_helpers.py).
+with span('features', rows=len(spy_intra_data)):
+    df = build_intraday_features(spy_intra_data)
 
 # Extract unique days from the dataset to iterate through each day for processing.
 all_days = df['day'].unique()
 
-# Initialize new columns to store calculated metrics, starting with NaN for absence of initial values.
-df['move_open'] = np.nan  # To record the absolute daily change from the open price
-df['vwap'] = np.nan       # To calculate the Volume Weighted Average Price.
-df['spy_dvol'] = np.nan   # To record SPY's daily volatility.
-
-# Create a series to hold computed daily returns for SPY, initialized with NaN.
-spy_ret = pd.Series(index=all_days, dtype=float)
-
-# Iterate through each day to calculate metrics.
-for d in range(1, len(all_days)):
-    current_day = all_days[d]
-    prev_day = all_days[d - 1]
-
-    # Access the data for the current and previous days using their groups.
-    current_day_data = daily_groups.get_group(current_day)
-    prev_day_data = daily_groups.get_group(prev_day)
-
-    # Calculate the average of high, low, and close prices.
-    hlc = (current_day_data['high'] + current_day_data['low'] + current_day_data['close']) / 3
-
-    # Compute volume-weighted metrics for VWAP calculation.
-    vol_x_hlc = current_day_data['volume'] * hlc
-    cum_vol_x_hlc = vol_x_hlc.cumsum()  # Cumulative sum for VWAP calculation.
-    cum_volume = current_day_data['volume'].cumsum()
-
-    # Assign the calculated VWAP to the corresponding index in the DataFrame.
-    df.loc[current_day_data.index, 'vwap'] = cum_vol_x_hlc / cum_volume
-
-    # Calculate the absolute percentage change from the day's opening price.
-    open_price = current_day_data['open'].iloc[0]
-    df.loc[current_day_data.index, 'move_open'] = (current_day_data['close'] / open_price - 1).abs()
-
-    # Compute the daily return for SPY using the closing prices from the current and previous day.
-    spy_ret.loc[current_day] = current_day_data['close'].iloc[-1] / prev_day_data['close'].iloc[-1] - 1
-
-    # Calculate the 15-day rolling volatility, starting calculation after accumulating 15 days of data.
-    if d > 14:
-        df.loc[current_day_data.index, 'spy_dvol'] = spy_ret.iloc[d - 15:d - 1].std(skipna=False)
-
-# Calculate the minutes from market open and determine the minute of the day for each timestamp.
-df['min_from_open'] = ((df.index - df.index.normalize()) / pd.Timedelta(minutes=1)) - (9 * 60 + 30) + 1
-df['minute_of_day'] = df['min_from_open'].round().astype(int)
-
-# Group data by 'minute_of_day' for minute-level calculations.
-minute_groups = df.groupby('minute_of_day')
-
-# Calculate rolling mean and delayed sigma for each minute of the trading day.
-df['move_open_rolling_mean'] = minute_groups['move_open'].transform(lambda x: x.rolling(window=14, min_periods=13).mean())
-df['sigma_open'] = minute_groups['move_open_rolling_mean'].transform(lambda x: x.shift(1))
-
-# Convert dividend dates to datetime and merge dividend data based on trading days.
-dividends['day'] = pd.to_datetime(dividends['caldt']).dt.date
-df = df.merge(dividends[['day', 'dividend']], on='day', how='left')
-df['dividend'] = df['dividend'].fillna(0)  # Fill missing dividend data with 0.
+# Dividends and splits are kept per trading day instead of being merged onto every minute bar.
+with span('corporate_actions', rows=len(all_days)):
+    actions = CorporateActions.from_polygon(all_days, dividends, splits)
 
 # step 3
 # Constants and settings
@@ -103,15 +56,6 @@ sizing_type = "vol_target"
 target_vol = 0.02
 max_leverage = 4
 
-# Group data by day for faster access
-daily_groups = df.groupby('day')
-
-# Initialize strategy DataFrame using unique days
-strat = pd.DataFrame(index=all_days)
-strat['ret'] = np.nan
-strat['AUM'] = AUM_0
-strat['ret_spy'] = np.nan
-
 # Calculate daily returns for SPY using the closing prices
 df_daily = pd.DataFrame(spy_daily_data)
 df_daily['caldt'] = pd.to_datetime(df_daily['caldt']).dt.date
@@ -120,119 +64,26 @@ df_daily.set_index('caldt',
 
 df_daily['ret'] = df_daily['close'].diff() / df_daily['close'].shift()
 
-# Loop through all days, starting from the second day
-for d in range(1, len(all_days)):
-    current_day = all_days[d]
-    prev_day = all_days[d - 1]
-
-    if prev_day in daily_groups.groups and current_day in daily_groups.groups:
-        prev_day_data = daily_groups.get_group(prev_day)
-        current_day_data = daily_groups.get_group(current_day)
-
-        if 'sigma_open' in current_day_data.columns and current_day_data['sigma_open'].isna().all():
-            continue
-
-        prev_close_adjusted = prev_day_data['close'].iloc[-1] - df.loc[current_day_data.index, 'dividend'].iloc[-1]
-
-        open_price = current_day_data['open'].iloc[0]
-        current_close_prices = current_day_data['close']
-        spx_vol = current_day_data['spy_dvol'].iloc[0]
-        vwap = current_day_data['vwap']
-
-        sigma_open = current_day_data['sigma_open']
-        UB = max(open_price, prev_close_adjusted) * (1 + band_mult * sigma_open)
-        LB = min(open_price, prev_close_adjusted) * (1 - band_mult * sigma_open)
-
-        # Determine trading signals
-        signals = np.zeros_like(current_close_prices)
-        signals[(current_close_prices > UB) & (current_close_prices > vwap)] = 1
-        signals[(current_close_prices < LB) & (current_close_prices < vwap)] = -1
-
-        # Position sizing
-        previous_aum = strat.loc[prev_day, 'AUM']
-
-        if sizing_type == "vol_target":
-            if math.isnan(spx_vol):
-                shares = round(previous_aum / open_price * max_leverage)
-            else:
-                shares = round(previous_aum / open_price * min(target_vol / spx_vol, max_leverage))
-
-        elif sizing_type == "full_notional":
-            shares = round(previous_aum / open_price)
-
-        # Apply trading signals at trade frequencies
-        trade_indices = np.where(current_day_data["min_from_open"] % trade_freq == 0)[0]
-        exposure = np.full(len(current_day_data), np.nan)  # Start with NaNs
-        exposure[trade_indices] = signals[trade_indices]  # Apply signals at trade times
-
-        # Custom forward-fill that stops at zeros
-        last_valid = np.nan  # Initialize last valid value as NaN
-        filled_values = []  # List to hold the forward-filled values
-        for value in exposure:
-            if not np.isnan(value):  # If current value is not NaN, update last valid value
-                last_valid = value
-            if last_valid == 0:  # Reset if last valid value is zero
-                last_valid = np.nan
-            filled_values.append(last_valid)
-
-        exposure = pd.Series(filled_values, index=current_day_data.index).shift(1).fillna(
-            0).values  # Apply shift and fill NaNs
-
-        # Calculate trades count based on changes in exposure
-        trades_count = np.sum(np.abs(np.diff(np.append(exposure, 0))))
-
-        # Calculate PnL
-        change_1m = current_close_prices.diff()
-        gross_pnl = np.sum(exposure * change_1m) * shares
-        commission_paid = trades_count * max(min_comm_per_order, commission * shares)
-        net_pnl = gross_pnl - commission_paid
-
-        # Update the daily return and new AUM
-        strat.loc[current_day, 'AUM'] = previous_aum + net_pnl
-        strat.loc[current_day, 'ret'] = net_pnl / previous_aum
-
-        # Save the passive Buy&Hold daily return for SPY
-        strat.loc[current_day, 'ret_spy'] = df_daily.loc[df_daily.index == current_day, 'ret'].values[0]
-
-        # step 4
-        # Calculate cumulative products for AUM calculations
-        strat['AUM_SPX'] = AUM_0 * (1 + strat['ret_spy']).cumprod(skipna=True)
-
-        # Create a figure and a set of subplots
-        fig, ax = plt.subplots()
-
-        # Plotting the AUM of the strategy and the passive S&P 500 exposure
-        ax.plot(strat.index, strat['AUM'], label='Momentum', linewidth=2, color='k')
-        ax.plot(strat.index, strat['AUM_SPX'], label='S&P 500', linewidth=1, color='r')
-
-        # Formatting the plot
-        ax.grid(True, linestyle=':')
-        ax.xaxis.set_major_locator(mdates.MonthLocator())
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %y'))
-        plt.xticks(rotation=90)
-        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, _: f'${x:,.0f}'))
-        ax.set_ylabel('AUM ($)')
-        plt.legend(loc='upper left')
-        plt.title('Intraday Momentum Strategy', fontsize=12, fontweight='bold')
-        plt.suptitle(f'Commission = ${commission}/share', fontsize=9, verticalalignment='top')
-
-        # Show the plot
-        plt.show()
-
-        # Calculate additional stats and display them
-        stats = {
-            'Total Return (%)': round((np.prod(1 + strat['ret'].dropna()) - 1) * 100, 0),
-            'Annualized Return (%)': round((np.prod(1 + strat['ret']) ** (252 / len(strat['ret'])) - 1) * 100, 1),
-            'Annualized Volatility (%)': round(strat['ret'].dropna().std() * np.sqrt(252) * 100, 1),
-            'Sharpe Ratio': round(strat['ret'].dropna().mean() / strat['ret'].dropna().std() * np.sqrt(252), 2),
-            'Hit Ratio (%)': round((strat['ret'] > 0).sum() / (strat['ret'].abs() > 0).sum() * 100, 0),
-            'Maximum Drawdown (%)': round(strat['AUM'].div(strat['AUM'].cummax()).sub(1).min() * -100, 0)
-        }
-
-        Y = strat['ret'].dropna()
-        X = sm.add_constant(strat['ret_spy'].dropna())
-        model = sm.OLS(Y, X).fit()
-        stats['Alpha (%)'] = round(model.params.const * 100 * 252, 2)
-        stats['Beta'] = round(model.params['ret_spy'], 2)
-
-        print(stats)
\ No newline at end of file
+# Reshape the minute data into (days x minutes) matrices once and run the array-based backtest kernel.
+with span('simulation', rows=len(df)):
+    matrix = build_day_matrix(df, actions=actions)
+    strat = backtest_intraday_momentum(matrix, df_daily['ret'], AUM_0=AUM_0, commission=commission,
+                                       min_comm_per_order=min_comm_per_order, band_mult=band_mult,
+                                       trade_freq=trade_freq, sizing_type=sizing_type, target_vol=target_vol,
+                                       max_leverage=max_leverage)
+
+# step 4
+# Reporting runs once after the simulation: set show=False (and optionally plot_path) for headless runs.
+with span('reporting', rows=len(strat)):
+    stats = report(strat, AUM_0=AUM_0, commission=commission, show=True)
+
+print(stats)
+
+# 95% confidence intervals of the stats from 10,000 stationary block-bootstrap resamples of the daily returns.
+with span('bootstrap', rows=len(strat)):
+    intervals, _ = bootstrap_stats(strat['ret'], n_resamples=10000, benchmark_ret=strat['ret_spy'], seed=0)
+print(intervals)
+
+if RECORDER.enabled:
+    print(RECORDER.report())
+    RECORDER.write_report(STAGE_REPORT)
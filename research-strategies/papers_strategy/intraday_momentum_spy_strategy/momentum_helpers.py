@@ -0,0 +1,263 @@
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore
+from corporate_actions import adjust_prev_close
+from indicator_helpers import VWAP, RollingStd
+
+
+def build_intraday_features(df):
+    """Compute the step-2 intraday features of the momentum strategy in one vectorized pass.
+       df: minute bars as returned by fetch_polygon_data (volume, open, high, low, close, caldt), or a BarStore.
+       Returns a copy indexed by 'caldt' with the 'day', 'vwap', 'move_open', 'spy_dvol',
+       'min_from_open', 'minute_of_day', 'move_open_rolling_mean' and 'sigma_open' columns.
+    """
+    df = df.to_frame() if isinstance(df, BarStore) else df.copy()
+    df['day'] = pd.to_datetime(df['caldt']).dt.date  # Extract the date part from the datetime for daily analysis.
+    df.set_index('caldt', inplace=True)  # Setting the datetime as the index for easier time series manipulation.
+
+    # Integer code of the trading day for every minute bar (0 for the first day in the data).
+    day_codes, all_days = pd.factorize(df['day'], sort=False)
+    daily_groups = df.groupby(day_codes, sort=False)
+
+    # Cumulative volume-weighted average of high, low and close prices within each day.
+    hlc = (df['high'] + df['low'] + df['close']) / 3
+    vwap = VWAP().compute(hlc.to_numpy(), df['volume'].to_numpy(), sessions=day_codes)
+
+    # Absolute percentage change from the day's opening price.
+    move_open = (df['close'] / daily_groups['open'].transform('first') - 1).abs()
+
+    # Daily close-to-close returns and the 15-day volatility, lagged so that day d only
+    # sees the returns of days d-15 to d-2 (same window as the original per-day loop).
+    # Element i of vol_14 is the std of the returns of days i-12 to i+1, so day d takes element d-3.
+    day_close = daily_groups['close'].last().to_numpy()
+    vol_14 = RollingStd(14).compute(day_close[1:] / day_close[:-1] - 1)
+    spy_dvol = np.full(len(day_close), np.nan)
+    spy_dvol[16:] = vol_14[13:-2]
+
+    # The first day has no previous close, so its features stay NaN.
+    first_day = day_codes == 0
+    df['move_open'] = np.where(first_day, np.nan, move_open.to_numpy())
+    df['vwap'] = np.where(first_day, np.nan, vwap)
+    df['spy_dvol'] = spy_dvol[day_codes]
+
+    # Calculate the minutes from market open and determine the minute of the day for each timestamp.
+    df['min_from_open'] = ((df.index - df.index.normalize()) / pd.Timedelta(minutes=1)) - (9 * 60 + 30) + 1
+    df['minute_of_day'] = df['min_from_open'].round().astype(int)
+
+    # Calculate rolling mean and delayed sigma for each minute of the trading day.
+    move_open_by_minute, occurrence = key_matrix(df['move_open'].to_numpy(), df['minute_of_day'].to_numpy())
+    rolling_mean = rolling_matrix(move_open_by_minute, window=14, min_periods=13)
+    df['move_open_rolling_mean'] = rolling_mean[occurrence]
+    df['sigma_open'] = shift_matrix(rolling_mean, 1)[occurrence]
+
+    return df
+
+
+def key_matrix(values, keys):
+    """Lay out a 1-D series as an (occurrences x keys) matrix, one column per distinct key.
+       Row i of a column holds the i-th value observed for that key, so rolling along axis 0 is the
+       same as a pandas groupby(keys).rolling over rows. Unused slots are NaN.
+       Returns (matrix, occurrence) where matrix[occurrence] gives the values back in their original order.
+    """
+    key_codes, unique_keys = pd.factorize(keys)
+
+    # Occurrence number of every value within its key (a vectorized groupby cumcount).
+    # Stable sorts of small integer types use a linear-time radix sort.
+    sort_codes = key_codes.astype(np.int16) if len(unique_keys) < 2**15 else key_codes
+    order = np.argsort(sort_codes, kind='stable')
+    counts = np.bincount(key_codes, minlength=len(unique_keys))
+    rows = np.empty(len(key_codes), dtype=np.int64)
+    rows[order] = np.arange(len(key_codes)) - np.repeat(np.cumsum(counts) - counts, counts)
+    matrix = np.full((rows.max() + 1 if len(rows) else 0, len(unique_keys)), np.nan)
+    matrix[rows, key_codes] = values
+    return matrix, (rows, key_codes)
+
+
+def shift_matrix(matrix, periods=1):
+    """Shift every column of a matrix down by `periods` rows, filling with NaN."""
+    shifted = np.full(matrix.shape, np.nan)
+    shifted[periods:] = matrix[:len(matrix) - periods]
+    return shifted
+
+
+def rolling_matrix(matrix, window, min_periods=None, stat='mean'):
+    """Rolling mean or std (ddof=1) down the rows of a matrix, independently per column.
+       NaN values are skipped and a result needs at least min_periods (default: window) non-NaN values
+       in the window, as in pandas rolling. Uses cumulative sums, so the cost does not depend on window.
+    """
+    if min_periods is None:
+        min_periods = window
+    present = ~np.isnan(matrix)
+
+    def window_sum(values):
+        cumulative = np.cumsum(values, axis=0)
+        cumulative[window:] -= cumulative[:-window].copy()
+        return cumulative
+
+    count = window_sum(present.astype(np.int32))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if stat == 'mean':
+            result = window_sum(np.where(present, matrix, 0.0)) / count
+        elif stat == 'std':
+            # Center each column on its mean so the running sums of squares do not lose precision.
+            center = np.zeros(matrix.shape[1])
+            has_values = present.any(axis=0)
+            center[has_values] = np.nanmean(matrix[:, has_values], axis=0)
+            centered = np.where(present, matrix - center, 0.0)
+            total = window_sum(centered)
+            squares = window_sum(centered ** 2)
+            result = np.sqrt(np.maximum(squares - total * (total / count), 0) / (count - 1))
+        else:
+            raise ValueError(f"Unknown rolling stat: {stat}")
+    result[count < max(min_periods, 1 if stat == 'mean' else 2)] = np.nan
+    return result
+
+
+# Number of regular-session minute bars in a full trading day (09:30 to 15:59).
+MINUTES_PER_DAY = 390
+
+# Minute-bar columns needed by the backtest kernel.
+MATRIX_COLUMNS = ('open', 'close', 'vwap', 'sigma_open', 'min_from_open', 'spy_dvol')
+
+
+def build_day_matrix(df, columns=MATRIX_COLUMNS, actions=None):
+    """Reshape minute rows into left-aligned (days x minutes) NumPy matrices.
+       df: minute DataFrame sorted by time with a 'day' column (e.g. the output of step 2).
+       actions: CorporateActions of the ticker, giving the per-day 'dividend' and 'split_ratio' arrays; without
+                it they come from per-bar 'dividend' and 'split_ratio' columns of df if there are, else no actions.
+       Returns a dict with one float64 matrix per column, the boolean 'valid' mask of real bars,
+       the per-day bar 'count', 'dividend' and 'split_ratio', and the ordered 'all_days'. Slots past the last
+       bar of a day are NaN.
+    """
+    day_codes, all_days = pd.factorize(df['day'], sort=False)
+    counts = np.bincount(day_codes, minlength=len(all_days))
+    starts = np.cumsum(counts) - counts
+    positions = np.arange(len(df)) - starts[day_codes]  # Row position of each bar within its day.
+    width = max(MINUTES_PER_DAY, counts.max())
+
+    matrix = {'all_days': np.asarray(all_days), 'count': counts}
+    matrix['valid'] = np.zeros((len(all_days), width), dtype=bool)
+    matrix['valid'][day_codes, positions] = True
+    for column in columns:
+        values = np.full((len(all_days), width), np.nan)
+        values[day_codes, positions] = df[column].to_numpy(dtype=float)
+        matrix[column] = values
+
+    if actions is not None:
+        matrix['dividend'], matrix['split_ratio'] = actions.on(matrix['all_days'])
+    else:
+        matrix['dividend'] = np.zeros(len(all_days))
+        matrix['split_ratio'] = np.ones(len(all_days))
+        for name in ('dividend', 'split_ratio'):
+            if name in df.columns:  # Actions merged onto the bars: the value of each day's last bar.
+                matrix[name] = df[name].to_numpy(dtype=float)[starts + counts - 1]
+    return matrix
+
+
+def day_pnl_components(matrix, band_mult=1, trade_freq=30):
+    """Compute the parts of the daily PnL that do not depend on AUM, for all days at once.
+       Works on (days x minutes) matrices and on panels with extra leading axes, e.g. (tickers x days x minutes);
+       'dividend' and the optional 'split_ratio' are per day (one axis less), or 'dividend' per bar.
+       Returns (gross_pnl_per_share, trades_count, active): the PnL of holding one share along the
+       intraday exposure, the number of exposure changes, and whether the day is traded at all
+       (days whose sigma_open is entirely NaN, and the first day, are skipped).
+    """
+    valid = matrix['valid']
+    close = matrix['close']
+    last_bar = (matrix['count'] - 1)[..., None]  # -1 (the NaN padding) for days without bars.
+    last_close = np.take_along_axis(close, last_bar, axis=-1)[..., 0]
+    dividend = matrix['dividend']
+    if dividend.ndim == close.ndim:  # Per-bar dividend matrix: the value of each day's last bar.
+        dividend = np.take_along_axis(dividend, last_bar, axis=-1)[..., 0]
+
+    # Previous close adjusted for the dividend going ex (and any split) on the current day.
+    prev_close_adjusted = adjust_prev_close(last_close, dividend, matrix.get('split_ratio'))
+
+    # Noise area boundaries around the open / previous close.
+    open_price = matrix['open'][..., 0]
+    sigma_open = matrix['sigma_open']
+    UB = np.maximum(open_price, prev_close_adjusted)[..., None] * (1 + band_mult * sigma_open)
+    LB = np.minimum(open_price, prev_close_adjusted)[..., None] * (1 - band_mult * sigma_open)
+
+    # Determine trading signals; NaN bands never trigger.
+    vwap = matrix['vwap']
+    signals = np.zeros_like(close)
+    signals[(close > UB) & (close > vwap)] = 1
+    signals[(close < LB) & (close < vwap)] = -1
+
+    # Apply trading signals at trade frequencies only.
+    trade_mask = valid & (matrix['min_from_open'] % trade_freq == 0)
+    exposure = np.where(trade_mask, signals, np.nan)
+
+    # Forward-fill that stops at zeros: carry the last signal, but a zero signal means flat.
+    last_index = np.maximum.accumulate(np.where(trade_mask, np.arange(close.shape[-1]), 0), axis=-1)
+    filled = np.take_along_axis(exposure, last_index, axis=-1)
+    filled[filled == 0] = np.nan
+
+    # Positions are taken one bar after the signal; padding slots are flat.
+    exposure = np.zeros_like(close)
+    exposure[..., 1:] = filled[..., :-1]
+    exposure[np.isnan(exposure) | ~valid] = 0
+
+    # Trades count based on changes in exposure, closing any open position at the end of the day.
+    trades_count = np.abs(np.diff(exposure, axis=-1, append=0)).sum(axis=-1)
+
+    change_1m = np.diff(close, axis=-1, prepend=np.nan)
+    gross_pnl_per_share = np.nansum(exposure * change_1m, axis=-1)
+
+    active = ~np.isnan(sigma_open).all(axis=-1)
+    active[..., 0] = False
+    return gross_pnl_per_share, trades_count, active
+
+
+def simulate_aum(gross_pnl_per_share, trades_count, active, open_price, spx_vol, AUM_0=100000.0,
+                 commission=0.0035, min_comm_per_order=0.35, sizing_type='vol_target', target_vol=0.02,
+                 max_leverage=4):
+    """Run the sequential AUM recursion over precomputed daily PnL components.
+       Returns (AUM, ret) arrays; skipped days keep AUM_0 and a NaN return like the original loop.
+    """
+    if sizing_type == 'vol_target':
+        leverage = np.where(np.isnan(spx_vol), max_leverage, np.minimum(target_vol / spx_vol, max_leverage))
+    elif sizing_type == 'full_notional':
+        leverage = np.ones(len(open_price))
+    else:
+        raise ValueError(f"Unknown sizing_type: {sizing_type}")
+
+    n_days = len(open_price)
+    aum = [AUM_0] * n_days
+    ret = [np.nan] * n_days
+
+    # Plain Python floats keep the recursion tight and bit-identical to the scalar version.
+    gross = gross_pnl_per_share.tolist()
+    trades = trades_count.tolist()
+    opens = open_price.tolist()
+    lev = leverage.tolist()
+    for d in np.flatnonzero(active).tolist():
+        previous_aum = aum[d - 1]
+        shares = round(previous_aum / opens[d] * lev[d])
+        net_pnl = gross[d] * shares - trades[d] * max(min_comm_per_order, commission * shares)
+        aum[d] = previous_aum + net_pnl
+        ret[d] = net_pnl / previous_aum
+
+    return np.array(aum), np.array(ret)
+
+
+def backtest_intraday_momentum(matrix, ret_spy, AUM_0=100000.0, commission=0.0035, min_comm_per_order=0.35,
+                               band_mult=1, trade_freq=30, sizing_type='vol_target', target_vol=0.02,
+                               max_leverage=4):
+    """Backtest the intraday momentum strategy on a day matrix from build_day_matrix.
+       ret_spy: daily buy & hold returns of the underlying indexed by day.
+       Returns the strat DataFrame (ret, AUM, ret_spy) indexed by day.
+    """
+    gross_pnl_per_share, trades_count, active = day_pnl_components(matrix, band_mult, trade_freq)
+    aum, ret = simulate_aum(gross_pnl_per_share, trades_count, active, matrix['open'][:, 0],
+                            matrix['spy_dvol'][:, 0], AUM_0, commission, min_comm_per_order,
+                            sizing_type, target_vol, max_leverage)
+
+    strat = pd.DataFrame(index=matrix['all_days'])
+    strat['ret'] = ret
+    strat['AUM'] = aum
+    strat['ret_spy'] = np.where(active, ret_spy.reindex(matrix['all_days']).to_numpy(dtype=float), np.nan)
+    return strat
+
@@ -1,16 +1,16 @@
 import os
 from dotenv import load_dotenv
 import requests
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from   datetime import datetime
 import numpy as np
 import pytz
 import math
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from   matplotlib.ticker import FuncFormatter
-import statsmodels.api as sm
+
+from profiling_helpers import stage
 
 # Define the API key and base URL
 load_dotenv()
@@ -21,94 +21,308 @@ BASE_URL = 'https://api.polygon.io'
 # Define the rate limit enforcement based on the API tier, Free or Paid.
 ENFORCE_RATE_LIMIT = True
 
-def fetch_polygon_data(ticker, start_date, end_date, period, enforce_rate_limit=ENFORCE_RATE_LIMIT):
-    """Fetch stock data from Polygon.io based on the given period (minute or day).
-       enforce_rate_limit: Set to True to enforce rate limits (suitable for free tiers), False for paid tiers with minimal or no rate limits.
+# Token bucket shared by all requests: the free tier allows 5 requests per minute.
+# Paid tiers can raise it with set_rate_limit, e.g. set_rate_limit(100, 1), or pass enforce_rate_limit=False.
+RATE_LIMIT_REQUESTS = 5
+RATE_LIMIT_PERIOD = 60
+
+# Most requests in flight at once (and pooled keep-alive connections), over sub-ranges and tickers together.
+MAX_WORKERS = 8
+
+# When the rate limit allows MAX_WORKERS requests in a burst, minute-bar ranges are split into sub-ranges of this
+# many calendar days, fetched concurrently. Otherwise a range is paginated as one request chain, which needs fewer
+# requests (50,000 bars per page against one sub-range per 30 days).
+MINUTE_CHUNK_DAYS = 30
+
+# Local Parquet cache of aggregate bars, one file per ticker, timespan, adjusted flag and month.
+CACHE_DIR = os.getenv("POLYGON_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'polygon_cache'))
+USE_CACHE = True
+
+# Dividends and splits are cached as one Parquet file per ticker and kind, downloaded again once older than this
+# since new actions keep being announced.
+REFERENCE_CACHE_MAX_AGE = pd.Timedelta(days=1)
+
+# Columns of the aggregate bar DataFrames.
+BAR_COLUMNS = ['volume', 'open', 'high', 'low', 'close', 'caldt']
+
+# Regular trading session kept for minute bars (bar start times, inclusive).
+SESSION_START = pd.Timedelta(hours=9, minutes=30)
+SESSION_END = pd.Timedelta(hours=15, minutes=59)
+
+# Cache hit/miss counters, counted in monthly partitions.
+CACHE_STATS = {'hits': 0, 'misses': 0}
+_cache_stats_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing bursts of `capacity` requests, refilled at capacity / period per second."""
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def configure(self, capacity, period):
+        """Change the budget to capacity requests per period seconds, keeping no more than capacity tokens."""
+        with self.lock:
+            self.capacity = capacity
+            self.rate = capacity / period
+            self.tokens = min(self.tokens, capacity)
+
+    def acquire(self):
+        """Block until a token is available and consume it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            print(f"API rate limit reached. Waiting {wait_time:.2f} seconds before next request.")
+            time.sleep(wait_time)
+
+
+RATE_LIMITER = TokenBucket(RATE_LIMIT_REQUESTS, RATE_LIMIT_PERIOD)
+
+
+def set_rate_limit(requests_per_period, period=RATE_LIMIT_PERIOD):
+    """Set the request budget of the API tier for all later requests, e.g. set_rate_limit(100, 1)."""
+    RATE_LIMITER.configure(requests_per_period, period)
+
+
+def _concurrency_allowed(enforce_rate_limit):
+    """Whether the rate limit lets MAX_WORKERS requests go out at once; under a smaller budget (the free tier)
+       concurrent requests would only queue on the token bucket.
     """
-    multiplier = '1'
-    timespan = period
-    limit = '50000'  # Maximum entries per request
-    eastern = pytz.timezone('America/New_York')  # Eastern Time Zone
-    
-    url = f'{BASE_URL}/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start_date}/{end_date}?adjusted=false&sort=asc&limit={limit}&apiKey={API_KEY}'
-    
-    data_list = []
-    request_count = 0
-    first_request_time = None
-    
+    return not enforce_rate_limit or RATE_LIMITER.capacity >= MAX_WORKERS
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _get_session():
+    """Shared requests session whose connection pool keeps connections to Polygon alive across requests."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def _fetch_pages(url, enforce_rate_limit=ENFORCE_RATE_LIMIT):
+    """Follow Polygon's next_url pagination from url.
+       Returns (pages, complete): the list of 'results' lists, and False if an API error stopped the walk.
+    """
+    pages = []
     while True:
-        if enforce_rate_limit and request_count == 5:
-            elapsed_time = time.time() - first_request_time
-            if elapsed_time < 60:
-                wait_time = 60 - elapsed_time
-                print(f"API rate limit reached. Waiting {wait_time:.2f} seconds before next request.")
-                time.sleep(wait_time)
-            request_count = 0
-            first_request_time = time.time()  # Reset the timer after the wait
-
-        if first_request_time is None and enforce_rate_limit:
-            first_request_time = time.time()
-
-        response = requests.get(url)
+        if enforce_rate_limit:
+            RATE_LIMITER.acquire()
+
+        response = _get_session().get(url)
         if response.status_code != 200:
             error_message = response.json().get('error', 'No specific error message provided')
             print(f"Error fetching data: {error_message}")
-            break
+            return pages, False
 
         data = response.json()
-        request_count += 1
-        
-        results_count = len(data.get('results', []))
-        print(f"Fetched {results_count} entries from API.")
-        
-        if 'results' in data:
-            for entry in data['results']:
-                utc_time = datetime.fromtimestamp(entry['t'] / 1000, pytz.utc)
-                eastern_time = utc_time.astimezone(eastern)
-                
-                data_entry = {
-                    'volume': entry['v'],
-                    'open': entry['o'],
-                    'high': entry['h'],
-                    'low': entry['l'],
-                    'close': entry['c'],
-                    'caldt': eastern_time.replace(tzinfo=None) 
-                }
-                
-                if period == 'minute':
-                    if eastern_time.time() >= datetime.strptime('09:30', '%H:%M').time() and eastern_time.time() <= datetime.strptime('15:59', '%H:%M').time():
-                        data_list.append(data_entry)
-                else:
-                    data_list.append(data_entry)
-        
+        results = data.get('results', [])
+        print(f"Fetched {len(results)} entries from API.")
+        pages.append(results)
+
         if 'next_url' in data and data['next_url']:
             url = data['next_url'] + '&apiKey=' + API_KEY
         else:
-            break
-    
-    df = pd.DataFrame(data_list)
+            return pages, True
+
+
+def _split_date_range(start_date, end_date, chunk_days=None):
+    """Split an inclusive date range into consecutive (start, end) sub-ranges of at most chunk_days days."""
+    if chunk_days is None:
+        return [(start_date, end_date)]
+    starts = pd.date_range(start_date, end_date, freq=f'{chunk_days}D')
+    ends = list(starts[1:] - pd.Timedelta(days=1)) + [pd.Timestamp(end_date)]
+    return [(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')) for start, end in zip(starts, ends)]
+
+
+def _partition_path(ticker, period, adjusted, month):
+    """Path of the cached Parquet partition holding one month of bars."""
+    return os.path.join(CACHE_DIR, ticker, period, f"adjusted={str(adjusted).lower()}", f"{month}.parquet")
+
+
+def _missing_month_ranges(months):
+    """Group consecutive missing months into (first, last) runs so each run is a single range request."""
+    runs = []
+    for month in months:
+        if runs and runs[-1][1] + 1 == month:
+            runs[-1][1] = month
+        else:
+            runs.append([month, month])
+    return runs
+
+
+@stage(rows=len)
+def fetch_polygon_data(ticker, start_date, end_date, period, enforce_rate_limit=ENFORCE_RATE_LIMIT, adjusted=False,
+                       use_cache=USE_CACHE, max_workers=MAX_WORKERS):
+    """Fetch stock data from Polygon.io based on the given period (minute or day), through the local Parquet cache.
+       enforce_rate_limit: Set to True to enforce rate limits (suitable for free tiers), False for paid tiers with minimal or no rate limits.
+       adjusted: Request split-adjusted bars.
+       use_cache: Read/write monthly partitions under CACHE_DIR; only months missing from the cache are downloaded.
+       Months that have not ended yet are always downloaded and never cached, since they may still be incomplete.
+       max_workers: most concurrent requests of this call.
+    """
+    if not use_cache:
+        return _download_polygon_data(ticker, start_date, end_date, period, enforce_rate_limit, adjusted,
+                                      max_workers)
+
+    months = pd.period_range(start_date, end_date, freq='M')
+    current_month = pd.Period(datetime.now(pytz.timezone('America/New_York')).date(), freq='M')
+
+    missing = [month for month in months if month >= current_month or
+               not os.path.exists(_partition_path(ticker, period, adjusted, month))]
+    with _cache_stats_lock:
+        CACHE_STATS['hits'] += len(months) - len(missing)
+        CACHE_STATS['misses'] += len(missing)
+
+    frames = {}
+    for first, last in _missing_month_ranges(missing):
+        # Always download whole months so that every written partition is complete.
+        df = _download_polygon_data(ticker, first.start_time.strftime('%Y-%m-%d'), last.end_time.strftime('%Y-%m-%d'),
+                                    period, enforce_rate_limit, adjusted, max_workers)
+        month_of_bar = df['caldt'].dt.to_period('M')
+        for month in pd.period_range(first, last, freq='M'):
+            frames[month] = df[month_of_bar == month].reset_index(drop=True)
+            # Partial downloads (API errors) and still-running months are never written to the cache.
+            if month < current_month and df.attrs['complete']:
+                path = _partition_path(ticker, period, adjusted, month)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                frames[month].to_parquet(path, index=False)
+
+    for month in months:
+        if month not in frames:
+            frames[month] = pd.read_parquet(_partition_path(ticker, period, adjusted, month))
+
+    df = pd.concat([frames[month] for month in months], ignore_index=True)
+    days = df['caldt'].dt.normalize()
+    df = df[(days >= pd.Timestamp(start_date)) & (days <= pd.Timestamp(end_date))].reset_index(drop=True)
+    print(f"Cache hits: {CACHE_STATS['hits']}, misses: {CACHE_STATS['misses']} (monthly partitions).")
+    return df
+
+
+def _download_polygon_data(ticker, start_date, end_date, period, enforce_rate_limit=ENFORCE_RATE_LIMIT, adjusted=False,
+                           max_workers=MAX_WORKERS):
+    """Download stock data from Polygon.io based on the given period (minute or day), bypassing the cache.
+       When the rate limit allows it, minute ranges are split into independent sub-ranges paginated concurrently
+       (by up to max_workers threads) over the shared session; otherwise the range is paginated in one chain.
+    """
+    multiplier = '1'
+    timespan = period
+    limit = '50000'  # Maximum entries per request
+    workers = max_workers if _concurrency_allowed(enforce_rate_limit) else 1
+    chunk_days = MINUTE_CHUNK_DAYS if period == 'minute' and workers > 1 else None
+
+    urls = [f'{BASE_URL}/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{sub_start}/{sub_end}'
+            f'?adjusted={str(adjusted).lower()}&sort=asc&limit={limit}&apiKey={API_KEY}'
+            for sub_start, sub_end in _split_date_range(start_date, end_date, chunk_days)]
+
+    if workers == 1 or len(urls) == 1:
+        downloads = [_fetch_pages(url, enforce_rate_limit) for url in urls]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(urls))) as executor:
+            downloads = list(executor.map(lambda url: _fetch_pages(url, enforce_rate_limit), urls))
+
+    frames = [_decode_bars([], period)]
+    complete = True
+    for pages, sub_range_complete in downloads:
+        complete = complete and sub_range_complete
+        frames.extend(_decode_bars(page, period) for page in pages)
+
+    df = pd.concat(frames, ignore_index=True)
+    df.attrs['complete'] = complete  # False if the download stopped on an API error.
     print("Data fetching complete.")
     return df
 
 
-def fetch_polygon_dividends(ticker):
-    """ Fetches dividend data from Polygon.io for a specified stock ticker. """
-    url = f'{BASE_URL}/v3/reference/dividends?ticker={ticker}&limit=1000&apiKey={API_KEY}'
-    
-    dividends_list = []
-    while True:
-        response = requests.get(url)
-        data = response.json()
-        if 'results' in data:
-            for entry in data['results']:
-                dividends_list.append({
-                    'caldt': datetime.strptime(entry['ex_dividend_date'], '%Y-%m-%d'),
-                    'dividend': entry['cash_amount']
-                })
-        
-        if 'next_url' in data and data['next_url']:
-            url = data['next_url'] + '&apiKey=' + API_KEY
-        else:
-            break
-    
-    return pd.DataFrame(dividends_list)
\ No newline at end of file
+def _decode_bars(results, period):
+    """Convert one page of Polygon aggregate results into a bar DataFrame in naive Eastern time.
+       Fields are read into columnar arrays, timestamps are converted with one vectorized tz conversion and,
+       for minute bars, the 09:30-15:59 session filter is applied as a boolean mask.
+    """
+    n = len(results)
+    columns = {name: np.fromiter((entry[field] for entry in results), dtype=np.float64, count=n)
+               for name, field in (('volume', 'v'), ('open', 'o'), ('high', 'h'), ('low', 'l'), ('close', 'c'))}
+    timestamps = np.fromiter((entry['t'] for entry in results), dtype=np.int64, count=n)
+    caldt = pd.to_datetime(timestamps, unit='ms', utc=True).tz_convert('America/New_York').tz_localize(None)
+    columns['caldt'] = caldt.astype('datetime64[ns]')
+    df = pd.DataFrame(columns, columns=BAR_COLUMNS)
+
+    if period == 'minute':
+        time_of_day = caldt - caldt.normalize()
+        in_session = (time_of_day >= SESSION_START) & (time_of_day <= SESSION_END)
+        df = df[in_session].reset_index(drop=True)
+    return df
+
+
+def _reference_path(ticker, kind):
+    """Path of the cached Parquet file of a ticker's dividends or splits."""
+    return os.path.join(CACHE_DIR, ticker, 'reference', f"{kind}.parquet")
+
+
+def _fetch_reference(ticker, kind, decode, columns, enforce_rate_limit=ENFORCE_RATE_LIMIT, use_cache=USE_CACHE):
+    """Fetch every /v3/reference/{kind} entry of a ticker, decoded by decode into a row of columns, through the
+       cache file of _reference_path. The file is reused for REFERENCE_CACHE_MAX_AGE; partial downloads (API errors)
+       are never written to it.
+    """
+    path = _reference_path(ticker, kind)
+    if use_cache and os.path.exists(path) and \
+            time.time() - os.path.getmtime(path) < REFERENCE_CACHE_MAX_AGE.total_seconds():
+        return pd.read_parquet(path)
+
+    url = f'{BASE_URL}/v3/reference/{kind}?ticker={ticker}&limit=1000&apiKey={API_KEY}'
+    pages, complete = _fetch_pages(url, enforce_rate_limit)
+    df = pd.DataFrame([decode(entry) for page in pages for entry in page], columns=columns)
+    if use_cache and complete:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path, index=False)
+    return df
+
+
+@stage(rows=len)
+def fetch_polygon_dividends(ticker, enforce_rate_limit=ENFORCE_RATE_LIMIT, use_cache=USE_CACHE):
+    """ Fetches dividend data from Polygon.io for a specified stock ticker, through the local Parquet cache. """
+    return _fetch_reference(ticker, 'dividends',
+                            lambda entry: (datetime.strptime(entry['ex_dividend_date'], '%Y-%m-%d'),
+                                           entry['cash_amount']),
+                            ['caldt', 'dividend'], enforce_rate_limit, use_cache)
+
+
+@stage(rows=len)
+def fetch_polygon_splits(ticker, enforce_rate_limit=ENFORCE_RATE_LIMIT, use_cache=USE_CACHE):
+    """Fetch the stock splits of a ticker from Polygon.io as a DataFrame of caldt (execution date) and split_ratio
+       (new shares per old share, e.g. 4.0 for a 4-for-1 split), through the local Parquet cache.
+    """
+    return _fetch_reference(ticker, 'splits',
+                            lambda entry: (datetime.strptime(entry['execution_date'], '%Y-%m-%d'),
+                                           entry['split_to'] / entry['split_from']),
+                            ['caldt', 'split_ratio'], enforce_rate_limit, use_cache)
+
+
+def fetch_polygon_data_many(tickers, start_date, end_date, period, enforce_rate_limit=ENFORCE_RATE_LIMIT,
+                            adjusted=False, use_cache=USE_CACHE):
+    """Fetch the same date range for several tickers concurrently. Returns a dict of ticker -> DataFrame.
+       MAX_WORKERS is shared between tickers and their sub-ranges, so that no more requests are in flight than
+       the session keeps connections for.
+    """
+    ticker_workers = max(1, min(MAX_WORKERS, len(tickers)))
+    range_workers = max(1, MAX_WORKERS // ticker_workers)
+    with ThreadPoolExecutor(max_workers=ticker_workers) as executor:
+        frames = executor.map(lambda ticker: fetch_polygon_data(ticker, start_date, end_date, period,
+                                                                enforce_rate_limit, adjusted, use_cache,
+                                                                range_workers), tickers)
+        return dict(zip(tickers, frames))
\ No newline at end of file
@@ -0,0 +1,222 @@
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not recorded.
+    resource = None
+
+# Recording is off unless STAGE_TIMING=1 (or RECORDER.enable() is called): spans then cost one attribute check.
+STAGE_TIMING = os.getenv("STAGE_TIMING", "0") == "1"
+
+# Stages to profile, comma-separated, or 'all'; the profiler is 'cprofile' (default) or 'pyinstrument'.
+STAGE_PROFILE = os.getenv("STAGE_PROFILE", "")
+STAGE_PROFILER = os.getenv("STAGE_PROFILER", "cprofile")
+STAGE_REPORT = os.getenv("STAGE_REPORT", "stage_report.json")  # Run report of scripts: .json or .csv.
+PROFILE_DIR = os.getenv("STAGE_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+
+# Columns of the run report, in order.
+REPORT_COLUMNS = ['stage', 'parent', 'depth', 'start_s', 'wall_s', 'cpu_s', 'rows', 'rows_per_s', 'peak_rss_mib',
+                  'rss_growth_mib', 'profile']
+
+
+def _stage_names(profile):
+    """'all', or the tuple of stage names in a comma-separated string or an iterable."""
+    if profile == 'all':
+        return profile
+    if isinstance(profile, str):
+        profile = profile.split(',')
+    return tuple(name.strip() for name in profile if name.strip())
+
+
+def _peak_rss_mib():
+    """High-water mark of the resident set size of this process, in MiB (None where getrusage is unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10  # Bytes on macOS, KiB elsewhere.
+
+
+class _NullSpan:
+    """Span returned while recording is off: entering, leaving and setting rows do nothing."""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed stage. Set span.rows inside the block to record the rows it processed."""
+
+    def __init__(self, recorder, name, rows=None):
+        self.recorder = recorder
+        self.name = name
+        self.rows = rows
+        self.profiler = None
+
+    def __enter__(self):
+        recorder = self.recorder
+        stack = recorder._stack()
+        self.parent = stack[-1].name if stack else None
+        self.depth = len(stack)
+        stack.append(self)
+        if recorder.profiles(self.name) and not any(span.profiler for span in recorder._stack_of_all_threads()):
+            self.profiler = recorder._start_profiler()
+        self.rss_before = _peak_rss_mib()
+        self.cpu_start = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.cpu_start
+        recorder = self.recorder
+        profile = recorder._stop_profiler(self.profiler, self.name) if self.profiler else None
+        recorder._stack().pop()
+        peak = _peak_rss_mib()
+        recorder.spans.append({
+            'stage': self.name, 'parent': self.parent, 'depth': self.depth,
+            'start_s': self.start - recorder.started, 'wall_s': wall, 'cpu_s': cpu, 'rows': self.rows,
+            'rows_per_s': self.rows / wall if self.rows is not None and wall > 0 else None,
+            'peak_rss_mib': peak, 'rss_growth_mib': None if peak is None else peak - self.rss_before,
+            'profile': profile,
+        })
+        return False
+
+
+class StageRecorder:
+    """Collects the spans of one run: wall time, CPU time (of the whole process), rows and peak RSS (high-water
+       mark of the process so far, and its growth during the stage) of every stage, with an optional
+       profile of selected stages. While disabled, span() returns a shared no-op span and stage() calls the
+       wrapped function directly, so the instrumentation can stay in place in sweeps and production runs.
+       profile: stage names to profile (an iterable or a comma-separated string), or 'all'.
+       profiler: 'cprofile' (a .prof file per stage for pstats or snakeviz) or 'pyinstrument' (a .txt call tree
+                 per stage; needs pyinstrument installed). Nested stages of a profiled stage are not profiled again.
+    """
+
+    def __init__(self, enabled=False, profile=(), profiler='cprofile', profile_dir=PROFILE_DIR):
+        self.enabled = enabled
+        self.profile = _stage_names(profile)
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self.reset()
+
+    def reset(self):
+        """Drop the recorded spans and restart the run clock."""
+        self.spans = []
+        self._stacks = {}  # Thread id -> open spans of that thread, innermost last.
+        self.started = time.perf_counter()
+        self.started_at = datetime.now()
+
+    def enable(self, profile=None, profiler=None):
+        """Start recording (and profiling the given stages) from now on."""
+        self.enabled = True
+        if profile is not None:
+            self.profile = _stage_names(profile)
+        if profiler is not None:
+            self.profiler = profiler
+
+    def disable(self):
+        self.enabled = False
+
+    def _stack(self):
+        return self._stacks.setdefault(threading.get_ident(), [])
+
+    def _stack_of_all_threads(self):
+        return [span for stack in list(self._stacks.values()) for span in stack]
+
+    def profiles(self, name):
+        return self.profile == 'all' or name in self.profile
+
+    def span(self, name, rows=None):
+        """Context manager timing the stage name: `with RECORDER.span('features') as span: ...; span.rows = n`."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, rows)
+
+    def stage(self, name=None, rows=None):
+        """Decorator timing every call of a function as a stage (named after the function by default).
+           rows: callable of the result giving the rows processed, e.g. len.
+        """
+        def decorator(function):
+            stage_name = name or function.__name__
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with Span(self, stage_name) as span:
+                    result = function(*args, **kwargs)
+                    if rows is not None:
+                        span.rows = rows(result)
+                return result
+            return wrapper
+        return decorator
+
+    def _start_profiler(self):
+        if self.profiler == 'pyinstrument':
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profiler(self, profiler, name):
+        """Stop a stage's profiler and write its output; returns the path of the file."""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stem = os.path.join(self.profile_dir, f"{self.started_at:%Y%m%d_%H%M%S}_{len(self.spans):03d}_{name}")
+        if self.profiler == 'pyinstrument':
+            profiler.stop()
+            path = stem + '.txt'
+            with open(path, 'w') as file:
+                file.write(profiler.output_text(unicode=True))
+        else:
+            profiler.disable()
+            path = stem + '.prof'
+            profiler.dump_stats(path)
+        return path
+
+    def report(self):
+        """DataFrame of the recorded spans in the order they finished."""
+        return pd.DataFrame(self.spans, columns=REPORT_COLUMNS)
+
+    def write_report(self, path):
+        """Write the run report as CSV (path ending in .csv) or JSON with the run metadata (anything else)."""
+        report = self.report()
+        if path.endswith('.csv'):
+            report.to_csv(path, index=False)
+            return path
+        meta = {'date': self.started_at.isoformat(timespec='seconds'), 'argv': sys.argv,
+                'python': platform.python_version(), 'machine': platform.platform(),
+                'total_s': time.perf_counter() - self.started}
+        with open(path, 'w') as file:
+            json.dump({'meta': meta, 'spans': report.astype(object).where(report.notna(), None)
+                      .to_dict(orient='records')}, file, indent=2)
+        return path
+
+
+# Recorder of this process, configured from the environment; span and stage are its methods.
+RECORDER = StageRecorder(STAGE_TIMING, STAGE_PROFILE, STAGE_PROFILER)
+span = RECORDER.span
+stage = RECORDER.stage
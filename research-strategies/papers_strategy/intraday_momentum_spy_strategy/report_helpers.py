@@ -0,0 +1,70 @@
+from analytics_helpers import summary_stats
+
+
+def performance_stats(strat):
+    """Compute the rounded summary stats of a backtest from its strat DataFrame (ret, AUM, ret_spy)."""
+    raw = summary_stats(strat['ret'].to_numpy(), equity=strat['AUM'].to_numpy(),
+                        benchmark_ret=strat['ret_spy'].to_numpy())
+    return {
+        'Total Return (%)': round(raw['total_return'] * 100, 0),
+        'Annualized Return (%)': round(raw['annualized_return'] * 100, 1),
+        'Annualized Volatility (%)': round(raw['annualized_volatility'] * 100, 1),
+        'Sharpe Ratio': round(raw['sharpe_ratio'], 2),
+        'Hit Ratio (%)': round(raw['hit_ratio'] * 100, 0),
+        'Maximum Drawdown (%)': round(raw['max_drawdown'] * 100, 0),
+        'Alpha (%)': round(raw['alpha'] * 100, 2),
+        'Beta': round(raw['beta'], 2),
+    }
+
+
+def plot_aum(strat, commission, path=None, show=False):
+    """Plot the strategy AUM against the passive benchmark AUM (strat['AUM_SPX']).
+       path: save the figure to this file. show: open it in a window (blocks until closed).
+       Without show, the figure is drawn off-screen without going through pyplot or a GUI backend.
+    """
+    import matplotlib.dates as mdates
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import FuncFormatter
+
+    # Create a figure and a set of subplots
+    if show:
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots()
+    else:
+        fig = Figure()
+        ax = fig.subplots()
+
+    # Plotting the AUM of the strategy and the passive S&P 500 exposure
+    ax.plot(strat.index, strat['AUM'], label='Momentum', linewidth=2, color='k')
+    ax.plot(strat.index, strat['AUM_SPX'], label='S&P 500', linewidth=1, color='r')
+
+    # Formatting the plot
+    ax.grid(True, linestyle=':')
+    ax.xaxis.set_major_locator(mdates.MonthLocator())
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %y'))
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, _: f'${x:,.0f}'))
+    ax.set_ylabel('AUM ($)')
+    ax.legend(loc='upper left')
+    ax.set_title('Intraday Momentum Strategy', fontsize=12, fontweight='bold')
+    fig.suptitle(f'Commission = ${commission}/share', fontsize=9, verticalalignment='top')
+
+    if path is not None:
+        fig.savefig(path, bbox_inches='tight')
+    if show:
+        plt.show()
+        plt.close(fig)
+
+
+def report(strat, AUM_0=100000.0, commission=0.0035, plot_path=None, show=False):
+    """Reporting stage, run once after the simulation.
+       Adds the passive benchmark AUM (AUM_SPX) to strat and returns the stats dict. Nothing is plotted
+       (and matplotlib is not imported) unless plot_path or show is given, so batch and sweep runs stay headless.
+    """
+    # Calculate cumulative products for AUM calculations
+    strat['AUM_SPX'] = AUM_0 * (1 + strat['ret_spy']).cumprod(skipna=True)
+
+    if plot_path is not None or show:
+        plot_aum(strat, commission, plot_path, show)
+
+    return performance_stats(strat)
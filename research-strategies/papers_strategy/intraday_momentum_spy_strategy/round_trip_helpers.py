@@ -0,0 +1,91 @@
+import numpy as np
+
+from momentum_helpers import MINUTES_PER_DAY
+
+# Minutes from midnight to the first bar of the session (09:30, available at 09:31).
+SESSION_START_MINUTE = 9 * 60 + 30
+
+
+def session_matrix(caldt, values, all_days=None):
+    """Lay out minute bars as (days x minutes) matrices, column j holding the bar that starts j minutes after
+       09:30; bars outside the regular session are dropped. Unlike build_day_matrix, a missing bar leaves a gap
+       instead of shifting the later ones, so a column is always the same time of day.
+       caldt: bar start times (datetime64), values: dict of name -> per-bar values in the same order.
+       all_days: calendar of the rows (datetime64[D]), the days of caldt by default; other days are dropped.
+       Returns a dict with 'all_days', the boolean 'valid' mask of real bars and one float64 matrix per value.
+    """
+    # Integer minutes since the epoch: day number and minute of the day without datetime arithmetic.
+    epoch_minutes = np.asarray(caldt).astype('datetime64[m]').astype(np.int64)
+    day_numbers = epoch_minutes // (24 * 60)
+    minutes = epoch_minutes - day_numbers * (24 * 60) - SESSION_START_MINUTE
+    days = day_numbers.astype('datetime64[D]')
+    all_days = np.unique(days) if all_days is None else np.asarray(all_days, dtype='datetime64[D]')
+    rows = np.searchsorted(all_days, days)
+    keep = (minutes >= 0) & (minutes < MINUTES_PER_DAY) & (rows < len(all_days))
+    keep[keep] = all_days[rows[keep]] == days[keep]
+    rows, minutes = rows[keep], minutes[keep]
+
+    matrix = {'all_days': all_days, 'valid': np.zeros((len(all_days), MINUTES_PER_DAY), dtype=bool)}
+    matrix['valid'][rows, minutes] = True
+    for name, column in values.items():
+        matrix[name] = np.full((len(all_days), MINUTES_PER_DAY), np.nan)
+        matrix[name][rows, minutes] = np.asarray(column, dtype=float)[keep]
+    return matrix
+
+
+def align_days(days, values, all_days, fill):
+    """Place per-day values (last axis over days) on a wider calendar all_days, fill where days has no entry."""
+    values = np.asarray(values)
+    aligned = np.full(values.shape[:-1] + (len(all_days),), fill, dtype=values.dtype)
+    rows = np.searchsorted(all_days, days)
+    inside = rows < len(all_days)
+    inside[inside] = all_days[rows[inside]] == days[inside]
+    aligned[..., rows[inside]] = values[..., inside]
+    return aligned
+
+
+def order_fee(quantity, price, per_share=0.005, minimum=1.0, maximum_rate=0.005):
+    """IB fixed US equity commission of an order (the default fee model of the local QuantConnect stand-in)."""
+    quantity = np.abs(quantity)
+    return np.minimum(np.maximum(minimum, per_share * quantity), maximum_rate * quantity * price)
+
+
+def simulate_round_trips(direction, entry_price, exit_price, cash=100000.0, free_portfolio_value_percentage=0.0025,
+                         per_share=0.005, minimum=1.0, maximum_rate=0.005):
+    """Cash recursion of an algorithm that opens one all-in position a day and closes it the same day.
+       direction, entry_price, exit_price: per day on the last axis, with any leading axes of runs (tickers,
+       parameter sets, ...) along which they broadcast; direction 1 is set_holdings(1), -1 set_holdings(-1) and
+       0 no trade. Each trade buys or shorts the whole shares that fit in the equity minus
+       free_portfolio_value_percentage, and both orders pay order_fee. The float operations are those of the
+       local QuantConnect stand-in, so the equity matches an event-driven run exactly. Only the days are
+       stepped through, all runs at once.
+       Returns (equity, quantity, fees): the equity at the end of each day, the shares traded and the fees paid.
+    """
+    direction, entry_price, exit_price = np.broadcast_arrays(direction, entry_price, exit_price)
+    equity = np.empty(direction.shape)
+    quantity = np.zeros(direction.shape, dtype=np.int64)
+    fees = np.zeros(direction.shape)
+
+    balance = np.full(direction.shape[:-1], float(cash))
+    for d in range(direction.shape[-1]):
+        on = direction[..., d] != 0
+        if on.any():
+            entry, exit_ = entry_price[..., d], exit_price[..., d]
+            with np.errstate(invalid='ignore'):
+                shares = np.where(on, np.trunc(direction[..., d] * balance * (1 - free_portfolio_value_percentage)
+                                               / entry), 0.0)
+            fee_in = order_fee(shares, entry, per_share, minimum, maximum_rate)
+            fee_out = order_fee(shares, exit_, per_share, minimum, maximum_rate)
+            traded = shares != 0
+            balance = np.where(traded, balance - (shares * entry + fee_in) - (-shares * exit_ + fee_out), balance)
+            quantity[..., d] = shares
+            fees[..., d] = np.where(traded, fee_in + fee_out, 0.0)
+        equity[..., d] = balance
+    return equity, quantity, fees
+
+
+def daily_returns(equity, cash):
+    """Returns of end-of-day equity paths (last axis over days), the first day against the starting cash."""
+    equity = np.asarray(equity)
+    previous = np.concatenate([np.full(equity.shape[:-1] + (1,), float(cash)), equity[..., :-1]], axis=-1)
+    return equity / previous - 1
@@ -0,0 +1,148 @@
+import math
+
+import pandas as pd
+
+from corporate_actions import adjust_prev_close
+from indicator_helpers import VWAP, RollingStd
+from momentum_helpers import MINUTES_PER_DAY
+
+
+class NoiseBandSignal:
+    """Incremental version of the noise-band signal of intraday_momentum_spy.py for paper trading.
+
+    Each call to update() consumes one regular-session minute bar and refreshes, in O(1):
+    - vwap and move_open for the current day,
+    - sigma_open, the mean move_open of the same minute of day over its previous `window` occurrences,
+      kept as one ring buffer with a running sum per minute of day,
+    - spy_dvol, the std of the daily returns of days d-15 to d-2, updated once per day,
+    - the UB/LB noise bands and the resulting signal (1 long, -1 short, 0 flat).
+
+    The values match the batch features of build_intraday_features bar for bar, including the
+    first day of the stream having NaN features because it has no previous close.
+    """
+
+    def __init__(self, band_mult=1, window=14, min_periods=13, vol_window=14):
+        self.band_mult = band_mult
+        self.window = window
+        self.min_periods = min_periods
+        self.vol_window = vol_window
+
+        # One ring buffer of move_open values per minute of day (index 0 unused).
+        self._ring = [[math.nan] * window for _ in range(MINUTES_PER_DAY + 1)]
+        self._ring_pos = [0] * (MINUTES_PER_DAY + 1)
+        self._ring_sum = [0.0] * (MINUTES_PER_DAY + 1)
+        self._ring_count = [0] * (MINUTES_PER_DAY + 1)
+
+        # Std of the daily returns pushed so far; the first day has no return, like in the batch code.
+        self._daily_vol = RollingStd(vol_window)
+        self._n_days = 0
+        self._last_close = None
+        self._prev_day_close = None
+
+        self.day = None
+        self.open_price = math.nan
+        self.prev_close_adjusted = math.nan
+        self._vwap = VWAP()
+
+        self.min_from_open = math.nan
+        self.vwap = math.nan
+        self.move_open = math.nan
+        self.sigma_open = math.nan
+        self.spy_dvol = math.nan
+        self.UB = math.nan
+        self.LB = math.nan
+        self.signal = 0
+
+    def _start_day(self, day, open_price, dividend, split_ratio):
+        """Roll the daily state over when the first bar of a new day arrives."""
+        # Volatility of the returns of days d-15 to d-2, NaN until the window is full: read it before
+        # pushing the return of day d-1.
+        self.spy_dvol = self._daily_vol.value if self._daily_vol.is_ready else math.nan
+        if self.day is not None:
+            # The previous day is complete: record its close-to-close return.
+            if self._prev_day_close is not None:
+                self._daily_vol.update(self._last_close / self._prev_day_close - 1)
+            self._prev_day_close = self._last_close
+
+        self._n_days += 1
+        self.day = day
+        self.open_price = open_price
+        if self._last_close is None:
+            self.prev_close_adjusted = math.nan
+        else:
+            # Same adjustment as the batch path, on the (previous day, current day) pair.
+            self.prev_close_adjusted = float(adjust_prev_close((self._last_close, math.nan), (0.0, dividend),
+                                                               (1.0, split_ratio))[-1])
+        self._vwap.reset()
+
+    def update(self, caldt, open, high, low, close, volume, dividend=0.0, split_ratio=1.0):
+        """Consume one minute bar (caldt: naive Eastern bar start time) and return the current signal.
+           dividend: cash dividend going ex on caldt's day, split_ratio: new shares per old share of a split
+           effective that day; both adjust the previous close (see corporate_actions.adjust_prev_close).
+        """
+        if caldt.date() != self.day:
+            self._start_day(caldt.date(), open, dividend, split_ratio)
+        self._last_close = close
+
+        self.min_from_open = (caldt.hour * 60 + caldt.minute + caldt.second / 60) - (9 * 60 + 30) + 1
+        minute_of_day = round(self.min_from_open)
+
+        if self._n_days == 1:
+            # The first day has no previous close, so its features stay NaN.
+            self.vwap = math.nan
+            self.move_open = math.nan
+        else:
+            self.vwap = self._vwap.update((high + low + close) / 3, volume)
+            self.move_open = abs(close / self.open_price - 1)
+
+        # sigma_open uses the previous occurrences of this minute only, then the current value is pushed.
+        ring = self._ring[minute_of_day]
+        pos = self._ring_pos[minute_of_day]
+        count = self._ring_count[minute_of_day]
+        self.sigma_open = self._ring_sum[minute_of_day] / count if count >= self.min_periods else math.nan
+
+        dropped = ring[pos]
+        if not math.isnan(dropped):
+            self._ring_sum[minute_of_day] -= dropped
+            count -= 1
+        if not math.isnan(self.move_open):
+            self._ring_sum[minute_of_day] += self.move_open
+            count += 1
+        if count == 0:
+            self._ring_sum[minute_of_day] = 0.0  # Drop accumulated rounding once the window is empty.
+        ring[pos] = self.move_open
+        self._ring_pos[minute_of_day] = (pos + 1) % self.window
+        self._ring_count[minute_of_day] = count
+
+        # Noise area boundaries and signal; NaN bands never trigger.
+        self.UB = max(self.open_price, self.prev_close_adjusted) * (1 + self.band_mult * self.sigma_open)
+        self.LB = min(self.open_price, self.prev_close_adjusted) * (1 - self.band_mult * self.sigma_open)
+        if close > self.UB and close > self.vwap:
+            self.signal = 1
+        elif close < self.LB and close < self.vwap:
+            self.signal = -1
+        else:
+            self.signal = 0
+        return self.signal
+
+
+def replay_noise_band(df, band_mult=1, actions=None):
+    """Feed minute bars through NoiseBandSignal and collect its state after every bar.
+       df: bars with caldt, open, high, low, close, volume and optionally per-bar 'dividend' and 'split_ratio'
+           columns.
+       actions: CorporateActions of the ticker, used instead of those columns.
+       Returns a DataFrame indexed by caldt with vwap, move_open, sigma_open, spy_dvol, UB, LB and signal.
+    """
+    engine = NoiseBandSignal(band_mult=band_mult)
+    caldt = pd.to_datetime(df['caldt'] if 'caldt' in df.columns else df.index)
+    if actions is not None:
+        dividend, split_ratio = actions.on(caldt)
+    else:
+        dividend = df['dividend'] if 'dividend' in df.columns else pd.Series(0.0, index=df.index)
+        split_ratio = df['split_ratio'] if 'split_ratio' in df.columns else pd.Series(1.0, index=df.index)
+    columns = ('vwap', 'move_open', 'sigma_open', 'spy_dvol', 'UB', 'LB', 'signal')
+    rows = []
+    for bar in zip(caldt, df['open'], df['high'], df['low'], df['close'], df['volume'], dividend, split_ratio):
+        engine.update(*bar)
+        rows.append(tuple(getattr(engine, name) for name in columns))
+    return pd.DataFrame(rows, index=caldt, columns=columns)
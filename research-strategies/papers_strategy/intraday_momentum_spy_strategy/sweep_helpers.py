@@ -0,0 +1,139 @@
+import itertools
+import os
+from multiprocessing import Pool
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from analytics_helpers import summary_stats
+from momentum_helpers import day_pnl_components, simulate_aum
+
+# Parameters that change the intraday exposure; everything else only changes the AUM recursion.
+COMPONENT_PARAMS = ('band_mult', 'trade_freq')
+
+# Default values for every parameter that can be swept.
+DEFAULT_PARAMS = {
+    'band_mult': 1,
+    'trade_freq': 30,
+    'sizing_type': 'vol_target',
+    'target_vol': 0.02,
+    'max_leverage': 4,
+    'AUM_0': 100000.0,
+    'commission': 0.0035,
+    'min_comm_per_order': 0.35,
+}
+
+# Worker-side state: views on the shared day matrix and a small cache of PnL components.
+_worker_matrix = None
+_worker_segments = []
+_worker_components = {}
+
+
+def _share_matrix(matrix):
+    """Copy the numeric arrays of a day matrix into shared memory blocks.
+       Returns (segments, layout) where layout maps names to (shm name, shape, dtype) for the workers.
+    """
+    segments = []
+    layout = {}
+    for name, values in matrix.items():
+        if name == 'all_days':
+            continue
+        values = np.ascontiguousarray(values)
+        segment = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=segment.buf)[...] = values
+        segments.append(segment)
+        layout[name] = (segment.name, values.shape, values.dtype.str)
+    return segments, layout
+
+
+def _attach_matrix(layout):
+    """Pool initializer: map the shared day matrix into this worker without copying it."""
+    global _worker_matrix, _worker_segments
+    _worker_matrix = {}
+    _worker_segments = []
+    for name, (segment_name, shape, dtype) in layout.items():
+        segment = shared_memory.SharedMemory(name=segment_name)
+        _worker_segments.append(segment)
+        _worker_matrix[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+
+
+def _detach_matrix():
+    """Drop the views on the shared day matrix and close this process' handles to it."""
+    global _worker_matrix, _worker_segments
+    _worker_matrix = None
+    _worker_components.clear()
+    for segment in _worker_segments:
+        segment.close()
+    _worker_segments = []
+
+
+def _run_batch(batch):
+    """Backtest a batch of parameter combinations against the worker's day matrix and score them in one call."""
+    aums = []
+    rets = []
+    for params in batch:
+        key = tuple(params[name] for name in COMPONENT_PARAMS)
+        if key not in _worker_components:
+            # Batches are sorted by component key, so only the latest components are worth keeping.
+            _worker_components.clear()
+            _worker_components[key] = day_pnl_components(_worker_matrix, params['band_mult'], params['trade_freq'])
+        gross_pnl_per_share, trades_count, active = _worker_components[key]
+
+        aum, ret = simulate_aum(gross_pnl_per_share, trades_count, active, _worker_matrix['open'][:, 0],
+                                _worker_matrix['spy_dvol'][:, 0], params['AUM_0'], params['commission'],
+                                params['min_comm_per_order'], params['sizing_type'], params['target_vol'],
+                                params['max_leverage'])
+        aums.append(aum)
+        rets.append(ret)
+
+    stats = summary_stats(np.array(rets), equity=np.array(aums))
+    return [{**params, **{name: values[i] for name, values in stats.items()}} for i, params in enumerate(batch)]
+
+
+def expand_grid(param_grid):
+    """Expand a dict of parameter name -> list of values into a list of full parameter dicts."""
+    unknown = set(param_grid) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    names = list(param_grid)
+    combos = [{**DEFAULT_PARAMS, **dict(zip(names, values))}
+              for values in itertools.product(*(param_grid[name] for name in names))]
+    # Group combinations sharing the same exposure so each worker reuses its PnL components.
+    combos.sort(key=lambda params: tuple(params[name] for name in COMPONENT_PARAMS))
+    return combos
+
+
+def sweep_intraday_momentum(matrix, param_grid, n_workers=None, batch_size=64):
+    """Run the intraday momentum backtest for every combination of a parameter grid.
+       matrix: day matrix from build_day_matrix, built once from the step-2 features.
+       param_grid: dict of parameter name -> list of values, e.g. {'band_mult': [0.5, 1], 'target_vol': [0.01, 0.02]}.
+       n_workers: number of processes (defaults to os.cpu_count()); 1 runs in the current process.
+       batch_size: parameter combinations per task, to amortize inter-process overhead on large grids.
+       The matrix is placed in shared memory once and mapped by the workers, never pickled per task.
+       Returns a DataFrame with one row per combination: the parameters followed by the strategy stats.
+    """
+    combos = expand_grid(param_grid)
+    if not combos:
+        # An empty value list leaves nothing to run: same columns, no rows.
+        no_runs = np.empty((0, len(matrix['open'])))
+        return pd.DataFrame(columns=[*DEFAULT_PARAMS, *summary_stats(no_runs, equity=no_runs)])
+    batches = [combos[i:i + batch_size] for i in range(0, len(combos), batch_size)]
+    n_workers = n_workers or os.cpu_count()
+
+    segments, layout = _share_matrix(matrix)
+    try:
+        if n_workers == 1:
+            _attach_matrix(layout)
+            results = [_run_batch(batch) for batch in batches]
+        else:
+            with Pool(processes=min(n_workers, len(batches)), initializer=_attach_matrix,
+                      initargs=(layout,)) as pool:
+                results = pool.map(_run_batch, batches, chunksize=1)
+    finally:
+        _detach_matrix()
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+    return pd.DataFrame(list(itertools.chain.from_iterable(results)))
@@ -0,0 +1,143 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from analytics_helpers import summary_stats
+from momentum_helpers import MATRIX_COLUMNS, MINUTES_PER_DAY, day_pnl_components
+
+
+def build_panel(tickers, load_features, all_days, path=None, columns=MATRIX_COLUMNS, load_actions=None):
+    """Pack the step-2 features of many tickers into (tickers x days x minutes) panel arrays.
+       load_features: callable ticker -> minute feature DataFrame with a 'day' column (build_intraday_features
+                      output). Tickers are loaded one at a time.
+       load_actions: callable ticker -> CorporateActions, for the per-day (tickers x days) 'dividend' and
+                     'split_ratio' arrays; without it they come from per-bar 'dividend' and 'split_ratio' columns
+                     of the features if there are, else no actions.
+       all_days: common trading calendar; a ticker without bars on a day gets an empty (untraded) slot.
+       path: if given, the panel is backed by one .npy memmap per column in this directory, so resident memory
+             stays bounded by the chunk being processed rather than the whole universe.
+       Returns a dict laid out like build_day_matrix with an extra leading ticker axis and a 'tickers' entry.
+    """
+    all_days = np.asarray(all_days)
+    shape = (len(tickers), len(all_days), MINUTES_PER_DAY)
+    day_index = pd.Index(all_days)
+
+    def allocate(name, dtype, fill):
+        if path is None:
+            return np.full(shape, fill, dtype=dtype)
+        os.makedirs(path, exist_ok=True)
+        values = np.lib.format.open_memmap(os.path.join(path, f'{name}.npy'), mode='w+', dtype=dtype, shape=shape)
+        values[...] = fill
+        return values
+
+    panel = {'tickers': list(tickers), 'all_days': all_days, 'count': np.zeros(shape[:2], dtype=np.int64),
+             'dividend': np.zeros(shape[:2]), 'split_ratio': np.ones(shape[:2])}
+    panel['valid'] = allocate('valid', bool, False)
+    for column in columns:
+        panel[column] = allocate(column, np.float64, np.nan)
+
+    for t, ticker in enumerate(tickers):
+        df = load_features(ticker)
+        day_codes = day_index.get_indexer(df['day'])
+        keep = day_codes >= 0  # Drop days outside the common calendar.
+        day_codes = day_codes[keep]
+        counts = np.bincount(day_codes, minlength=len(all_days))
+        starts = np.cumsum(counts) - counts
+        positions = np.arange(len(day_codes)) - starts[day_codes]
+        fits = positions < MINUTES_PER_DAY  # Regular-session data never exceeds 390 bars per day.
+
+        panel['count'][t] = np.minimum(counts, MINUTES_PER_DAY)
+        panel['valid'][t, day_codes[fits], positions[fits]] = True
+        for column in columns:
+            panel[column][t, day_codes[fits], positions[fits]] = df[column].to_numpy(dtype=float)[keep][fits]
+        if load_actions is not None:
+            panel['dividend'][t], panel['split_ratio'][t] = load_actions(ticker).on(all_days)
+        else:
+            for name in ('dividend', 'split_ratio'):
+                if name in df.columns:  # Per-bar actions: the last bar of a day sets its value.
+                    panel[name][t, day_codes] = df[name].to_numpy(dtype=float)[keep]
+
+    if path is not None:
+        for name in ('count', 'dividend', 'split_ratio'):
+            np.save(os.path.join(path, f'{name}.npy'), panel[name])
+    return panel
+
+
+def load_panel(path, tickers, all_days, columns=MATRIX_COLUMNS):
+    """Reopen a panel written by build_panel(path=...) as read-only memmaps."""
+    panel = {'tickers': list(tickers), 'all_days': np.asarray(all_days)}
+    panel['valid'] = np.load(os.path.join(path, 'valid.npy'), mmap_mode='r')
+    for column in columns:
+        panel[column] = np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r')
+    for name in ('count', 'dividend', 'split_ratio'):
+        panel[name] = np.load(os.path.join(path, f'{name}.npy'))
+    return panel
+
+
+def simulate_aum_panel(gross_pnl_per_share, trades_count, active, open_price, spx_vol, AUM_0=100000.0,
+                       commission=0.0035, min_comm_per_order=0.35, sizing_type='vol_target', target_vol=0.02,
+                       max_leverage=4):
+    """AUM recursion of simulate_aum run for all tickers at once: (tickers x days) inputs, one step per day.
+       A ticker's AUM is carried forward over the days it does not trade, e.g. days without bars on the shared
+       calendar, so later positions are sized off its last AUM rather than AUM_0.
+    """
+    if sizing_type == 'vol_target':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            leverage = np.where(np.isnan(spx_vol), max_leverage, np.minimum(target_vol / spx_vol, max_leverage))
+    elif sizing_type == 'full_notional':
+        leverage = np.ones(open_price.shape)
+    else:
+        raise ValueError(f"Unknown sizing_type: {sizing_type}")
+
+    aum = np.full(open_price.shape, AUM_0)
+    ret = np.full(open_price.shape, np.nan)
+    for d in range(1, open_price.shape[1]):
+        aum[:, d] = aum[:, d - 1]
+        on = active[:, d]
+        if not on.any():
+            continue
+        previous_aum = aum[on, d - 1]
+        shares = np.round(previous_aum / open_price[on, d] * leverage[on, d])
+        net_pnl = gross_pnl_per_share[on, d] * shares - trades_count[on, d] * np.maximum(min_comm_per_order, commission * shares)
+        aum[on, d] = previous_aum + net_pnl
+        ret[on, d] = net_pnl / previous_aum
+    return aum, ret
+
+
+def backtest_universe(panel, chunk_size=32, AUM_0=100000.0, commission=0.0035, min_comm_per_order=0.35,
+                      band_mult=1, trade_freq=30, sizing_type='vol_target', target_vol=0.02, max_leverage=4):
+    """Run the intraday momentum backtest on every ticker of a panel from build_panel.
+       Tickers are processed chunk_size at a time, so only one chunk of the (possibly memmapped) panel
+       is materialized in memory at once.
+       The combined portfolio splits capital equally across the tickers traded each day and rebalances daily.
+       Returns (stats, rets): a DataFrame of stats per ticker plus a 'PORTFOLIO' row, and the daily returns
+       (days x tickers, plus a 'PORTFOLIO' column).
+    """
+    tickers = panel['tickers']
+    rets = np.full((len(tickers), len(panel['all_days'])), np.nan)
+    aums = np.full(rets.shape, AUM_0)
+    for start in range(0, len(tickers), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        matrix = {name: np.asarray(panel[name][chunk])
+                  for name in ('valid', 'count', 'open', 'close', 'vwap', 'sigma_open', 'min_from_open', 'dividend',
+                               'split_ratio')}
+        gross_pnl_per_share, trades_count, active = day_pnl_components(matrix, band_mult, trade_freq)
+        aum, ret = simulate_aum_panel(gross_pnl_per_share, trades_count, active, matrix['open'][..., 0],
+                                      np.asarray(panel['spy_dvol'][chunk, :, 0]), AUM_0, commission,
+                                      min_comm_per_order, sizing_type, target_vol, max_leverage)
+        rets[chunk] = ret
+        aums[chunk] = aum
+
+    # Equal-weight portfolio over the tickers traded each day.
+    traded = ~np.isnan(rets)
+    with np.errstate(invalid='ignore'):
+        portfolio_ret = np.where(traded.any(axis=0), np.nansum(rets, axis=0) / traded.sum(axis=0), np.nan)
+    portfolio_aum = AUM_0 * np.cumprod(1 + np.nan_to_num(portfolio_ret))
+
+    # Score every ticker and the portfolio in one vectorized call.
+    stats = pd.DataFrame(summary_stats(np.vstack([rets, portfolio_ret]), equity=np.vstack([aums, portfolio_aum])),
+                         index=list(tickers) + ['PORTFOLIO'])
+    rets = pd.DataFrame(rets.T, index=panel['all_days'], columns=tickers)
+    rets['PORTFOLIO'] = portfolio_ret
+    return stats, rets
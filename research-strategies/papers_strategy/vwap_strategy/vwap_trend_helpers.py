@@ -0,0 +1,138 @@
+"""
+Vectorized backtest of VwapTrendTrading (vwap_trend_strategy.py) on (days x minutes) matrices.
+
+The strategy takes one decision per day: at 09:31 it goes all in long if the close is above the VWAP and short
+if below, then exits on the first close back across the VWAP or at the end of the day. On a matrix with one row
+per day and one column per minute of the session that is a comparison on the first column, an argmax over a
+boolean mask of adverse crosses and a gather of the exit prices; only the cash recursion (the position size
+depends on the equity) steps through the days, across all tickers at once.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+INTRADAY_HELPERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                                    'intraday_momentum_spy_strategy')
+if INTRADAY_HELPERS_DIR not in sys.path:
+    sys.path.append(INTRADAY_HELPERS_DIR)
+from analytics_helpers import summary_stats  # noqa: E402
+from indicator_helpers import VWAP  # noqa: E402
+from momentum_helpers import MINUTES_PER_DAY  # noqa: E402
+from round_trip_helpers import align_days, daily_returns, session_matrix, simulate_round_trips  # noqa: E402
+
+
+def build_vwap_matrix(df, all_days=None, period=MINUTES_PER_DAY):
+    """Lay out minute bars as (days x minutes) 'close' and 'vwap' matrices, column j holding the bar that
+       starts j minutes after 09:30 (bars outside the regular session only feed the VWAP).
+       df: minute bars as returned by fetch_polygon_data (volume, open, high, low, close, caldt).
+       period: window of the VWAP in bars, like the strategy's VolumeWeightedAveragePriceIndicator("VWAP", 390):
+               volume weighted (open + high + low + close) / 4 over the last period bars of the whole stream,
+               NaN until period bars were seen (not ready) and the close when the window has no volume.
+               None gives a session VWAP, restarted every day.
+       all_days: calendar of the rows, e.g. shared by a universe; days of df outside it are dropped.
+       Returns a dict with 'all_days' (datetime64[D]), the boolean 'valid' mask of real bars, 'close' and 'vwap'.
+    """
+    df = df.sort_values('caldt')
+    caldt = pd.to_datetime(df['caldt']).to_numpy()
+    close = df['close'].to_numpy(dtype=float)
+    price = (df['open'].to_numpy(dtype=float) + df['high'].to_numpy(dtype=float) + df['low'].to_numpy(dtype=float)
+             + close) / 4
+    volume = df['volume'].to_numpy(dtype=float)
+    days = caldt.astype('datetime64[D]')
+
+    if period is None:
+        vwap = VWAP().compute(price, volume, sessions=days)
+        ready = np.ones(len(close), dtype=bool)
+    else:
+        vwap = VWAP(period).compute(price, volume)
+        ready = np.arange(len(close)) >= period - 1
+    vwap = np.where(ready, np.where(np.isnan(vwap), close, vwap), np.nan)
+
+    return session_matrix(caldt, {'close': close, 'vwap': vwap}, all_days)
+
+
+def vwap_trend_components(matrix, entry_minute=0):
+    """Entry direction and exit of every day, for all days at once.
+       Works on (days x minutes) matrices and on panels with extra leading axes, e.g. (tickers x days x minutes).
+       The entry is at the close of the bar in column entry_minute (the 09:31 decision): 1 above the VWAP, -1
+       below, 0 if equal, missing or not ready. The exit is at the first later close on the other side of the
+       VWAP (an argmax over the mask of adverse crosses) or at the last bar of the day. Days without a bar
+       after the entry are not traded.
+       Returns a dict of per-day 'direction', 'entry_price', 'exit_price', 'exit_minute' and 'crossed'.
+    """
+    valid, close, vwap = matrix['valid'], matrix['close'], matrix['vwap']
+    entry_price = close[..., entry_minute]
+    entry_vwap = vwap[..., entry_minute]
+    direction = np.zeros(entry_price.shape, dtype=np.int8)
+    direction[entry_price > entry_vwap] = 1
+    direction[entry_price < entry_vwap] = -1
+
+    after = valid & (np.arange(valid.shape[-1]) > entry_minute)
+    adverse = after & np.where((direction > 0)[..., None], close < vwap, close > vwap)
+    crossed = adverse.any(axis=-1)
+    last_bar = valid.shape[-1] - 1 - np.argmax(valid[..., ::-1], axis=-1)
+    exit_minute = np.where(crossed, np.argmax(adverse, axis=-1), last_bar)
+    direction[~after.any(axis=-1)] = 0
+
+    exit_price = np.take_along_axis(close, exit_minute[..., None], axis=-1)[..., 0]
+    return {'direction': direction, 'entry_price': entry_price, 'exit_price': exit_price,
+            'exit_minute': exit_minute, 'crossed': crossed & (direction != 0)}
+
+
+def backtest_vwap_trend(df, cash=25000.0, period=MINUTES_PER_DAY, all_days=None, **fee_params):
+    """Backtest VwapTrendTrading on the minute bars of one ticker.
+       fee_params: free_portfolio_value_percentage, per_share, minimum and maximum_rate of simulate_round_trips.
+       Returns a DataFrame indexed by day with the direction, entry and exit prices, exit minute, shares, fees,
+       end-of-day equity and daily return.
+    """
+    matrix = build_vwap_matrix(df, all_days, period)
+    components = vwap_trend_components(matrix)
+    equity, quantity, fees = simulate_round_trips(components['direction'], components['entry_price'],
+                                                  components['exit_price'], cash, **fee_params)
+
+    strat = pd.DataFrame({name: components[name]
+                          for name in ('direction', 'entry_price', 'exit_price', 'exit_minute', 'crossed')},
+                         index=pd.DatetimeIndex(matrix['all_days'], name='day'))
+    strat['quantity'] = quantity
+    strat['fees'] = fees
+    strat['equity'] = equity
+    strat['ret'] = daily_returns(equity, cash)
+    return strat
+
+
+def backtest_vwap_universe(tickers, load_bars, all_days=None, cash=25000.0, period=MINUTES_PER_DAY,
+                           **fee_params):
+    """Run the strategy on every ticker of a universe, each with its own capital.
+       load_bars: callable ticker -> minute bars (fetch_polygon_data layout); tickers are loaded one at a time
+       and only their per-day entries and exits are kept, so memory stays at one (days x minutes) matrix.
+       all_days: common calendar, the union of the tickers' days by default.
+       The combined portfolio splits capital equally across the tickers and rebalances daily.
+       Returns (stats, rets): a DataFrame of summary_stats per ticker plus a 'PORTFOLIO' row, and the daily
+       returns (days x tickers, plus a 'PORTFOLIO' column).
+    """
+    components = {}
+    for ticker in tickers:
+        matrix = build_vwap_matrix(load_bars(ticker), period=period)
+        components[ticker] = (matrix['all_days'], vwap_trend_components(matrix))
+    if all_days is None:
+        all_days = np.unique(np.concatenate([days for days, _ in components.values()]))
+    all_days = np.asarray(all_days, dtype='datetime64[D]')
+
+    # Align every ticker on the common calendar; days it did not trade stay flat.
+    direction = np.array([align_days(days, c['direction'], all_days, 0) for days, c in components.values()])
+    entry_price = np.array([align_days(days, c['entry_price'], all_days, np.nan) for days, c in components.values()])
+    exit_price = np.array([align_days(days, c['exit_price'], all_days, np.nan) for days, c in components.values()])
+
+    equity, _, _ = simulate_round_trips(direction, entry_price, exit_price, cash, **fee_params)
+    rets = daily_returns(equity, cash)
+    portfolio_ret = rets.mean(axis=0)
+    portfolio_equity = cash * np.cumprod(1 + portfolio_ret)
+
+    stats = pd.DataFrame(summary_stats(np.vstack([rets, portfolio_ret]), equity=np.vstack([equity, portfolio_equity])),
+                         index=list(tickers) + ['PORTFOLIO'])
+    rets = pd.DataFrame(rets.T, index=pd.DatetimeIndex(all_days, name='day'), columns=list(tickers))
+    rets['PORTFOLIO'] = portfolio_ret
+    return stats, rets